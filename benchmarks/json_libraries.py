@@ -0,0 +1,75 @@
+"""
+Benchmark the JSON libraries supported by JSONCodec.
+
+Decodes a large pod list response (bytes) and encodes one pod per request
+body, for every installed library.
+
+    poetry run python benchmarks/json_libraries.py --items 20000
+"""
+
+import argparse
+import json
+import time
+
+from pykube.serialization import JSONCodec
+from pykube.serialization import msgspec_installed
+from pykube.serialization import orjson_installed
+
+
+def make_body(num_items: int) -> bytes:
+    items = [
+        {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": {
+                "name": f"pod-{i}",
+                "namespace": "default",
+                "labels": {"app": "bench", "index": str(i)},
+                "uid": f"00000000-0000-0000-0000-{i:012d}",
+            },
+            "spec": {
+                "nodeName": f"node-{i % 100}",
+                "containers": [{"name": "main", "image": "nginx", "args": ["x"] * 20}],
+            },
+            "status": {"phase": "Running", "conditions": [{"type": "Ready"}] * 4},
+        }
+        for i in range(num_items)
+    ]
+    doc = {"kind": "PodList", "apiVersion": "v1", "metadata": {}, "items": items}
+    return json.dumps(doc).encode("utf-8")
+
+
+def best_of(func, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=20000)
+    args = parser.parse_args()
+
+    body = make_body(args.items)
+    items = json.loads(body)["items"]
+    print(f"{len(body) / 1e6:.1f} MB list, {args.items} items")
+    libraries = ["json"]
+    if orjson_installed:
+        libraries.append("orjson")
+    if msgspec_installed:
+        libraries.append("msgspec")
+    for library in libraries:
+        codec = JSONCodec(library)
+        decode = best_of(lambda codec=codec: codec.decode(body))
+        encode = best_of(lambda codec=codec: [codec.encode(item) for item in items])
+        print(
+            f"{library:8} decode {decode * 1000:8.1f} ms"
+            f"   encode {encode * 1e6 / len(items):6.2f} µs/object"
+        )
+
+
+if __name__ == "__main__":
+    main()
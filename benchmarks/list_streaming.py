@@ -0,0 +1,111 @@
+"""
+Benchmark buffered vs. streaming decoding of large list responses.
+
+Reports time-to-first-object, total time and peak memory (tracemalloc) for
+Query.iterator() with and without stream=True. The response body is served
+from memory in chunks with a simulated network bandwidth.
+
+    poetry run python benchmarks/list_streaming.py --items 20000 --bandwidth 200
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+
+from pykube import Pod
+from pykube.query import Query
+
+
+def make_body(num_items: int) -> bytes:
+    items = [
+        {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": {
+                "name": f"pod-{i}",
+                "namespace": "default",
+                "labels": {"app": "bench", "index": str(i)},
+                "uid": f"00000000-0000-0000-0000-{i:012d}",
+            },
+            "spec": {
+                "nodeName": f"node-{i % 100}",
+                "containers": [{"name": "main", "image": "nginx", "args": ["x"] * 20}],
+            },
+            "status": {"phase": "Running"},
+        }
+        for i in range(num_items)
+    ]
+    doc = {"kind": "PodList", "apiVersion": "v1", "metadata": {}, "items": items}
+    return json.dumps(doc).encode("utf-8")
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body: bytes, bandwidth: float):
+        self.body = body
+        self.bandwidth = bandwidth * 1024 * 1024  # bytes per second
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.body), chunk_size):
+            chunk = self.body[i : i + chunk_size]
+            if self.bandwidth:
+                time.sleep(len(chunk) / self.bandwidth)
+            yield chunk
+
+    def json(self):
+        return json.loads(b"".join(self.iter_content(64 * 1024)))
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAPI:
+    def __init__(self, body: bytes, bandwidth: float):
+        self.body = body
+        self.bandwidth = bandwidth
+
+    def get(self, **kwargs):
+        return FakeResponse(self.body, self.bandwidth)
+
+
+def run(api, stream: bool):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    num = 0
+    for _ in Query(api, Pod).iterator(stream=stream):
+        if first is None:
+            first = time.perf_counter() - start
+        num += 1
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return num, first, total, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument(
+        "--bandwidth", type=float, default=200, help="MiB/s, 0 for unlimited"
+    )
+    args = parser.parse_args()
+
+    body = make_body(args.items)
+    api = FakeAPI(body, args.bandwidth)
+    print(f"list body: {len(body) / 1024 / 1024:.1f} MiB, {args.items} items")
+    for stream in (False, True):
+        num, first, total, peak = run(api, stream)
+        print(
+            f"stream={stream!s:5}  objects={num}  first object={first * 1000:8.1f} ms"
+            f"  total={total * 1000:8.1f} ms  peak memory={peak / 1024 / 1024:7.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
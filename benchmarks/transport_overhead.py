@@ -0,0 +1,93 @@
+"""
+Benchmark the per-request overhead of the HTTPClient transports.
+
+Sends small GET and PATCH requests to a local keep-alive HTTP server with the
+"requests" (requests.Session) and "direct" transports. A second run stubs out
+the network (KubernetesHTTPAdapter._do_send) to show the client-side overhead
+alone.
+
+    poetry run python benchmarks/transport_overhead.py --requests 5000
+"""
+
+import argparse
+import http.server
+import threading
+import time
+from unittest import mock
+
+import requests
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+
+BODY = b'{"kind": "Pod", "metadata": {"name": "a"}}'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body in one segment (no Nagle/delayed ACK stalls)
+    wbufsize = -1
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    do_GET = do_PATCH = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+def run(api: HTTPClient, num_requests: int) -> float:
+    start = time.perf_counter()
+    for i in range(num_requests):
+        if i % 2:
+            api.patch(url="pods/a", data=b'{"metadata": {"labels": {"a": "b"}}}')
+        else:
+            api.get(url="pods/a")
+    return (time.perf_counter() - start) / num_requests
+
+
+def stub_send(request, **kwargs):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers["Content-Type"] = "application/json"
+    response._content = BODY
+    response.request = request
+    response.url = request.url
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = KubeConfig.from_url(f"http://localhost:{server.server_address[1]}")
+    try:
+        for name, patch in (
+            ("local server", None),
+            ("no network", "pykube.http.KubernetesHTTPAdapter._do_send"),
+        ):
+            for transport in ("requests", "direct"):
+                api = HTTPClient(config, transport=transport)
+                run(api, 100)  # warm up
+                if patch:
+                    with mock.patch(patch, side_effect=stub_send):
+                        elapsed = run(api, args.requests)
+                else:
+                    elapsed = run(api, args.requests)
+                print(f"{name:14} {transport:9} {elapsed * 1e6:8.1f} µs/request")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark decoding of watch event streams in events per second.
+
+Compares the previous decoding path (namedtuple class per stream, str decode
+before json.loads, default 512 byte reads) with the current one, with and
+without raw dict events. The stream is served from memory.
+
+    poetry run python benchmarks/watch_decoding.py --events 50000
+"""
+
+import argparse
+import io
+import json
+import time
+from collections import namedtuple
+
+import requests
+
+from pykube import Pod
+from pykube.query import Query
+
+
+def make_stream(num_events: int) -> bytes:
+    lines = []
+    for i in range(num_events):
+        obj = {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": {
+                "name": f"pod-{i}",
+                "namespace": "default",
+                "resourceVersion": str(i),
+                "labels": {"app": "bench"},
+            },
+            "spec": {"nodeName": f"node-{i % 100}", "containers": [{"name": "c"}]},
+            "status": {"phase": "Running", "conditions": [{"type": "Ready"}] * 4},
+        }
+        lines.append(json.dumps({"type": "MODIFIED", "object": obj}))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class FakeAPI:
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def get(self, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(self.body)
+        return response
+
+    def raise_for_status(self, response):
+        pass
+
+
+def previous_decoding(api, num_events):
+    # decoding path of WatchQuery.object_stream before the optimization
+    r = api.get()
+    WatchEvent = namedtuple("WatchEvent", "type object")
+    for line in r.iter_lines():
+        we = json.loads(line.decode("utf-8"))
+        yield WatchEvent(type=we["type"], object=Pod(api, we["object"]))
+
+
+def current_decoding(api, num_events, **kwargs):
+    return Query(api, Pod).watch(**kwargs)
+
+
+def measure(name, events):
+    start = time.perf_counter()
+    num = sum(1 for _ in events)
+    elapsed = time.perf_counter() - start
+    print(f"{name:32} {num / elapsed:12,.0f} events/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50000)
+    args = parser.parse_args()
+
+    api = FakeAPI(make_stream(args.events))
+    measure("previous", previous_decoding(api, args.events))
+    measure("current", current_decoding(api, args.events))
+    measure("current, raw=True", current_decoding(api, args.events, raw=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from .config import KubeConfig  # noqa: F401
 from .exceptions import KubernetesError, PyKubeError, ObjectDoesNotExist  # noqa: F401
 from .http import HTTPClient  # noqa: F401
 from .objects import (  # noqa: F401
+    apply_all,
     object_factory,
     ConfigMap,
     CronJob,
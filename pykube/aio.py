@@ -0,0 +1,518 @@
+# Asyncio flavour of the HTTP client and queries.
+import asyncio
+import ssl
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import urlparse
+
+try:
+    import aiohttp
+
+    aiohttp_installed = True
+except ImportError:
+    aiohttp_installed = False
+
+import requests
+
+from .config import KubeConfig
+from .exceptions import HTTPError
+from .exceptions import ObjectDoesNotExist
+from .flowcontrol import RateLimiter
+from .http import DEFAULT_HTTP_TIMEOUT
+from .http import HTTPClient
+from .http import KubernetesHTTPAdapter
+from .query import all_
+from .query import BaseQuery
+from .query import now
+from .query import Table
+from .query import WatchEvent
+from .serialization import default_json_codec
+from .serialization import JSONCodec
+
+from . import __version__
+
+
+class AsyncHTTPClient:
+    """
+    Asyncio client for interfacing with the Kubernetes API.
+
+    URL building and authentication are shared with HTTPClient, requests are
+    sent with aiohttp so that one event loop can serve many concurrent calls.
+    """
+
+    http_adapter_cls = KubernetesHTTPAdapter
+
+    get_kwargs = HTTPClient.get_kwargs
+    # responses are always JSON
+    _accept = None
+
+    def __init__(
+        self,
+        config: KubeConfig,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        dry_run: bool = False,
+        verify: bool = True,
+        http_adapter: Optional[KubernetesHTTPAdapter] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        json_codec: Optional[JSONCodec] = None,
+    ):
+        """
+        Creates a new instance of the AsyncHTTPClient.
+
+        :Parameters:
+           - `config`: The configuration instance
+           - `json_codec`: JSON library to encode request bodies and decode
+             responses with (default: the fastest installed)
+        """
+        if not aiohttp_installed:
+            raise ImportError(
+                "missing dependencies for asyncio support (try pip install new-pykube[async]"
+            )
+        self.config = config
+        self.timeout = timeout
+        self.url = self.config.cluster["server"]
+        self.dry_run = dry_run
+        self.verify = verify
+        self.rate_limiter = rate_limiter
+        self.json_codec = json_codec or default_json_codec
+        self.headers = {"User-Agent": f"new-pykube/{__version__}"}
+        if not http_adapter:
+            http_adapter = self.http_adapter_cls(self.config)
+        self.http_adapter = http_adapter
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._ssl_contexts: dict = {}
+
+    @property
+    def url(self):
+        return self._url
+
+    @url.setter
+    def url(self, value):
+        self._url = urlparse(value).geturl()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        # the session binds to the running event loop, so create it lazily
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers=self.headers)
+        return self._session
+
+    async def close(self):
+        """
+        Close the underlying aiohttp session and its connections.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def version(self):
+        """
+        Get Kubernetes API version (awaitable)
+        """
+        return self._version()
+
+    async def _version(self):
+        response = await self.get(version="", base="/version")
+        await self.raise_for_status(response)
+        data = await response.json(loads=self.json_codec.decode)
+        return (data["major"], data["minor"])
+
+    async def resource_list(self, api_version):
+        cached_attr = f"_cached_resource_list_{api_version}"
+        if not hasattr(self, cached_attr):
+            r = await self.get(version=api_version)
+            await self.raise_for_status(r)
+            setattr(self, cached_attr, await r.json(loads=self.json_codec.decode))
+        return getattr(self, cached_attr)
+
+    async def raise_for_status(self, resp):
+        if resp.status < 400:
+            return
+        # attempt to provide a more specific exception based around what
+        # Kubernetes returned as the error.
+        if resp.content_type == "application/json":
+            payload = await resp.json(loads=self.json_codec.decode)
+            if payload.get("kind") == "Status":
+                raise HTTPError(resp.status, payload["message"])
+        raise HTTPError(resp.status, resp.reason or f"HTTP {resp.status}")
+
+    def _prepare(self, method, kwargs):
+        """
+        Build the request and apply kubeconfig authentication to it.
+
+        This may run exec credential plugins, so it is called in a worker thread.
+        """
+        request = requests.Request(
+            method,
+            kwargs.pop("url"),
+            headers=kwargs.pop("headers", None),
+            params=kwargs.pop("params", None),
+            data=kwargs.pop("data", None),
+            json=kwargs.pop("json", None),
+        ).prepare()
+        send_kwargs = {"verify": self.verify, "cert": None}
+        auth_retry = self.http_adapter._setup_request_auth(
+            self.config, request, send_kwargs
+        )
+        self.http_adapter._setup_request_certificates(self.config, request, send_kwargs)
+        ssl_context = self._ssl_context(send_kwargs["verify"], send_kwargs["cert"])
+        return request, ssl_context, auth_retry
+
+    def _ssl_context(self, verify, cert):
+        if verify is False:
+            return False
+        if isinstance(verify, ssl.SSLContext):
+            # built by the HTTP adapter from the kubeconfig certificates
+            return verify
+        key = (verify, cert)
+        if key not in self._ssl_contexts:
+            context = ssl.create_default_context(
+                cafile=verify if isinstance(verify, str) else None
+            )
+            if cert:
+                context.load_cert_chain(*cert)
+            self._ssl_contexts[key] = context
+        return self._ssl_contexts[key]
+
+    async def request(self, method, **kwargs):
+        """
+        Makes an API request based on arguments.
+
+        Unless `stream=True` is passed, the response body is read before
+        returning, so the connection is released back to the pool.
+
+        :Parameters:
+           - `method`: The HTTP method
+           - `kwargs`: Keyword arguments
+        """
+        kwargs = self.get_kwargs(**kwargs)
+        stream = kwargs.pop("stream", False)
+        timeout = kwargs.pop("timeout")
+        if self.rate_limiter is not None and not stream:
+            delay = self.rate_limiter.reserve(method, kwargs["url"])
+            if delay:
+                await asyncio.sleep(delay)
+        request, ssl_context, auth_retry = await asyncio.to_thread(
+            self._prepare, method, dict(kwargs)
+        )
+        response = await self._send(request, ssl_context, timeout)
+        if response.status == HTTPStatus.UNAUTHORIZED and auth_retry is not None:
+            # the credential was rejected: renew it and send the request once
+            # more, like KubernetesHTTPAdapter.send
+            response.release()
+            await asyncio.to_thread(auth_retry.refresh)
+            request, ssl_context, _ = await asyncio.to_thread(
+                self._prepare, method, dict(kwargs)
+            )
+            response = await self._send(request, ssl_context, timeout)
+            if response.ok and auth_retry.on_success is not None:
+                await asyncio.to_thread(auth_retry.on_success)
+        if not stream:
+            await response.read()
+        return response
+
+    async def _send(self, request, ssl_context, timeout):
+        headers = dict(request.headers)
+        headers.pop("Content-Length", None)
+        return await self.session.request(
+            request.method,
+            request.url,
+            headers=headers,
+            data=request.body,
+            ssl=ssl_context,
+            server_hostname=self.config.cluster.get("tls-server-name"),
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=timeout, sock_read=timeout
+            ),
+        )
+
+    async def get(self, **kwargs):
+        """
+        Executes an HTTP GET.
+        """
+        return await self.request("GET", **kwargs)
+
+    async def options(self, **kwargs):
+        """
+        Executes an HTTP OPTIONS.
+        """
+        return await self.request("OPTIONS", **kwargs)
+
+    async def head(self, **kwargs):
+        """
+        Executes an HTTP HEAD.
+        """
+        return await self.request("HEAD", **kwargs)
+
+    async def post(self, **kwargs):
+        """
+        Executes an HTTP POST.
+        """
+        return await self.request("POST", **kwargs)
+
+    async def put(self, **kwargs):
+        """
+        Executes an HTTP PUT.
+        """
+        return await self.request("PUT", **kwargs)
+
+    async def patch(self, **kwargs):
+        """
+        Executes an HTTP PATCH.
+        """
+        return await self.request("PATCH", **kwargs)
+
+    async def delete(self, **kwargs):
+        """
+        Executes an HTTP DELETE.
+        """
+        return await self.request("DELETE", **kwargs)
+
+
+class AsyncQuery(BaseQuery):
+    async def get_by_name(self, name: str):
+        """
+        Get object by name, raises ObjectDoesNotExist if not found
+        """
+        kwargs = {
+            "url": f"{self.api_obj_class.endpoint}/{name}",
+            "namespace": self.namespace,
+        }
+        if self.api_obj_class.base:
+            kwargs["base"] = self.api_obj_class.base
+        if self.api_obj_class.version:
+            kwargs["version"] = self.api_obj_class.version
+        r = await self.api.get(**kwargs)
+        if r.status == 404:
+            raise ObjectDoesNotExist(f"{name} does not exist.")
+        await self.api.raise_for_status(r)
+        return self.api_obj_class._from_response(
+            self.api, await r.json(loads=self.api.json_codec.decode)
+        )
+
+    async def get(self, *args, **kwargs):
+        """
+        Get a single object by name, namespace, label, ..
+        """
+        if "name" in kwargs:
+            return await self.get_by_name(kwargs["name"])
+        objects = [obj async for obj in self.filter(*args, **kwargs).iterator()]
+        if len(objects) == 1:
+            return objects[0]
+        if not objects:
+            raise ObjectDoesNotExist("get() returned zero objects")
+        raise ValueError("get() more than one object; use filter")
+
+    async def get_or_none(self, *args, **kwargs):
+        """
+        Get object by name, return None if not found
+        """
+        try:
+            return await self.get(*args, **kwargs)
+        except ObjectDoesNotExist:
+            return None
+
+    def watch(self, since=None, *, params=None, raw=False):
+        query = self._clone(AsyncWatchQuery)
+        query.params = params
+        query.raw = raw
+        if since is now:
+            raise ValueError("since=now is not supported, pass a resourceVersion")
+        elif since is not None:
+            query.resource_version = since
+        return query
+
+    async def execute(self, **kwargs):
+        kwargs["url"] = self._build_api_url()
+        if self.api_obj_class.base:
+            kwargs["base"] = self.api_obj_class.base
+        if self.api_obj_class.version:
+            kwargs["version"] = self.api_obj_class.version
+        if self.namespace is not None and self.namespace is not all_:
+            kwargs["namespace"] = self.namespace
+        r = await self.api.get(**kwargs)
+        await self.api.raise_for_status(r)
+        return r
+
+    async def as_table(self) -> Table:
+        """
+        Execute query and return result as Table (similar to what kubectl does)
+        """
+        response = await self.execute(
+            headers={"Accept": "application/json;as=Table;v=v1beta1;g=meta.k8s.io"}
+        )
+        return Table(
+            self.api_obj_class, await response.json(loads=self.api.json_codec.decode)
+        )
+
+    async def iterator(self):
+        """
+        Execute the API request and return an async iterator over the objects.
+        """
+        response = await self.execute()
+        for obj in (await response.json(loads=self.api.json_codec.decode)).get(
+            "items"
+        ) or []:
+            yield self.api_obj_class._from_response(self.api, obj)
+
+    def __aiter__(self):
+        return self.iterator()
+
+
+class AsyncWatchQuery(BaseQuery):
+    def __init__(self, *args, **kwargs):
+        self.resource_version = kwargs.pop("resource_version", None)
+        self.params = None
+        self.raw = False
+        super().__init__(*args, **kwargs)
+        self._response = None
+
+    async def object_stream(self):
+        params = dict(self.params or {})  # shallow clone for local use
+        params["watch"] = "true"
+        if self.resource_version is not None:
+            params["resourceVersion"] = self.resource_version
+        kwargs = {"url": self._build_api_url(params=params), "stream": True}
+        if self.namespace is not all_:
+            kwargs["namespace"] = self.namespace
+        if self.api_obj_class.version:
+            kwargs["version"] = self.api_obj_class.version
+        r = await self.api.get(**kwargs)
+        self._response = r
+        try:
+            await self.api.raise_for_status(r)
+            async for line in r.content:
+                if not line.strip():
+                    continue
+                we = self.api.json_codec.decode(line)
+                if we.get("kind") == "Status":
+                    raise HTTPError(we["code"], we["message"])
+                obj = we["object"]
+                if not self.raw:
+                    obj = self.api_obj_class._from_response(self.api, obj)
+                yield WatchEvent(we["type"], obj)
+        finally:
+            r.release()
+
+    def __aiter__(self):
+        return self.object_stream()
+
+    @property
+    def response(self):
+        return self._response
+
+
+async def exists(api_obj, ensure=False) -> bool:
+    """
+    Check whether the object exists (asyncio version of APIObject.exists).
+    """
+    r = await api_obj.api.get(**api_obj.api_kwargs())
+    if r.status not in {200, 404}:
+        await api_obj.api.raise_for_status(r)
+    if r.status == 404:
+        if ensure:
+            raise ObjectDoesNotExist(f"{api_obj.name} does not exist.")
+        return False
+    return True
+
+
+async def create(api_obj):
+    """
+    Create the object (asyncio version of APIObject.create).
+    """
+    r = await api_obj.api.post(
+        **api_obj.api_kwargs(
+            data=api_obj.api.json_codec.encode(api_obj.obj), obj_list=True
+        )
+    )
+    await api_obj.api.raise_for_status(r)
+    api_obj.set_obj(await r.json(loads=api_obj.api.json_codec.decode))
+
+
+async def reload(api_obj):
+    """
+    Reload the object from the API (asyncio version of APIObject.reload).
+    """
+    r = await api_obj.api.get(**api_obj.api_kwargs())
+    await api_obj.api.raise_for_status(r)
+    api_obj.set_obj(await r.json(loads=api_obj.api.json_codec.decode))
+
+
+async def patch(api_obj, strategic_merge_patch, *, subresource=None):
+    """
+    Patch the object (asyncio version of APIObject.patch).
+    """
+    r = await api_obj.api.patch(
+        **api_obj.api_kwargs(
+            subresource=subresource,
+            headers={"Content-Type": "application/merge-patch+json"},
+            data=api_obj.api.json_codec.encode(strategic_merge_patch),
+        )
+    )
+    await api_obj.api.raise_for_status(r)
+    api_obj.set_obj(await r.json(loads=api_obj.api.json_codec.decode))
+
+
+async def apply(api_obj, field_manager: str, force: bool = False, *, subresource=None):
+    """
+    Server-side apply the object (asyncio version of APIObject.apply).
+    """
+    r = await api_obj.api.patch(
+        **api_obj.apply_kwargs(field_manager, force, subresource=subresource)
+    )
+    await api_obj.api.raise_for_status(r)
+    api_obj.set_obj(await r.json(loads=api_obj.api.json_codec.decode))
+
+
+async def apply_all(
+    objects, field_manager: str, force: bool = False, max_concurrency: int = 10
+) -> list:
+    """
+    Server-side apply many objects concurrently (asyncio version of
+    pykube.apply_all).
+    """
+    objects = list(objects)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def apply_one(api_obj):
+        async with semaphore:
+            await apply(api_obj, field_manager, force)
+
+    results = await asyncio.gather(
+        *(apply_one(api_obj) for api_obj in objects), return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return objects
+
+
+async def update(api_obj, is_strategic=True, *, subresource=None):
+    """
+    Update the object (asyncio version of APIObject.update).
+    """
+    strategic_merge_patch = api_obj.update_patch(is_strategic)
+    if strategic_merge_patch:
+        await patch(api_obj, strategic_merge_patch, subresource=subresource)
+
+
+async def delete(api_obj, propagation_policy: Optional[str] = None):
+    """
+    Delete the object (asyncio version of APIObject.delete).
+    """
+    if propagation_policy:
+        options = {"propagationPolicy": propagation_policy}
+    else:
+        options = {}
+    r = await api_obj.api.delete(
+        **api_obj.api_kwargs(data=api_obj.api.json_codec.encode(options))
+    )
+    if r.status != 404:
+        await api_obj.api.raise_for_status(r)
@@ -1,9 +1,12 @@
 # Configuration code.
+import atexit
 import base64
 import copy
 import hashlib
 import os
+import stat
 import tempfile
+import threading
 from pathlib import Path
 from typing import Optional
 
@@ -11,6 +14,10 @@ import yaml
 
 from pykube import exceptions
 
+# kubeconfigs with a delayed write pending (see KubeConfig.persist_doc)
+_pending_persists: dict = {}
+_pending_persists_lock = threading.Lock()
+
 
 def _join_host_port(host, port):
     """Adapted golang's net.JoinHostPort"""
@@ -242,18 +249,53 @@ class KubeConfig:
         """
         return self.contexts[self.current_context].get("namespace", "default")
 
-    def persist_doc(self):
+    def persist_doc(self, delay: Optional[float] = None):
+        """
+        Write the doc back to the kubeconfig file.
+
+        With delay (seconds), the write happens on a background thread and all
+        calls within the delay result in a single write. Pending writes are
+        flushed when the interpreter exits.
+        """
         if not self.kubeconfig_path:
             # Config was provided as string, not way to persit it
             return
-        with self.kubeconfig_path.open("w") as f:
-            yaml.safe_dump(
-                self.doc,
-                f,
-                encoding="utf-8",
-                allow_unicode=True,
-                default_flow_style=False,
-            )
+        if delay:
+            with _pending_persists_lock:
+                if self not in _pending_persists:
+                    timer = threading.Timer(delay, self._persist_pending)
+                    timer.daemon = True
+                    _pending_persists[self] = timer
+                    timer.start()
+            return
+        # write to a temporary file and rename it, so that the kubeconfig is
+        # never seen partially written (e.g. by kubectl)
+        path = self.kubeconfig_path.resolve()
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                yaml.safe_dump(
+                    self.doc,
+                    f,
+                    encoding="utf-8",
+                    allow_unicode=True,
+                    default_flow_style=False,
+                )
+            if path.exists():
+                os.chmod(tmp_path, stat.S_IMODE(path.stat().st_mode))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _persist_pending(self):
+        with _pending_persists_lock:
+            timer = _pending_persists.pop(self, None)
+        if timer is not None:
+            timer.cancel()
+            self.persist_doc()
 
     def reload(self):
         if hasattr(self, "_users"):
@@ -264,6 +306,12 @@ class KubeConfig:
             delattr(self, "_clusters")
 
 
+@atexit.register
+def _persist_all_pending():
+    for config in list(_pending_persists):
+        config._persist_pending()
+
+
 class BytesOrFile:
     """
     Implements the same interface for files and byte input.
@@ -325,6 +373,15 @@ class BytesOrFile:
         else:
             return self._bytes
 
+    def fingerprint(self):
+        """
+        Returns a hashable value which changes when the content changes.
+        """
+        if self._bytes is not None:
+            return self._bytes
+        stat_result = self._path.stat()
+        return (str(self._path), stat_result.st_mtime_ns, stat_result.st_size)
+
     def filename(self):
         """
         Returns the provided data as a file location.
@@ -0,0 +1,188 @@
+"""
+Cache for credentials obtained by running a command (exec credential plugins,
+GCP cmd-path), so that the command does not run for every request.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+LOG = logging.getLogger(__name__)
+UTC = datetime.timezone.utc
+
+REFRESH_BEFORE_EXPIRY = datetime.timedelta(minutes=1)
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """
+    Parse a RFC 3339 timestamp like "2024-01-01T10:00:00Z" into an aware datetime
+    """
+    # fromisoformat() of Python 3.10 supports neither "Z" nor nanoseconds
+    value = re.sub(r"(\d\d:\d\d:\d\d)\.\d+", r"\1", value.replace("Z", "+00:00"))
+    timestamp = datetime.datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=UTC)
+    return timestamp
+
+
+def cache_key(*configs) -> str:
+    """
+    Return the cache key for the given (JSON-like) configuration
+    """
+    data = json.dumps(configs, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CredentialCache:
+    """
+    Thread-safe cache of credentials until they expire.
+
+    Once a credential is within refresh_before of its expiry, the first thread
+    needing it refreshes it while other threads keep using the cached one. Only
+    when it actually expired, other threads wait for the refresh instead of
+    running the command again.
+
+    With cache_dir, credentials are also stored in files readable by the current
+    user only, so that several processes can share them.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        refresh_before: datetime.timedelta = REFRESH_BEFORE_EXPIRY,
+    ):
+        self.cache_dir = Path(cache_dir).expanduser() if cache_dir else None
+        self.refresh_before = refresh_before
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._credentials: Dict[str, Tuple[dict, Optional[datetime.datetime]]] = {}
+
+    def get(self, key: str, fetch: Callable) -> dict:
+        """
+        Return the credential cached for the key, call fetch() to get a new one.
+
+        fetch must return the credential (a JSON serializable dict) and its expiry
+        (an aware datetime, or None if it is valid until the API rejects it).
+        """
+        cached = self._cached(key)
+        if cached is not None and not self._stale(cached):
+            return cached[0]
+        lock = self._key_lock(key)
+        if cached is not None and not self._expired(cached):
+            if not lock.acquire(blocking=False):
+                # another thread is already refreshing it
+                return cached[0]
+        else:
+            lock.acquire()
+        try:
+            # the credential might have been refreshed while waiting for the lock
+            cached = self._cached(key)
+            if cached is not None and not self._stale(cached):
+                return cached[0]
+            try:
+                credential, expiry = fetch()
+            except Exception:
+                if cached is None or self._expired(cached):
+                    raise
+                LOG.warning("Failed to refresh credential", exc_info=True)
+                return cached[0]
+            self._store(key, credential, expiry)
+            return credential
+        finally:
+            lock.release()
+
+    def invalidate(self, key: str):
+        """
+        Remove the credential, e.g. after it was rejected by the API
+        """
+        with self._lock:
+            self._credentials.pop(key, None)
+        if self.cache_dir:
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _now(self) -> datetime.datetime:
+        return datetime.datetime.now(tz=UTC)
+
+    def _stale(self, cached) -> bool:
+        expiry = cached[1]
+        return expiry is not None and self._now() >= expiry - self.refresh_before
+
+    def _expired(self, cached) -> bool:
+        expiry = cached[1]
+        return expiry is not None and self._now() >= expiry
+
+    def _cached(self, key: str):
+        cached = self._credentials.get(key)
+        if self.cache_dir and (cached is None or self._stale(cached)):
+            # another process might have refreshed it
+            cached = self._load(key) or cached
+        return cached
+
+    def _store(self, key: str, credential: dict, expiry):
+        with self._lock:
+            self._credentials[key] = (credential, expiry)
+        if self.cache_dir:
+            self._save(key, credential, expiry)
+
+    def _path(self, key: str) -> Path:
+        # only used with a cache_dir
+        assert self.cache_dir is not None
+        return self.cache_dir / f"{key}.json"
+
+    def _load(self, key: str):
+        try:
+            with self._path(key).open() as f:
+                data = json.load(f)
+            expiry = data["expiry"] and parse_timestamp(data["expiry"])
+            cached = (data["credential"], expiry)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            LOG.warning(f"Failed to read cached credential: {e}")
+            return None
+        if self._expired(cached):
+            return None
+        with self._lock:
+            self._credentials[key] = cached
+        return cached
+
+    def _save(self, key: str, credential: dict, expiry):
+        data = {
+            "credential": credential,
+            "expiry": expiry.isoformat() if expiry else None,
+        }
+        path = self._path(key)
+        try:
+            path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # write to a temporary file and rename it, so that other processes
+            # never read a partially written file
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            LOG.warning(f"Failed to write cached credential: {e}")
+
+
+default_cache = CredentialCache(cache_dir=os.environ.get("PYKUBE_CREDENTIAL_CACHE_DIR"))
@@ -0,0 +1,192 @@
+"""
+Client-side load balancing and failover between several API server endpoints.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Callable
+from typing import List
+from typing import Optional
+
+import requests
+
+from .hedging import primary_aborted
+from .retry import IDEMPOTENT_METHODS
+from .retry import is_connect_error
+
+LOG = logging.getLogger(__name__)
+
+# responses of an overloaded or draining API server
+FAILURE_STATUS_CODES = frozenset([502, 503, 504])
+
+
+class Endpoint:
+    """
+    An API server URL with its outstanding requests and circuit breaker state
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.opened = 0
+
+    def __repr__(self):
+        return f"<Endpoint {self.url}>"
+
+    def state(self, now: float) -> str:
+        if not self.open_until:
+            return "closed"
+        return "half-open" if now >= self.open_until else "open"
+
+
+class EndpointPool:
+    """
+    Thread-safe pool of API server endpoints, e.g. the individual API servers of
+    a highly available control plane.
+
+    Requests go to the endpoint with the least outstanding requests, so a slow
+    API server gets less traffic. After failure_threshold consecutive failures
+    (connection errors, timeouts or 502/503/504), an endpoint's circuit breaker
+    opens and it gets no requests for open_seconds; then a single trial request
+    decides whether it is closed again. Failed requests fail over to another
+    endpoint right away if they were not sent or are idempotent.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        failure_threshold: int = 3,
+        open_seconds: float = 10.0,
+    ):
+        if not urls:
+            raise ValueError("At least one endpoint URL is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self._lock = threading.Lock()
+
+    def acquire(self, exclude=()) -> Endpoint:
+        """
+        Choose the endpoint for a request, which must be passed to release()
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude]
+            available = [
+                e
+                for e in candidates
+                if e.state(now) == "closed"
+                or (e.state(now) == "half-open" and not e.trial_in_flight)
+            ]
+            if available:
+                least = min(e.outstanding for e in available)
+                endpoint = random.choice(  # nosec
+                    [e for e in available if e.outstanding == least]
+                )
+            else:
+                # all circuits are open: try the one that opened first
+                endpoint = min(candidates or self.endpoints, key=lambda e: e.open_until)
+            if endpoint.state(now) != "closed":
+                endpoint.trial_in_flight = True
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint: Endpoint, failed: Optional[bool]):
+        """
+        Record the result of a request to the endpoint (failed is None if the
+        request failed for a reason unrelated to the endpoint)
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.trial_in_flight = False
+            if failed is None:
+                return
+            if not failed:
+                endpoint.consecutive_failures = 0
+                endpoint.open_until = 0.0
+                return
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if (
+                endpoint.open_until
+                or endpoint.consecutive_failures >= self.failure_threshold
+            ):
+                if not endpoint.open_until:
+                    LOG.warning(f"Endpoint {endpoint.url} failed, not using it")
+                endpoint.open_until = time.monotonic() + self.open_seconds
+                endpoint.opened += 1
+
+    def call(self, method: str, send: Callable[[str], requests.Response]):
+        """
+        Call send(endpoint_url) and return its response, failing over to other
+        endpoints.
+        """
+        tried: List[Endpoint] = []
+        while True:
+            endpoint = self.acquire(exclude=tried)
+            tried.append(endpoint)
+            can_fail_over = len(tried) < len(self.endpoints)
+            try:
+                response = send(endpoint.url)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                if primary_aborted():
+                    # shut down because a hedge of the request won, the
+                    # endpoint did not fail
+                    self.release(endpoint, failed=None)
+                    raise
+                self.release(endpoint, failed=True)
+                if not can_fail_over or not (
+                    method in IDEMPOTENT_METHODS or is_connect_error(e)
+                ):
+                    raise
+                LOG.debug(f"Failing over from {endpoint.url} after {e}")
+                continue
+            except BaseException:
+                self.release(endpoint, failed=None)
+                raise
+            failed = response.status_code in FAILURE_STATUS_CODES
+            self.release(endpoint, failed=failed)
+            if failed and can_fail_over and method in IDEMPOTENT_METHODS:
+                LOG.debug(
+                    f"Failing over from {endpoint.url} after HTTP {response.status_code}"
+                )
+                response.close()
+                continue
+            return response
+
+    def stats(self) -> dict:
+        """
+        Return request counters and circuit breaker state for each endpoint
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                e.url: {
+                    "state": e.state(now),
+                    "outstanding": e.outstanding,
+                    "requests": e.requests,
+                    "failures": e.failures,
+                    "opened": e.opened,
+                }
+                for e in self.endpoints
+            }
+
+
+def endpoint_pool(endpoints) -> Optional[EndpointPool]:
+    """
+    Return an EndpointPool for a list of URLs, or the given pool
+    """
+    if endpoints is None or isinstance(endpoints, EndpointPool):
+        return endpoints
+    return EndpointPool(list(endpoints))
@@ -0,0 +1,292 @@
+"""
+Client-side flow control for API requests.
+"""
+
+import threading
+import time
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+from urllib.parse import urlparse
+
+
+def _resource_path(url: str) -> Optional[List[str]]:
+    # path after the API group and namespace, e.g. ["pods", "my-pod"]
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if parts[:1] == ["api"]:
+        parts = parts[2:]
+    elif parts[:1] == ["apis"]:
+        parts = parts[3:]
+    else:
+        return None
+    if len(parts) > 2 and parts[0] == "namespaces":
+        parts = parts[2:]
+    return parts
+
+
+def resource_from_url(url: str) -> Optional[str]:
+    """
+    Return the resource of an API URL, e.g. "pods" for
+    https://localhost/api/v1/namespaces/default/pods/my-pod
+    """
+    parts = _resource_path(url)
+    return parts[0] if parts else None
+
+
+RequestClass = Tuple[str, Optional[str], bool]
+
+
+def request_class(verb: str, url: str) -> RequestClass:
+    """
+    Return the verb, resource and whether a collection is requested (e.g. a
+    LIST), to compare latencies of similar requests only
+    """
+    parts = _resource_path(url) or []
+    return verb, parts[0] if parts else None, len(parts) == 1
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows bursts of up to burst requests and qps
+    requests per second on average.
+    """
+
+    def __init__(self, qps: float, burst: int):
+        if qps <= 0 or burst < 1:
+            raise ValueError("qps must be positive and burst at least 1")
+        self.qps = qps
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.delayed = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def reserve(self) -> float:
+        """
+        Take a token, return how many seconds to wait until it is available.
+
+        Tokens are handed out in order, so waiting callers are served first come,
+        first served.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.qps)
+            self._last = now
+            self._tokens -= 1
+            delay = max(0.0, -self._tokens / self.qps)
+            self.requests += 1
+            if delay:
+                self.delayed += 1
+                self.wait_seconds_total += delay
+                self.wait_seconds_max = max(self.wait_seconds_max, delay)
+        return delay
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "qps": self.qps,
+                "burst": self.burst,
+                "requests": self.requests,
+                "delayed": self.delayed,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+LimitKey = Union[str, Tuple[str, str]]
+
+
+class RateLimiter:
+    """
+    Client-side QPS/burst rate limiting of API requests (like client-go).
+
+    All requests are limited by the client-wide bucket, additional limits can
+    be set per verb ("PATCH"), resource ("pods") or both (("GET", "pods")):
+
+        limiter = RateLimiter(qps=20, burst=40, limits={"PATCH": (1, 5)})
+        api = pykube.HTTPClient(config, rate_limiter=limiter)
+
+    Watches (streaming requests) are not limited.
+    """
+
+    def __init__(
+        self,
+        qps: Optional[float] = 5.0,
+        burst: int = 10,
+        limits: Optional[Dict[LimitKey, Tuple[float, int]]] = None,
+    ):
+        self.bucket = TokenBucket(qps, burst) if qps else None
+        self.buckets = {
+            key: TokenBucket(qps, burst) for key, (qps, burst) in (limits or {}).items()
+        }
+
+    def _buckets(self, verb: str, url: str):
+        if self.bucket is not None:
+            yield self.bucket
+        if self.buckets:
+            resource = resource_from_url(url)
+            keys: List[LimitKey] = [verb]
+            if resource is not None:
+                keys += [resource, (verb, resource)]
+            for key in keys:
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    yield bucket
+
+    def reserve(self, verb: str, url: str) -> float:
+        """
+        Take a token for the request, return how many seconds to wait before
+        sending it.
+        """
+        return max(
+            (bucket.reserve() for bucket in self._buckets(verb, url)), default=0.0
+        )
+
+    def wait(self, verb: str, url: str) -> float:
+        """
+        Block until the request may be sent, return the seconds waited.
+        """
+        delay = self.reserve(verb, url)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def stats(self) -> dict:
+        """
+        Return request and wait time counters for each bucket.
+        """
+        stats = {}
+        if self.bucket is not None:
+            stats["client"] = self.bucket.stats()
+        for key, bucket in self.buckets.items():
+            stats[key if isinstance(key, str) else " ".join(key)] = bucket.stats()
+        return stats
+
+
+# response headers of API Priority and Fairness
+PRIORITY_LEVEL_HEADER = "X-Kubernetes-PF-PriorityLevel-UID"
+
+# latency increases below this are never a sign of overload
+MIN_LATENCY_INCREASE = 0.05
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Thread-safe AIMD (additive increase, multiplicative decrease) limit of
+    concurrent API requests.
+
+    The limit grows by one per round trip while responses are fast and
+    successful, and is cut by backoff_ratio when the API server signals
+    overload: 429 responses (API Priority and Fairness rejected the request,
+    see the X-Kubernetes-PF-* headers), 503 responses or latency rising above
+    latency_tolerance times the lowest recent latency of the same kind of
+    request (verb, resource, collection or single object). Bulk jobs can thus
+    use the capacity available without tuning QPS per cluster:
+
+        limiter = AdaptiveConcurrencyLimiter(max_limit=200)
+        api = pykube.HTTPClient(config, concurrency_limiter=limiter)
+
+    Each attempt of a retried request is limited and measured on its own.
+    Watches (streaming requests) are not limited.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 10,
+        min_limit: float = 1,
+        max_limit: float = 100,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 2.0,
+        overload_status_codes: Tuple[int, ...] = (429, 503),
+    ):
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("limits must satisfy 1 <= min <= initial <= max")
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.overload_status_codes = overload_status_codes
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        self._min_latencies: Dict[Optional[RequestClass], float] = {}
+        self._last_decrease = float("-inf")
+        self.requests = 0
+        self.overloaded = 0
+        self.decreases = 0
+        self.rejected_by_priority_level: Dict[str, int] = {}
+
+    def acquire(self) -> float:
+        """
+        Block until another request may be sent, return the start time to pass
+        to release().
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            self.requests += 1
+        return time.monotonic()
+
+    def release(self, start: float, response=None, kind: Optional[RequestClass] = None):
+        """
+        Finish a request started at start, adjusting the limit to its response
+        (None if the request failed without response). Latencies are compared
+        with earlier requests of the same kind (see request_class).
+        """
+        now = time.monotonic()
+        latency = now - start
+        with self._condition:
+            self.in_flight -= 1
+            if response is not None:
+                if self._is_overloaded(response, latency, kind):
+                    self.overloaded += 1
+                    # all requests in flight see the same overload, only
+                    # decrease once for them
+                    if start > self._last_decrease:
+                        self._last_decrease = now
+                        self.decreases += 1
+                        self.limit = max(
+                            self.min_limit, self.limit * self.backoff_ratio
+                        )
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _is_overloaded(
+        self, response, latency: float, kind: Optional[RequestClass]
+    ) -> bool:
+        if response.status_code in self.overload_status_codes:
+            if response.status_code == 429:
+                priority_level = response.headers.get(PRIORITY_LEVEL_HEADER)
+                if priority_level:
+                    counts = self.rejected_by_priority_level
+                    counts[priority_level] = counts.get(priority_level, 0) + 1
+            return True
+        min_latency = self._min_latencies.get(kind)
+        if min_latency is None or latency < min_latency:
+            self._min_latencies[kind] = latency
+            return False
+        # let the baseline follow slowly if the API server got slower for good
+        min_latency += (latency - min_latency) * 0.01
+        self._min_latencies[kind] = min_latency
+        return latency > max(
+            min_latency * self.latency_tolerance,
+            min_latency + MIN_LATENCY_INCREASE,
+        )
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "requests": self.requests,
+                "overloaded": self.overloaded,
+                "decreases": self.decreases,
+                "rejected_by_priority_level": dict(self.rejected_by_priority_level),
+            }
@@ -0,0 +1,287 @@
+"""
+Hedged requests: send a duplicate of a slow read and use whichever response
+arrives first.
+"""
+
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import socket
+import threading
+import time
+from typing import Callable
+from typing import Optional
+
+LOG = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Thread-safe window of the most recent latencies
+    """
+
+    def __init__(self, window: int = 1000):
+        self._latencies: collections.deque = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def add(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Return the q-th (0 < q < 1) percentile, None if there are no latencies
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+class _Timer:
+    """
+    Single background thread calling functions after a delay
+    """
+
+    def __init__(self):
+        self._queue: list = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def call_later(self, delay: float, func: Callable):
+        with self._cond:
+            deadline = time.monotonic() + delay
+            heapq.heappush(self._queue, (deadline, next(self._counter), func))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pykube-hedge-timer", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue or self._queue[0][0] > time.monotonic():
+                    timeout = (
+                        self._queue[0][0] - time.monotonic() if self._queue else None
+                    )
+                    self._cond.wait(timeout)
+                _, _, func = heapq.heappop(self._queue)
+            try:
+                func()
+            except Exception:
+                LOG.exception("Hedge timer callback failed")
+
+
+_timer = _Timer()
+_local = threading.local()
+
+
+class _Attempt:
+    """
+    State of one hedged call: the connections used by the primary attempt on
+    the calling thread and the hedge running in the pool, if any.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections: set = set()
+        self.primary_done = False
+        self.hedge: Optional[concurrent.futures.Future] = None
+        self.hedge_won = False
+
+    def abort_primary(self):
+        # called with the lock held, after the hedge returned a response
+        self.hedge_won = True
+        for conn in self.connections:
+            sock = getattr(conn, "sock", None)
+            if sock is not None:
+                try:
+                    # not SSLSocket.shutdown, which unwraps the socket
+                    socket.socket.shutdown(sock, socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def track_connection(conn):
+    """
+    Remember a connection checked out by the primary attempt of a hedged call
+    on this thread, so that it can be shut down if the hedge wins.
+    """
+    attempt = getattr(_local, "attempt", None)
+    if attempt is not None:
+        with attempt.lock:
+            attempt.connections.add(conn)
+        conn._pykube_hedge_attempt = attempt
+
+
+def untrack_connection(conn):
+    """
+    Forget a connection before it is returned to the pool
+    """
+    attempt = conn.__dict__.pop("_pykube_hedge_attempt", None)
+    if attempt is not None:
+        with attempt.lock:
+            attempt.connections.discard(conn)
+
+
+def primary_aborted() -> bool:
+    """
+    Whether the hedge of the call running on this thread won, so that the
+    primary attempt must not be retried
+    """
+    attempt = getattr(_local, "attempt", None)
+    return attempt is not None and attempt.hedge_won
+
+
+class HedgePolicy:
+    """
+    Hedge GET requests: if there is no response after delay seconds (by
+    default the observed 95th percentile latency), send the request again and
+    use the first response. At most max_hedge_ratio of the requests are
+    hedged, so that hedging cannot add much load when the API server is slow
+    for everybody:
+
+        api = pykube.HTTPClient(config, hedge_policy=HedgePolicy())
+
+    The request is sent on the calling thread, only hedges run in a thread
+    pool of max_workers threads. If the hedge wins, the connection of the
+    first request is shut down (for the default transport; other transports
+    return once the first request finished). Watches (streaming requests)
+    are never hedged.
+    """
+
+    def __init__(
+        self,
+        delay: Optional[float] = None,
+        percentile: float = 0.95,
+        min_delay: float = 0.01,
+        min_samples: int = 20,
+        max_hedge_ratio: float = 0.05,
+        max_workers: int = 32,
+        window: int = 1000,
+    ):
+        self.delay = delay
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_hedge_ratio = max_hedge_ratio
+        self.latencies = LatencyTracker(window)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pykube-hedge"
+        )
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Return the seconds to wait before hedging, None to not hedge (yet)
+        """
+        if self.delay is not None:
+            return self.delay
+        if len(self.latencies) < self.min_samples:
+            return None
+        latency = self.latencies.percentile(self.percentile)
+        if latency is None:
+            return None
+        return max(self.min_delay, latency)
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            if self.hedged >= self.max_hedge_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def call(self, send: Callable, hedge: Optional[Callable] = None):
+        """
+        Call send(), hedging it with a call of hedge() (default: send) if it
+        is slow. Return the first response, close the other one.
+        """
+        with self._lock:
+            self.requests += 1
+        delay = self.hedge_delay()
+        start = time.monotonic()
+        if delay is None:
+            response = send()
+            self.latencies.add(time.monotonic() - start)
+            return response
+
+        attempt = _Attempt()
+        _timer.call_later(
+            delay, lambda: self._start_hedge(attempt, hedge or send, delay)
+        )
+        outer, _local.attempt = getattr(_local, "attempt", None), attempt
+        response = error = None
+        try:
+            response = send()
+        except Exception as e:
+            error = e
+        finally:
+            _local.attempt = outer
+            with attempt.lock:
+                attempt.primary_done = True
+                hedge_future = attempt.hedge
+                hedge_won = attempt.hedge_won
+
+        if hedge_future is None:
+            self.latencies.add(time.monotonic() - start)
+            if error is not None:
+                raise error
+            return response
+        if not hedge_won and error is None:
+            # the hedge's response is closed once it arrives
+            hedge_future.add_done_callback(_close_response)
+            self.latencies.add(time.monotonic() - start)
+            return response
+        if response is not None:
+            response.close()
+        try:
+            response = hedge_future.result()
+        except Exception:
+            if error is not None:
+                raise error
+            raise
+        self.latencies.add(time.monotonic() - start)
+        with self._lock:
+            self.hedge_wins += 1
+        return response
+
+    def _start_hedge(self, attempt: _Attempt, hedge: Callable, delay: float):
+        with attempt.lock:
+            if attempt.primary_done or not self._allow_hedge():
+                return
+            LOG.debug(f"Hedging request after {delay:.3f}s")
+            attempt.hedge = self._executor.submit(hedge)
+        attempt.hedge.add_done_callback(lambda f: self._hedge_done(attempt, f))
+
+    def _hedge_done(self, attempt: _Attempt, future: concurrent.futures.Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        with attempt.lock:
+            if not attempt.primary_done:
+                attempt.abort_primary()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "delay": self.hedge_delay(),
+            }
+
+
+def _close_response(future: concurrent.futures.Future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
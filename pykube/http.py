@@ -1,13 +1,20 @@
 # HTTP request related code.
 import base64
 import datetime
-import json
+import functools
 import logging
 import os
+import queue
 import shlex
+import socket
+import ssl
 import subprocess
 import tempfile
+import threading
+import time
+from typing import List
 from typing import Optional
+from typing import Union
 
 try:
     import google.auth
@@ -23,45 +30,288 @@ try:
 except ImportError:
     oidc_auth_installed = False
 
+import certifi
 import requests.adapters
+import urllib3
 
 from http import HTTPStatus
 from urllib.parse import urlparse
 
+from .credentials import cache_key
+from .credentials import CredentialCache
+from .credentials import default_cache
+from .credentials import parse_timestamp
+from .endpoints import endpoint_pool
+from .endpoints import EndpointPool
 from .exceptions import HTTPError, PyKubeError
+from .flowcontrol import AdaptiveConcurrencyLimiter
+from .flowcontrol import RateLimiter
+from .flowcontrol import request_class
+from .hedging import HedgePolicy
+from .hedging import primary_aborted
+from .hedging import track_connection
+from .hedging import untrack_connection
+from .retry import RetryPolicy
+from .serialization import accept_header
+from .serialization import codec_for
+from .serialization import json_loads
+from .serialization import JSONCodec
+from .singleflight import RequestCoalescer
+from .transport import HTTP2
+from .transport import make_session
+from .transport import REQUESTS
 from .utils import jsonpath_installed, jsonpath_parse, join_url_path
+from .config import BytesOrFile
 from .config import KubeConfig
 
+from . import serialization
 from . import __version__
 
 DEFAULT_HTTP_TIMEOUT = 10  # seconds
+# connections kept per host for unary requests and for long-lived streams (watches)
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_WATCH_POOL_MAXSIZE = 50
 EXPIRY_SKEW_PREVENTION_DELAY = datetime.timedelta(minutes=5)
+# OIDC tokens are refreshed in the background this long before they become invalid
+OIDC_REFRESH_AHEAD = datetime.timedelta(minutes=5)
+# refreshed credentials are written to the kubeconfig file with this delay (seconds)
+PERSIST_CREDENTIALS_DELAY = 1
+MAX_CACHED_SSL_CONTEXTS = 16
+# TCP keepalive probes keep idle connections alive behind NAT gateways and load
+# balancers, which typically drop them after 350 seconds or more
+DEFAULT_KEEPALIVE_IDLE = 60  # seconds
+DEFAULT_KEEPALIVE_INTERVAL = 20  # seconds
+DEFAULT_KEEPALIVE_COUNT = 3
 UTC = datetime.timezone.utc
 LOG = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=64)
+def _jwt_expiry(token: str) -> Optional[float]:
+    """
+    Return the expiry ("exp" claim) of the JWT as timestamp, raise ValueError if
+    the token is not a valid JWT.
+    """
+    reserved_characters = frozenset(["=", "+", "/"])
+    if any(char in token for char in reserved_characters):
+        raise ValueError("JWT contains url-unsafe characters")
+    parts = token.split(".")
+    if len(parts) != 3:
+        raise ValueError("JWT must have three parts")
+    padding = (4 - len(parts[1]) % 4) * "="
+    if len(padding) == 3:
+        # According to spec, 3 padding characters cannot occur
+        # in a valid jwt
+        # https://tools.ietf.org/html/rfc7515#appendix-C
+        raise ValueError("invalid JWT payload length")
+    jwt_attributes = json_loads(base64.urlsafe_b64decode(parts[1] + padding))
+    return jwt_attributes.get("exp")
+
+
+def keepalive_socket_options(
+    idle: float = DEFAULT_KEEPALIVE_IDLE,
+    interval: float = DEFAULT_KEEPALIVE_INTERVAL,
+    count: int = DEFAULT_KEEPALIVE_COUNT,
+    user_timeout: Optional[float] = None,
+) -> List[tuple]:
+    """
+    Return socket options for TCP_NODELAY and TCP keepalive: probes are sent
+    after `idle` seconds without traffic and every `interval` seconds, the
+    connection is closed after `count` unanswered probes.
+
+    `user_timeout` (Linux only) closes connections with data unacknowledged for
+    that many seconds, e.g. after the peer disappeared.
+    """
+    options = [
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(idle)))
+    elif hasattr(socket, "TCP_KEEPALIVE"):
+        # macOS
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, int(idle)))
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, int(interval)))
+    if hasattr(socket, "TCP_KEEPCNT"):
+        options.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count))
+    if user_timeout is not None and hasattr(socket, "TCP_USER_TIMEOUT"):
+        options.append(
+            (socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, int(user_timeout * 1000))
+        )
+    return options
+
+
+class _PoolStatsMixin:
+    """
+    Count connections in use and connections discarded because the pool was full.
+    """
+
+    # attributes of urllib3.HTTPConnectionPool
+    pool: Optional[queue.LifoQueue]
+    num_connections: int
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.num_in_use = 0
+        self.num_discarded = 0
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        with self._stats_lock:
+            self.num_in_use += 1
+        track_connection(conn)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            untrack_connection(conn)
+        with self._stats_lock:
+            self.num_in_use -= 1
+            if conn is not None and self.pool is not None and self.pool.full():
+                self.num_discarded += 1
+        super()._put_conn(conn)
+
+    def stats(self) -> dict:
+        idle = sum(1 for conn in list(self.pool.queue) if conn) if self.pool else 0
+        return {
+            "in_use": self.num_in_use,
+            "idle": idle,
+            "created": self.num_connections,
+            "discarded": self.num_discarded,
+        }
+
+
+class _HTTPConnectionPool(_PoolStatsMixin, urllib3.HTTPConnectionPool):
+    pass
+
+
+class _HTTPSConnectionPool(_PoolStatsMixin, urllib3.HTTPSConnectionPool):
+    pass
+
+
+class CredentialState:
+    """
+    Client certificates, SSL contexts and the OIDC refresh lock of an adapter,
+    shared by the adapters of an HTTPClient (short requests and watches), so
+    that credentials are fetched and refreshed once.
+    """
+
+    def __init__(self):
+        # temporary files of exec plugin certificates (without SSLContext)
+        self.cert = None
+        self.key = None
+        # exec plugin status with client certificate and key
+        self.cert_credential = None
+        self.ssl_contexts: dict = {}
+        # held while refreshing the OIDC token
+        self.oidc_refresh_lock = threading.Lock()
+
+
+class _AuthRetry:
+    """
+    Retry of a request rejected with 401 Unauthorized, as returned by
+    KubernetesHTTPAdapter._setup_request_auth: refresh() renews the credential,
+    calling the retry also sends the original request again.
+    """
+
+    def __init__(self, adapter, request, refresh, on_success=None):
+        self.adapter = adapter
+        self.request = request
+        self.refresh = refresh
+        self.on_success = on_success
+
+    def __call__(self, send_kwargs):
+        self.refresh()
+        response = self.adapter.send(self.request, **send_kwargs)
+        if response.ok and self.on_success is not None:
+            self.on_success()
+        return response
+
+
 class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
     # _do_send: the actual send method of HTTPAdapter
     # it can be overwritten in unit tests to mock the actual HTTP calls
     _do_send = requests.adapters.HTTPAdapter.send
 
-    def __init__(self, kube_config: KubeConfig, **kwargs):
+    # certificates are passed to urllib3 as SSLContext (built in memory and cached)
+    # if requests allows to customize the connection pool key (requests>=2.32.2)
+    use_ssl_context = hasattr(
+        requests.adapters.HTTPAdapter, "build_connection_pool_key_attributes"
+    )
+
+    def __init__(
+        self,
+        kube_config: KubeConfig,
+        credential_cache: Optional[CredentialCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        socket_options: Optional[List[tuple]] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        credential_state: Optional[CredentialState] = None,
+        **kwargs,
+    ):
         self.kube_config = kube_config
+        self.retry_policy = retry_policy
+        # limits each attempt (not streams), so retry delays are not latency
+        self.concurrency_limiter = concurrency_limiter
+        # e.g. keepalive_socket_options(), default: TCP_NODELAY (urllib3)
+        self.socket_options = socket_options
+        # credentials of exec plugins and GCP cmd-path are cached until expiry
+        self.credential_cache = (
+            default_cache if credential_cache is None else credential_cache
+        )
 
-        self.cert = None
-        self.key = None
+        self.credential_state = (
+            CredentialState() if credential_state is None else credential_state
+        )
 
         super().__init__(**kwargs)
 
+    def init_poolmanager(self, *args, **kwargs):
+        if self.socket_options is not None:
+            kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _HTTPConnectionPool,
+            "https": _HTTPSConnectionPool,
+        }
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        if self.socket_options is not None:
+            proxy_kwargs.setdefault("socket_options", self.socket_options)
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def pool_stats(self) -> dict:
+        """
+        Return the number of connections in use, idle, created and discarded
+        (because the pool was full) summed over the connection pools.
+        """
+        stats = {"pools": 0, "in_use": 0, "idle": 0, "created": 0, "discarded": 0}
+        pools = self.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if isinstance(pool, _PoolStatsMixin):
+                stats["pools"] += 1
+                for name, value in pool.stats().items():
+                    stats[name] += value
+        return stats
+
     def _persist_credentials(self, config, opts):
         user_name = config.contexts[config.current_context]["user"]
         user = [u["user"] for u in config.doc["users"] if u["name"] == user_name][0]
         auth_config = user["auth-provider"].setdefault("config", {})
         auth_config.update(opts)
-        config.persist_doc()
         config.reload()
+        config.persist_doc(delay=PERSIST_CREDENTIALS_DELAY)
+
+    def _auth_gcp(self, request, token, expiry, config, invalidate=None):
+        """
+        Authorize the request with the GCP token, return its _AuthRetry.
 
-    def _auth_gcp(self, request, token, expiry, config):
+        invalidate drops a cached cmd-path token, so that a rejected token is
+        fetched again instead of refreshed with the default credentials.
+        """
         original_request = request.copy()
 
         credentials = google.auth.default(
@@ -87,45 +337,74 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
             }
             self._persist_credentials(config, auth_opts)
 
-        def retry(send_kwargs):
-            credentials.refresh(auth_request)
-            response = self.send(original_request, **send_kwargs)
-            if response.ok and config:
-                auth_opts = {
-                    "access-token": credentials.token,
-                    "expiry": credentials.expiry,
-                }
-                self._persist_credentials(config, auth_opts)
-            return response
+        def persist():
+            auth_opts = {
+                "access-token": credentials.token,
+                "expiry": credentials.expiry,
+            }
+            self._persist_credentials(config, auth_opts)
 
-        return retry
+        return _AuthRetry(
+            self,
+            original_request,
+            invalidate or (lambda: credentials.refresh(auth_request)),
+            persist if config else None,
+        )
 
     def _is_valid_jwt(self, token):
         """Validate JWT token for correctness and near expiration"""
         if not token:
             return False
-        reserved_characters = frozenset(["=", "+", "/"])
-        if any(char in token for char in reserved_characters):
-            # Invalid jwt, as it contains url-unsafe chars
-            return False
-        parts = token.split(".")
-        if len(parts) != 3:  # Not a valid JWT
+        try:
+            expire = _jwt_expiry(token)
+        except ValueError:
             return False
-        padding = (4 - len(parts[1]) % 4) * "="
-        if len(padding) == 3:
-            # According to spec, 3 padding characters cannot occur
-            # in a valid jwt
-            # https://tools.ietf.org/html/rfc7515#appendix-C
+        # allow missing exp, but deny tokens that are about to expire soon
+        return (
+            expire is None
+            or expire - EXPIRY_SKEW_PREVENTION_DELAY.total_seconds() > time.time()
+        )
+
+    def _jwt_expires_soon(self, token):
+        """Whether a valid JWT should be refreshed ahead of its expiration"""
+        try:
+            expire = _jwt_expiry(token)
+        except ValueError:
             return False
-        jwt_attributes = json.loads(
-            base64.b64decode(parts[1] + padding).decode("utf-8")
+        refresh_at = expire and (
+            expire
+            - EXPIRY_SKEW_PREVENTION_DELAY.total_seconds()
+            - OIDC_REFRESH_AHEAD.total_seconds()
         )
-        expire = jwt_attributes.get("exp")
-        # allow missing exp, but deny tokens that are about to expire soon
-        return expire is None or (
-            datetime.datetime.fromtimestamp(expire, tz=UTC)
-            - EXPIRY_SKEW_PREVENTION_DELAY
-        ) > datetime.datetime.utcnow().replace(tzinfo=UTC)
+        return refresh_at is not None and refresh_at <= time.time()
+
+    def _refresh_oidc_token_once(self, config, id_token, locked=False):
+        """
+        Refresh the OIDC token unless another thread already replaced id_token.
+        """
+        if not locked:
+            self.credential_state.oidc_refresh_lock.acquire()
+        try:
+            auth_config = config.user["auth-provider"].get("config", {})
+            if auth_config.get("id-token") != id_token:
+                return
+            self._refresh_oidc_token(config)
+        # ignoring all exceptions, rely on retries
+        except Exception as oidc_exc:
+            LOG.warning(f"Failed to refresh OpenID token: {oidc_exc}")
+        finally:
+            self.credential_state.oidc_refresh_lock.release()
+
+    def _refresh_oidc_token_in_background(self, config, id_token):
+        if not self.credential_state.oidc_refresh_lock.acquire(blocking=False):
+            # already refreshing
+            return
+        threading.Thread(
+            target=self._refresh_oidc_token_once,
+            args=(config, id_token, True),
+            name="pykube-oidc-refresh",
+            daemon=True,
+        ).start()
 
     def _refresh_oidc_token(self, config):
         if not oidc_auth_installed:
@@ -176,7 +455,7 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
         retry_func = self._setup_request_auth(config, request, kwargs)
         self._setup_request_certificates(config, request, kwargs)
 
-        response = self._do_send(request, **kwargs)
+        response = self._send_with_retries(request, kwargs)
 
         _retry_status_codes = {HTTPStatus.UNAUTHORIZED}
 
@@ -191,6 +470,138 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
 
         return response
 
+    def warmup(self, request, connections: int = 1, **kwargs) -> int:
+        """
+        Fetch the credentials for the request (e.g. run the exec plugin) and
+        make sure that `connections` connections to its host are open, so that
+        the first requests do not wait for them. No request is sent, except by
+        transports that cannot connect without one (HTTP2Adapter sends
+        `request` once).
+
+        Return the number of connections opened.
+        """
+        config = kwargs.pop("kube_config", self.kube_config)
+        self._setup_request_auth(config, request, kwargs)
+        self._setup_request_certificates(config, request, kwargs)
+        return self._open_connections(request, connections, **kwargs)
+
+    def _open_connections(
+        self, request, connections, timeout=None, verify=True, cert=None, proxies=None
+    ) -> int:
+        if hasattr(self, "get_connection_with_tls_context"):
+            pool = self.get_connection_with_tls_context(
+                request, verify, proxies=proxies, cert=cert
+            )
+        else:
+            pool = self.get_connection(request.url, proxies)
+        self.cert_verify(pool, request.url, verify, cert)
+        if not isinstance(pool, urllib3.HTTPConnectionPool) or pool.pool is None:
+            # not a pool of (reusable) HTTP connections
+            return 0
+        if isinstance(timeout, tuple):
+            timeout = timeout[0]
+        opened = 0
+        conns = []
+        try:
+            # idle connections are returned first, then new ones
+            for _ in range(min(connections, pool.pool.maxsize)):
+                conn = pool._get_conn()
+                conns.append(conn)
+                if getattr(conn, "sock", None) is not None:
+                    continue
+                conn.timeout = timeout
+                if (
+                    pool.proxy is not None
+                    and isinstance(pool, urllib3.HTTPSConnectionPool)
+                    and isinstance(conn, urllib3.connection.HTTPSConnection)
+                ):
+                    # CONNECT tunnel through the proxy
+                    pool._prepare_proxy(conn)
+                else:
+                    conn.connect()
+                opened += 1
+        except (OSError, urllib3.exceptions.HTTPError) as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        finally:
+            for conn in conns:
+                pool._put_conn(conn)
+        return opened
+
+    def _send_attempt(self, request, kwargs):
+        limiter = self.concurrency_limiter
+        if limiter is None or kwargs.get("stream"):
+            return self._do_send(request, **kwargs)
+        start = limiter.acquire()
+        response = None
+        try:
+            response = self._do_send(request, **kwargs)
+            return response
+        finally:
+            limiter.release(start, response, request_class(request.method, request.url))
+
+    def _send_with_retries(self, request, kwargs):
+        policy = self.retry_policy
+        if policy is None or not isinstance(request.body, (bytes, str, type(None))):
+            # streamed request bodies cannot be sent again
+            return self._send_attempt(request, kwargs)
+        policy.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                response = self._send_attempt(request, kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                delay = policy.retry_delay(request.method, attempt, error=e)
+                if delay is None or primary_aborted():
+                    # a hedged request which lost does not need to be retried
+                    raise
+                LOG.debug(f"Retrying {request.method} {request.url} after {e}")
+            else:
+                delay = policy.retry_delay(request.method, attempt, response=response)
+                if delay is None:
+                    return response
+                LOG.debug(
+                    f"Retrying {request.method} {request.url} after HTTP {response.status_code}"
+                )
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def _exec_credential(self, exec_conf):
+        """
+        Run the exec credential plugin, return its status and expiry.
+        """
+        cmd_env_vars = dict(os.environ)
+        for env_var in exec_conf.get("env") or []:
+            cmd_env_vars[env_var["name"]] = env_var["value"]
+
+        output = subprocess.check_output(
+            [exec_conf["command"]] + (exec_conf.get("args") or []), env=cmd_env_vars
+        )
+
+        status = json_loads(output)["status"]
+        expiry = status.get("expirationTimestamp")
+        return status, parse_timestamp(expiry) if expiry else None
+
+    def _gcp_cmd_credential(self, auth_config):
+        """
+        Run the GCP cmd-path command, return the token and expiry.
+        """
+        output = subprocess.check_output(
+            [auth_config["cmd-path"]] + shlex.split(auth_config["cmd-args"])
+        )
+        parsed = json_loads(output)
+        credential = {
+            "token": jsonpath_parse(auth_config["token-key"], parsed),
+            "expiry": jsonpath_parse(auth_config["expiry-key"], parsed),
+        }
+        expiry = datetime.datetime.strptime(
+            credential["expiry"], "%Y-%m-%dT%H:%M:%SZ"
+        ).replace(tzinfo=UTC)
+        return credential, expiry
+
     def _setup_request_auth(self, config, request, kwargs):
         """
         Set up authorization for the request.
@@ -218,32 +629,34 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
                     f"auth exec api version {api_version} not implemented"
                 )
 
-            cmd_env_vars = dict(os.environ)
-            for env_var in exec_conf.get("env") or []:
-                cmd_env_vars[env_var["name"]] = env_var["value"]
-
-            output = subprocess.check_output(
-                [exec_conf["command"]] + (exec_conf.get("args") or []), env=cmd_env_vars
+            key = cache_key(exec_conf, config.cluster.get("server"))
+            status = self.credential_cache.get(
+                key, lambda: self._exec_credential(exec_conf)
             )
-
-            parsed_out = json.loads(output)
-            status = parsed_out["status"]
+            original_request = request.copy()
 
             if status.get("token"):
                 token = status["token"]
                 request.headers["Authorization"] = "Bearer {}".format(token)
             elif status.get("clientCertificateData") and status.get("clientKeyData"):
-                self.cert = tempfile.NamedTemporaryFile(mode="w")
-                self.cert.write(status["clientCertificateData"])
-                self.cert.file.flush()
-                self.key = tempfile.NamedTemporaryFile(mode="w")
-                self.key.write(status["clientKeyData"])
-                self.key.file.flush()
+                state = self.credential_state
+                if status is not state.cert_credential and not self.use_ssl_context:
+                    state.cert = tempfile.NamedTemporaryFile(mode="w")
+                    state.cert.write(status["clientCertificateData"])
+                    state.cert.file.flush()
+                    state.key = tempfile.NamedTemporaryFile(mode="w")
+                    state.key.write(status["clientKeyData"])
+                    state.key.file.flush()
+                state.cert_credential = status
             else:
                 raise NotImplementedError(
                     "Did not find the expected token or certificates."
                 )
-            return None
+
+            # the credential was rejected, run the command again
+            return _AuthRetry(
+                self, original_request, lambda: self.credential_cache.invalidate(key)
+            )
 
         if config.user.get("username") and config.user.get("password"):
             request.prepare_auth((config.user["username"], config.user["password"]))
@@ -259,16 +672,30 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
                     )
                 auth_config = auth_provider.get("config", {})
                 if "cmd-path" in auth_config:
-                    output = subprocess.check_output(
-                        [auth_config["cmd-path"]] + shlex.split(auth_config["cmd-args"])
+                    key = cache_key(
+                        {
+                            name: auth_config.get(name)
+                            for name in (
+                                "cmd-path",
+                                "cmd-args",
+                                "token-key",
+                                "expiry-key",
+                            )
+                        }
+                    )
+                    credential = self.credential_cache.get(
+                        key, lambda: self._gcp_cmd_credential(auth_config)
                     )
-                    parsed = json.loads(output)
-                    token = jsonpath_parse(auth_config["token-key"], parsed)
                     expiry = datetime.datetime.strptime(
-                        jsonpath_parse(auth_config["expiry-key"], parsed),
-                        "%Y-%m-%dT%H:%M:%SZ",
+                        credential["expiry"], "%Y-%m-%dT%H:%M:%SZ"
+                    )
+                    retry_func = self._auth_gcp(
+                        request,
+                        credential["token"],
+                        expiry,
+                        None,
+                        lambda: self.credential_cache.invalidate(key),
                     )
-                    retry_func = self._auth_gcp(request, token, expiry, None)
                 else:
                     retry_func = self._auth_gcp(
                         request,
@@ -279,12 +706,12 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
                 return retry_func
             elif auth_provider.get("name") == "oidc":
                 auth_config = auth_provider.get("config", {})
-                if not self._is_valid_jwt(auth_config.get("id-token")):
-                    try:
-                        self._refresh_oidc_token(config)
-                    # ignoring all exceptions, rely on retries
-                    except Exception as oidc_exc:
-                        LOG.warning(f"Failed to refresh OpenID token: {oidc_exc}")
+                id_token = auth_config.get("id-token")
+                if not self._is_valid_jwt(id_token):
+                    self._refresh_oidc_token_once(config, id_token)
+                elif self._jwt_expires_soon(id_token):
+                    # still valid, keep using it while the new one is fetched
+                    self._refresh_oidc_token_in_background(config, id_token)
 
                 # not using auth_config handle here as the config might have
                 # been reloaded during token refresh
@@ -295,10 +722,24 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
         return None
 
     def _setup_request_certificates(self, config, request, kwargs):
-        if self.cert and self.key:
+        if not (self.use_ssl_context and self._setup_ssl_context(config, kwargs)):
+            self._setup_certificate_files(config, kwargs)
+        # support for tls-server-name
+        if "tls-server-name" in config.cluster:
+            connection_pool_kwargs = self.poolmanager.connection_pool_kw
+            connection_pool_kwargs["assert_hostname"] = config.cluster[
+                "tls-server-name"
+            ]
+            connection_pool_kwargs["server_hostname"] = config.cluster[
+                "tls-server-name"
+            ]
+
+    def _setup_certificate_files(self, config, kwargs):
+        state = self.credential_state
+        if state.cert and state.key:
             kwargs["cert"] = (
-                self.cert.name,
-                self.key.name,
+                state.cert.name,
+                state.key.name,
             )
         if "client-certificate" in config.user:
             kwargs["cert"] = (
@@ -312,15 +753,123 @@ class KubernetesHTTPAdapter(requests.adapters.HTTPAdapter):
             kwargs["verify"] = config.cluster["certificate-authority"].filename()
         elif "insecure-skip-tls-verify" in config.cluster:
             kwargs["verify"] = not config.cluster["insecure-skip-tls-verify"]
-        # support for tls-server-name
-        if "tls-server-name" in config.cluster:
-            connection_pool_kwargs = self.poolmanager.connection_pool_kw
-            connection_pool_kwargs["assert_hostname"] = config.cluster[
-                "tls-server-name"
-            ]
-            connection_pool_kwargs["server_hostname"] = config.cluster[
-                "tls-server-name"
-            ]
+
+    def _setup_ssl_context(self, config, kwargs) -> bool:
+        """
+        Pass the SSLContext with the kubeconfig's CA and client certificate as
+        "verify", return False if certificates are to be set up as files.
+        """
+        if os.environ.get("PYKUBE_SSL_CERTIFICATE_AUTHORITY") is not None:
+            return False
+        ca = config.cluster.get("certificate-authority")
+        if ca is None and config.cluster.get("insecure-skip-tls-verify"):
+            return False
+        if "client-certificate" in config.user:
+            cert = config.user["client-certificate"]
+            key = config.user["client-key"]
+        elif self.credential_state.cert_credential:
+            credential = self.credential_state.cert_credential
+            cert = credential["clientCertificateData"].encode("utf-8")
+            key = credential["clientKeyData"].encode("utf-8")
+        else:
+            cert = key = None
+        if ca is None and cert is None:
+            # nothing to load, use the default context of requests
+            return False
+        if ca is None:
+            # the session decides, e.g. verify=False or REQUESTS_CA_BUNDLE
+            verify = kwargs.get("verify", True)
+            if verify is False:
+                return False
+            if isinstance(verify, str):
+                ca = verify
+        kwargs["verify"] = self._ssl_context(ca, cert, key)
+        kwargs["cert"] = None
+        return True
+
+    def _ssl_context(self, ca, cert, key) -> ssl.SSLContext:
+        """
+        Return the SSLContext for the CA and client certificate, which are given
+        as bytes or BytesOrFile (the CA also as path of a CA bundle, None for
+        the bundle of requests). Contexts are cached until the content changes.
+        """
+        cache_key = tuple(
+            source.fingerprint() if isinstance(source, BytesOrFile) else source
+            for source in (ca, cert, key)
+        )
+        ssl_contexts = self.credential_state.ssl_contexts
+        context = ssl_contexts.get(cache_key)
+        if context is None:
+            ca, cert, key = (
+                source.bytes() if isinstance(source, BytesOrFile) else source
+                for source in (ca, cert, key)
+            )
+            if ca is None:
+                context = ssl.create_default_context(cafile=certifi.where())
+            elif isinstance(ca, str):
+                if os.path.isdir(ca):
+                    context = ssl.create_default_context(capath=ca)
+                else:
+                    context = ssl.create_default_context(cafile=ca)
+            elif ca.lstrip().startswith(b"-----"):
+                context = ssl.create_default_context(cadata=ca.decode("ascii"))
+            else:
+                # DER encoded
+                context = ssl.create_default_context(cadata=ca)
+            if cert is not None:
+                load_cert_chain(context, cert.rstrip(b"\n") + b"\n" + key)
+            if len(ssl_contexts) >= MAX_CACHED_SSL_CONTEXTS:
+                # e.g. rotated certificates
+                ssl_contexts.clear()
+            ssl_contexts[cache_key] = context
+        return context
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        if isinstance(verify, ssl.SSLContext):
+            host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+                request, True, None
+            )
+            pool_kwargs["ssl_context"] = verify
+            return host_params, pool_kwargs
+        return super().build_connection_pool_key_attributes(request, verify, cert)
+
+    def cert_verify(self, conn, url, verify, cert):
+        if isinstance(verify, ssl.SSLContext):
+            # all certificates are loaded into the SSL context of the pool
+            if url.lower().startswith("https"):
+                conn.cert_reqs = "CERT_REQUIRED"
+                conn.ca_certs = None
+                conn.ca_cert_dir = None
+                conn.cert_file = None
+                conn.key_file = None
+            return
+        super().cert_verify(conn, url, verify, cert)
+
+
+def load_cert_chain(context: ssl.SSLContext, data: bytes):
+    """
+    Load the PEM client certificate and key into the context without writing
+    them to disk if possible (memfd, Linux only), otherwise from a temporary
+    file which is deleted right away.
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("pykube-client-cert")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                context.load_cert_chain(f"/proc/self/fd/{fd}")
+            return
+        except FileNotFoundError:
+            # /proc is not mounted
+            pass
+    fd, path = tempfile.mkstemp(suffix=".pem")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        context.load_cert_chain(path)
+    finally:
+        os.unlink(path)
 
 
 class HTTPClient:
@@ -337,27 +886,258 @@ class HTTPClient:
         dry_run: bool = False,
         verify: bool = True,
         http_adapter: Optional[requests.adapters.HTTPAdapter] = None,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        watch_pool_maxsize: int = DEFAULT_WATCH_POOL_MAXSIZE,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        endpoints: Union[List[str], EndpointPool, None] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        codecs: Optional[List] = None,
+        json_codec: Optional[JSONCodec] = None,
+        transport: str = REQUESTS,
+        socket_options: Optional[List[tuple]] = None,
     ):
         """
         Creates a new instance of the HTTPClient.
 
+        Streaming requests (watches) use a separate session and connection pool,
+        so that long-lived streams never take the connections of short requests.
+        Streams that end soon (e.g. a streamed list) are sent with
+        watch_pool=False like short requests, except for coalescing.
+        A given http_adapter is used for both. Headers, verify, cert, proxies
+        and auth of self.session also apply to watches; adapters mounted on
+        self.session after construction do not.
+
         :Parameters:
            - `config`: The configuration instance
+           - `pool_maxsize`: Connections kept per host for short requests
+           - `watch_pool_maxsize`: Connections kept per host for streams
+           - `rate_limiter`: Client-side rate limit for requests except watches
+           - `retry_policy`: Retries of failed requests except watches
+           - `concurrency_limiter`: Adaptive limit of concurrent requests except
+             watches, applied to each attempt by the adapter (like
+             `retry_policy`, not used with a given http_adapter)
+           - `hedge_policy`: Hedging of slow GET requests except watches
+           - `endpoints`: API server URLs to balance requests between (default:
+             "servers" of the kubeconfig cluster, if any)
+           - `coalescer`: Sharing of responses of identical concurrent GET requests
+           - `codecs`: Response formats to request in order of preference, e.g.
+             [CBORCodec()], falling back to JSON; response.json() decodes them
+           - `json_codec`: JSON library to encode request bodies and decode
+             responses and watch events with (default: the fastest installed,
+             see serialization.set_json_library)
+           - `transport`: "requests" (requests.Session), "direct" (lower
+             overhead per request, see transport.DirectSession) or "http2"
+             (requests and watches share connections, see http2.HTTP2Adapter)
+           - `socket_options`: Options of new connections, e.g.
+             keepalive_socket_options() to keep idle connections alive
         """
         self.config = config
         self.timeout = timeout
         self.url = self.config.cluster["server"]
         self.dry_run = dry_run
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.hedge_policy = hedge_policy
+        self.coalescer = coalescer
+        self.json_codec = json_codec or serialization.default_json_codec
+        self.codecs = [*(codecs or []), self.json_codec]
+        self._accept = accept_header(self.codecs) if codecs else None
+        # response.json() of requests always uses the json module
+        self._decode_responses = bool(
+            codecs or json_codec or self.json_codec.library != "json"
+        )
+        self.endpoints = endpoint_pool(
+            self.config.cluster.get("servers") if endpoints is None else endpoints
+        )
+
+        if http_adapter:
+            watch_http_adapter = http_adapter
+        elif transport == HTTP2:
+            # imported here as it extends KubernetesHTTPAdapter
+            from .http2 import HTTP2Adapter
+
+            # streams are multiplexed, so watches need no connections of their own
+            http_adapter = watch_http_adapter = HTTP2Adapter(
+                self.config,
+                retry_policy=retry_policy,
+                concurrency_limiter=concurrency_limiter,
+                socket_options=socket_options,
+                pool_maxsize=pool_maxsize,
+            )
+        else:
+            http_adapter = self.http_adapter_cls(
+                self.config,
+                retry_policy=retry_policy,
+                concurrency_limiter=concurrency_limiter,
+                socket_options=socket_options,
+                pool_maxsize=pool_maxsize,
+            )
+            watch_http_adapter = self.http_adapter_cls(
+                self.config,
+                socket_options=socket_options,
+                pool_maxsize=watch_pool_maxsize,
+                credential_state=http_adapter.credential_state,
+            )
+        self.http_adapter = http_adapter
+        self.watch_http_adapter = watch_http_adapter
 
-        session = requests.Session()
+        session = make_session(transport)
         session.headers["User-Agent"] = f"new-pykube/{__version__}"
-        if not http_adapter:
-            http_adapter = self.http_adapter_cls(self.config)
         session.mount("https://", http_adapter)
         session.mount("http://", http_adapter)
         self.session = session
         self.session.verify = verify
 
+        watch_session = make_session(transport)
+        # share the headers, e.g. if they are changed after creating the client
+        watch_session.headers = session.headers
+        watch_session.mount("https://", watch_http_adapter)
+        watch_session.mount("http://", watch_http_adapter)
+        self.watch_session = watch_session
+        self.watch_session.verify = verify
+
+    def pool_stats(self) -> dict:
+        """
+        Return connection pool statistics for short requests ("default") and
+        streams ("watch"), see KubernetesHTTPAdapter.pool_stats.
+        """
+        stats = {}
+        for name, adapter in (
+            ("default", self.http_adapter),
+            ("watch", self.watch_http_adapter),
+        ):
+            if hasattr(adapter, "pool_stats"):
+                stats[name] = adapter.pool_stats()
+        return stats
+
+    def warmup(self, connections: int = 1, watch_connections: int = 0) -> int:
+        """
+        Fetch credentials and open connections to the API server(s) ahead of
+        the first requests, e.g. right after starting a short-lived process.
+        The http2 transport sends a GET /version request to open a connection.
+
+        :Parameters:
+           - `connections`: Connections to open for short requests (per endpoint)
+           - `watch_connections`: Connections to open for streams (per endpoint)
+
+        Return the number of connections opened.
+        """
+        urls = (
+            [self.url]
+            if self.endpoints is None
+            else [endpoint.url for endpoint in self.endpoints.endpoints]
+        )
+        opened = 0
+        for session, count in (
+            (self.session, connections),
+            (self.watch_session, watch_connections),
+        ):
+            if count <= 0:
+                continue
+            for url in urls:
+                request = requests.Request("GET", url + "/version").prepare()
+                adapter = session.get_adapter(request.url)
+                if not hasattr(adapter, "warmup"):
+                    # custom http_adapter
+                    continue
+                # same connection pool as requests, e.g. with REQUESTS_CA_BUNDLE
+                settings = session.merge_environment_settings(
+                    request.url, {}, None, None, None
+                )
+                opened += adapter.warmup(
+                    request,
+                    count,
+                    timeout=self.timeout,
+                    verify=settings["verify"],
+                    cert=settings["cert"],
+                    proxies=settings["proxies"],
+                )
+        return opened
+
+    def _request(self, _func: str, *args, **kwargs):
+        # _func is the session method, e.g. "get" or "request"; the name must
+        # not clash with the "method" keyword of request()
+        kwargs = self.get_kwargs(**kwargs)
+        if _func == "request":
+            verb = (kwargs["method"] if "method" in kwargs else args[0]).upper()
+        else:
+            verb = _func.upper()
+        if kwargs.pop("watch_pool", kwargs.get("stream")):
+            # long-lived streams (watches) use their own connection pool
+            self._share_session_settings()
+            return self._send(self.watch_session, _func, verb, args, kwargs)
+        if kwargs.get("stream"):
+            # the caller reads the body, so the response cannot be shared
+            return self._send_limited(_func, verb, args, kwargs)
+        response = self._send_coalesced(_func, verb, args, kwargs)
+        if self._decode_responses:
+            codec = codec_for(response.headers.get("Content-Type"), self.codecs)
+            if codec is not None:
+                response.json = lambda **kwargs: codec.decode(response.content)
+        return response
+
+    def _share_session_settings(self):
+        # settings changed on self.session after construction apply to watches too
+        for name in ("verify", "cert", "proxies", "auth", "trust_env"):
+            if hasattr(self.session, name):
+                setattr(self.watch_session, name, getattr(self.session, name))
+
+    def _send_coalesced(self, method: str, verb: str, args, kwargs):
+        if self.coalescer is None:
+            return self._send_limited(method, verb, args, kwargs)
+        if verb == "GET":
+            return self.coalescer.call(
+                self._coalescing_key(kwargs),
+                functools.partial(self._send_limited, method, verb, args, kwargs),
+            )
+        try:
+            return self._send_limited(method, verb, args, kwargs)
+        finally:
+            # read your own writes
+            self.coalescer.invalidate()
+
+    def _coalescing_key(self, kwargs: dict):
+        """
+        Identical GET requests have the same final URL and headers
+        """
+        prepared = requests.PreparedRequest()
+        prepared.prepare_url(kwargs["url"], kwargs.get("params"))
+        headers = requests.sessions.merge_setting(
+            kwargs.get("headers"), self.session.headers
+        )
+        return prepared.url, tuple(sorted((k.lower(), v) for k, v in headers.items()))
+
+    def _send_limited(self, method: str, verb: str, args, kwargs):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(verb, kwargs["url"])
+        send = functools.partial(self._send, self.session, method, verb, args, kwargs)
+        if self.hedge_policy is not None and verb == "GET":
+            return self.hedge_policy.call(
+                send, functools.partial(self._hedge, send, kwargs)
+            )
+        return send()
+
+    def _hedge(self, send, kwargs):
+        # a hedge is an additional request and counts against the rate limit;
+        # the concurrency limiter is applied by the adapter
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait("GET", kwargs["url"])
+        return send()
+
+    def _send(self, session, method: str, verb: str, args, kwargs):
+        if self.endpoints is None:
+            return getattr(session, method)(*args, **kwargs)
+        path = kwargs["url"][len(self.url) :]
+
+        def send(endpoint_url):
+            endpoint_kwargs = dict(kwargs, url=endpoint_url + path)
+            return getattr(session, method)(*args, **endpoint_kwargs)
+
+        return self.endpoints.call(verb, send)
+
     @property
     def url(self):
         return self._url
@@ -420,6 +1200,10 @@ class HTTPClient:
         url = kwargs.get("url", "")
         bits.append(url)
         kwargs["url"] = self.url + join_url_path(*bits, join_empty=True)
+        if self._accept is not None and not kwargs.get("stream"):
+            headers = kwargs.get("headers") or {}
+            if not any(name.lower() == "accept" for name in headers):
+                kwargs["headers"] = {**headers, "Accept": self._accept}
         if "timeout" not in kwargs:
             # apply default HTTP timeout
             kwargs["timeout"] = self.timeout
@@ -436,7 +1220,7 @@ class HTTPClient:
         except Exception:
             # attempt to provide a more specific exception based around what
             # Kubernetes returned as the error.
-            if resp.headers["content-type"] == "application/json":
+            if codec_for(resp.headers.get("content-type"), self.codecs):
                 payload = resp.json()
                 if payload["kind"] == "Status":
                     raise HTTPError(resp.status_code, payload["message"])
@@ -450,7 +1234,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.request(*args, **self.get_kwargs(**kwargs))
+        return self._request("request", *args, **kwargs)
 
     def get(self, *args, **kwargs):
         """
@@ -460,7 +1244,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.get(*args, **self.get_kwargs(**kwargs))
+        return self._request("get", *args, **kwargs)
 
     def options(self, *args, **kwargs):
         """
@@ -470,7 +1254,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.options(*args, **self.get_kwargs(**kwargs))
+        return self._request("options", *args, **kwargs)
 
     def head(self, *args, **kwargs):
         """
@@ -480,7 +1264,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.head(*args, **self.get_kwargs(**kwargs))
+        return self._request("head", *args, **kwargs)
 
     def post(self, *args, **kwargs):
         """
@@ -490,7 +1274,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.post(*args, **self.get_kwargs(**kwargs))
+        return self._request("post", *args, **kwargs)
 
     def put(self, *args, **kwargs):
         """
@@ -500,7 +1284,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.put(*args, **self.get_kwargs(**kwargs))
+        return self._request("put", *args, **kwargs)
 
     def patch(self, *args, **kwargs):
         """
@@ -510,7 +1294,7 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.patch(*args, **self.get_kwargs(**kwargs))
+        return self._request("patch", *args, **kwargs)
 
     def delete(self, *args, **kwargs):
         """
@@ -520,4 +1304,4 @@ class HTTPClient:
            - `args`: Non-keyword arguments
            - `kwargs`: Keyword arguments
         """
-        return self.session.delete(*args, **self.get_kwargs(**kwargs))
+        return self._request("delete", *args, **kwargs)
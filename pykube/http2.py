@@ -0,0 +1,440 @@
+"""
+HTTP/2 transport: all requests and watches to an API server share a few
+multiplexed connections.
+"""
+
+import logging
+import ssl
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+try:
+    import h2.errors
+    import h2.exceptions
+    import httpcore
+    import httpx
+
+    httpx_installed = True
+except ImportError:
+    httpx_installed = False
+
+import certifi
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .http import KubernetesHTTPAdapter
+
+LOG = logging.getLogger(__name__)
+
+# connection-specific headers are not allowed in HTTP/2
+HOP_BY_HOP_HEADERS = frozenset(
+    ["connection", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"]
+)
+
+
+class _ResponseReader:
+    """
+    File-like body of a streamed httpx response for requests.Response.raw.
+
+    read() returns as soon as data is available, so that watch events are not
+    delayed until a full chunk arrived. on_close is called once when the body
+    was read or closed, with whether the body was read completely.
+    """
+
+    def __init__(self, response: "httpx.Response", on_close: Callable[[bool], None]):
+        self._response = response
+        self._chunks = response.iter_bytes()
+        self._buffer = b""
+        self._complete = False
+        self._on_close: Optional[Callable[[bool], None]] = on_close
+
+    def read(self, amt=None, **kwargs) -> bytes:
+        if amt is None:
+            data = self._buffer + b"".join(iter(lambda: self.read(65536), b""))
+            self._buffer = b""
+            return data
+        if not self._buffer:
+            try:
+                self._buffer = next(self._chunks, b"")
+            except httpx.TransportError as e:
+                self.close()
+                raise requests.exceptions.ConnectionError(e)
+            if not self._buffer:
+                self._complete = True
+                self.close()
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._response.close()
+        on_close, self._on_close = self._on_close, None
+        if on_close is not None:
+            on_close(self._complete)
+
+    # called by requests.Response.close
+    release_conn = close
+
+
+def _timeout(timeout) -> "httpx.Timeout":
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+def _httpcore_internals() -> bool:
+    """
+    Return whether httpcore has the private attributes that _Connection uses
+    to count and cancel streams (those of httpcore 1.0), looked up in the code
+    which sets them.
+    """
+
+    def sets(func, *names: str) -> bool:
+        code = getattr(func, "__code__", None)
+        return code is not None and all(name in code.co_names for name in names)
+
+    return (
+        sets(httpx.HTTPTransport.__init__, "_pool")
+        and hasattr(httpcore.ConnectionPool, "connections")
+        and sets(httpcore.HTTPConnection.__init__, "_connection")
+        and sets(
+            httpcore.HTTP2Connection.__init__,
+            "_h2_state",
+            "_network_stream",
+            "_write_lock",
+        )
+        # only set by the first request
+        and sets(httpcore.HTTP2Connection.handle_request, "_max_streams")
+    )
+
+
+class _Connection:
+    """
+    One connection to the API server (an httpx client limited to a single
+    connection) and the number of its open streams.
+
+    Without access to httpcore's connection (tracked=False), the client is a
+    plain httpx client managing its own connections and stream limits.
+    """
+
+    def __init__(self, client: "httpx.Client", tracked: bool = True):
+        self.client = client
+        self.tracked = tracked
+        self.streams = 0
+        # held from allocating a stream ID until the request headers were sent:
+        # httpcore does not do this atomically, so that concurrent requests
+        # could open streams out of order (a protocol error)
+        self.lock = threading.Lock()
+
+    def _connection(self):
+        if not self.tracked:
+            return None
+        pool = getattr(self.client._transport, "_pool", None)
+        for connection in getattr(pool, "connections", []):
+            # httpcore.HTTPConnection wraps the HTTP/1.1 or HTTP/2 connection
+            # once it is established
+            connection = getattr(connection, "_connection", None)
+            if connection is not None:
+                return connection
+        return None
+
+    def max_streams(self) -> Optional[int]:
+        """
+        Return the number of concurrent streams the server allows (1 for
+        HTTP/1.1), None if not known yet (not connected).
+        """
+        connection = self._connection()
+        if connection is None:
+            return None
+        if ", HTTP/2," not in connection.info():
+            return 1
+        # set from the server's SETTINGS (at most 100, httpcore's own limit)
+        return getattr(connection, "_max_streams", None)
+
+    def reset_stream(self, extensions: dict):
+        """
+        Cancel the stream of a response closed before its end (e.g. a watch),
+        which httpcore does not do: the server would keep counting it against
+        the stream limit and keep sending data.
+        """
+        connection = self._connection()
+        stream_id = extensions.get("stream_id")
+        if (
+            stream_id is None
+            or connection is None
+            or getattr(connection, "_network_stream", None)
+            is not extensions.get("network_stream")
+        ):
+            # HTTP/1.1 or the connection was closed meanwhile
+            return
+        with connection._write_lock:
+            try:
+                connection._h2_state.reset_stream(
+                    stream_id, error_code=h2.errors.ErrorCodes.CANCEL
+                )
+                connection._network_stream.write(connection._h2_state.data_to_send())
+            except (h2.exceptions.ProtocolError, httpcore.NetworkError):
+                # the stream ended meanwhile or the connection is broken
+                pass
+
+    def info(self) -> Optional[str]:
+        connection = self._connection()
+        return None if connection is None else connection.info()
+
+
+class HTTP2Adapter(KubernetesHTTPAdapter):
+    """
+    KubernetesHTTPAdapter sending requests with HTTP/2 (httpx), falling back to
+    HTTP/1.1 if the server does not support it.
+
+    Authentication, client certificates and retries are set up by
+    KubernetesHTTPAdapter.send as for HTTP/1.1. Requests share a connection
+    until the server's limit of concurrent streams (MAX_CONCURRENT_STREAMS) is
+    reached, further requests open another connection.
+
+    Counting streams relies on internals of httpcore 1.0. With other versions,
+    a plain httpx client per TLS configuration sends the requests (httpx
+    shares connections up to their stream limit itself) and pool_stats() does
+    not report connections.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if not httpx_installed:
+            raise ImportError(
+                "missing dependencies for HTTP/2 support (try pip install new-pykube[http2]"
+            )
+        super().__init__(*args, **kwargs)
+        self._track_streams = _httpcore_internals()
+        if not self._track_streams:
+            LOG.warning(
+                "Unsupported httpcore version %s, HTTP/2 streams are not counted",
+                httpcore.__version__,
+            )
+        # connections per TLS configuration
+        self._connections: Dict[tuple, List[_Connection]] = {}
+        # notified when streams are closed or the stream limit becomes known
+        self._connections_changed = threading.Condition()
+
+    def _new_client(self, verify, cert) -> "httpx.Client":
+        options = {
+            "http2": True,
+            "verify": self._httpx_verify(verify, cert),
+            "limits": httpx.Limits(max_connections=1, max_keepalive_connections=1)
+            if self._track_streams
+            else httpx.Limits(),
+        }
+        if self.socket_options is not None:
+            # proxies from the environment are only used without a custom
+            # transport
+            options["transport"] = httpx.HTTPTransport(
+                socket_options=self.socket_options, **options
+            )
+        return httpx.Client(**options)
+
+    def _httpx_verify(self, verify, cert):
+        if isinstance(verify, ssl.SSLContext) or (verify is False and not cert):
+            return verify
+        if verify is False:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+        else:
+            cafile = certifi.where() if verify is True else verify
+            context = ssl.create_default_context(cafile=cafile)
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        elif cert:
+            context.load_cert_chain(cert)
+        return context
+
+    def _acquire_stream(self, verify, cert, timeout: Optional[float]) -> _Connection:
+        """
+        Return a connection with a free stream, opening a new connection if all
+        are at the server's stream limit. Wait at most `timeout` seconds for a
+        connection being set up.
+        """
+        key = (
+            verify if isinstance(verify, (bool, ssl.SSLContext)) else str(verify),
+            cert,
+        )
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._connections_changed:
+            if not self._track_streams:
+                connections = self._connections.setdefault(key, [])
+                if not connections:
+                    client = self._new_client(verify, cert)
+                    connections.append(_Connection(client, tracked=False))
+                connections[0].streams += 1
+                return connections[0]
+            while True:
+                connections = self._connections.setdefault(key, [])
+                chosen = None
+                connecting = False
+                for connection in connections:
+                    max_streams = connection.max_streams()
+                    if max_streams is None:
+                        # the first request sets up the connection, the
+                        # others wait for the server's stream limit
+                        if connection.streams == 0:
+                            chosen = connection
+                            break
+                        connecting = True
+                    elif connection.streams < max_streams:
+                        chosen = connection
+                        break
+                if chosen is None and not connecting:
+                    chosen = _Connection(self._new_client(verify, cert))
+                    connections.append(chosen)
+                if chosen is not None:
+                    chosen.streams += 1
+                    return chosen
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise requests.exceptions.ConnectTimeout(
+                        "Timed out waiting for a connection to the API server"
+                    )
+                self._connections_changed.wait(remaining)
+
+    def _release_stream(self, connection: _Connection):
+        with self._connections_changed:
+            connection.streams -= 1
+            self._connections_changed.notify_all()
+
+    def _notify(self):
+        with self._connections_changed:
+            self._connections_changed.notify_all()
+
+    def _do_send(
+        self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None
+    ):
+        timeout = _timeout(timeout)
+        connection = self._acquire_stream(verify, cert, timeout.connect)
+        try:
+            httpx_response = self._send_on(connection, request, timeout)
+        except BaseException:
+            self._release_stream(connection)
+            raise
+
+        response = requests.Response()
+        response.status_code = httpx_response.status_code
+        response.reason = httpx_response.reason_phrase
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        # the body is decoded already
+        response.headers.pop("Content-Encoding", None)
+        response.encoding = get_encoding_from_headers(response.headers)
+
+        def closed(complete: bool):
+            if not complete:
+                connection.reset_stream(httpx_response.extensions)
+            self._release_stream(connection)
+
+        response.raw = _ResponseReader(httpx_response, closed)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        if not stream:
+            try:
+                _ = response.content
+            finally:
+                response.raw.close()
+        return response
+
+    def _send_on(self, connection: _Connection, request, timeout: "httpx.Timeout"):
+        client = connection.client
+        headers = [
+            (name, value)
+            for name, value in request.headers.items()
+            if name.lower() not in HOP_BY_HOP_HEADERS
+        ]
+        held = False
+
+        def release():
+            nonlocal held
+            if held:
+                held = False
+                connection.lock.release()
+
+        def trace(event, info):
+            if event.endswith(
+                ("send_request_headers.complete", "send_request_headers.failed")
+            ):
+                release()
+                # the connection is set up
+                self._notify()
+            elif event == "http2.receive_remote_settings.complete":
+                # the server's stream limit may have changed
+                self._notify()
+
+        extensions = {"timeout": timeout.as_dict(), "trace": trace}
+        # tls-server-name of the kubeconfig cluster
+        server_name = self.poolmanager.connection_pool_kw.get("server_hostname")
+        if server_name:
+            extensions["sni_hostname"] = server_name
+        httpx_request = client.build_request(
+            request.method,
+            request.url,
+            headers=headers,
+            content=request.body,
+            extensions=extensions,
+        )
+        # only held by requests waiting for other streams of this connection
+        # to send their headers
+        if not connection.lock.acquire(
+            timeout=-1 if timeout.connect is None else timeout.connect
+        ):
+            raise requests.exceptions.ConnectTimeout(
+                "Timed out waiting for a connection to the API server",
+                request=request,
+            )
+        held = True
+        try:
+            return client.send(httpx_request, stream=True)
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        finally:
+            release()
+            self._notify()
+
+    def _open_connections(
+        self, request, connections, timeout=None, verify=True, cert=None, proxies=None
+    ) -> int:
+        # httpx cannot open connections without a request, so this sends
+        # `request`; a single one is enough for HTTP/2 as requests are
+        # multiplexed
+        before = self.pool_stats()["connections"]
+        response = self._do_send(
+            request, timeout=timeout, verify=verify, cert=cert, proxies=proxies
+        )
+        response.close()
+        return self.pool_stats()["connections"] - before
+
+    def pool_stats(self) -> dict:
+        """
+        Return the number of open connections, how many of them use HTTP/2 and
+        the number of open streams (requests and watches)
+        """
+        with self._connections_changed:
+            connections = [c for cs in self._connections.values() for c in cs]
+        infos = [c.info() for c in connections]
+        return {
+            "connections": sum(1 for info in infos if info is not None),
+            "http2": sum(1 for info in infos if info and ", HTTP/2," in info),
+            "streams": sum(c.streams for c in connections),
+        }
+
+    def close(self):
+        with self._connections_changed:
+            for connections in self._connections.values():
+                for connection in connections:
+                    connection.client.close()
+            self._connections.clear()
+        super().close()
@@ -0,0 +1,432 @@
+"""
+Informers: list and watch a resource and keep a local store of its objects.
+"""
+
+import logging
+import random
+import threading
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+import requests
+
+from .exceptions import HTTPError
+from .query import as_selector
+from .query import DEFAULT_CHUNK_SIZE
+from .query import everything
+from .query import object_key
+from .query import Query
+from .query import WatchQuery
+from .query import WATCH_TIMEOUT_SECONDS
+from .query import watch_timeout_seconds
+
+LOG = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 30
+
+
+def index_by_namespace(obj) -> List[str]:
+    namespace = obj.obj["metadata"].get("namespace")
+    return [namespace] if namespace else []
+
+
+def index_by_labels(obj) -> List[str]:
+    """
+    Index each label as "key=value"
+    """
+    labels = obj.obj["metadata"].get("labels") or {}
+    return [f"{key}={value}" for key, value in labels.items()]
+
+
+def index_by_node_name(obj) -> List[str]:
+    node_name = (obj.obj.get("spec") or {}).get("nodeName")
+    return [node_name] if node_name else []
+
+
+def index_by_owner_uid(obj) -> List[str]:
+    owner_references = obj.obj["metadata"].get("ownerReferences") or []
+    return [ref["uid"] for ref in owner_references]
+
+
+class Store:
+    """
+    Thread-safe in-memory store of API objects keyed by namespace/name.
+
+    Indexers map an object to a list of index values, e.g.
+
+        store = Store(indexers={"nodeName": index_by_node_name})
+        pods_on_node = store.by_index("nodeName", "node-1")
+
+    Indexes are maintained on every change, so index lookups cost O(result).
+    """
+
+    def __init__(self, indexers: Optional[Dict[str, Callable]] = None):
+        self._lock = threading.RLock()
+        self._objects: dict = {}
+        self._indexers: Dict[str, Callable] = {}
+        # index name => index value => set of object keys
+        self._indices: Dict[str, Dict[str, set]] = {}
+        for name, func in (indexers or {}).items():
+            self.add_indexer(name, func)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._objects
+
+    def get(self, key: str):
+        """
+        Get an object by its key, return None if not found
+        """
+        return self._objects.get(key)
+
+    def get_by_name(self, name: str, namespace: Optional[str] = None):
+        """
+        Get an object by name (and namespace), return None if not found
+        """
+        return self.get(f"{namespace}/{name}" if namespace else name)
+
+    def add_indexer(self, name: str, func: Callable):
+        """
+        Add an index and build it for the objects already in the store.
+
+        Adding the same indexer again is a no-op, so consumers of a shared
+        informer can all declare the indexes they need.
+        """
+        with self._lock:
+            if name in self._indexers:
+                if self._indexers[name] is not func:
+                    raise ValueError(f"indexer {name!r} already exists")
+                return
+            self._indexers[name] = func
+            self._indices[name] = {}
+            for key, obj in self._objects.items():
+                self._index(name, key, obj)
+
+    def by_index(self, name: str, value: str) -> list:
+        """
+        Return all objects with the given value in the named index
+        """
+        with self._lock:
+            keys = self._indices[name].get(value, ())
+            return [self._objects[key] for key in keys]
+
+    def index_values(self, name: str) -> List[str]:
+        """
+        Return all values currently present in the named index
+        """
+        with self._lock:
+            return list(self._indices[name])
+
+    def _index(self, name: str, key: str, obj):
+        index = self._indices[name]
+        for value in self._indexers[name](obj):
+            index.setdefault(value, set()).add(key)
+
+    def _unindex(self, name: str, key: str, obj):
+        index = self._indices[name]
+        for value in self._indexers[name](obj):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    def _update_indices(self, key: str, old, new):
+        for name in self._indexers:
+            if old is not None:
+                self._unindex(name, key, old)
+            if new is not None:
+                self._index(name, key, new)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._objects)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self._objects.values())
+
+    def add(self, obj):
+        """
+        Add or replace an object, return the previous version (or None)
+        """
+        with self._lock:
+            key = object_key(obj)
+            old = self._objects.get(key)
+            self._objects[key] = obj
+            self._update_indices(key, old, obj)
+            return old
+
+    def delete(self, obj):
+        """
+        Remove an object, return the removed version (or None)
+        """
+        with self._lock:
+            key = object_key(obj)
+            old = self._objects.pop(key, None)
+            if old is not None:
+                self._update_indices(key, old, None)
+            return old
+
+    def replace(self, objects: List):
+        """
+        Replace the store content with a full listing.
+
+        Return the lists of added objects, updated (old, new) pairs and deleted
+        objects, so that handlers can be informed about the difference.
+        """
+        added, updated = [], []
+        with self._lock:
+            previous = self._objects
+            self._objects = {}
+            for obj in objects:
+                key = object_key(obj)
+                self._objects[key] = obj
+                old = previous.pop(key, None)
+                self._update_indices(key, old, obj)
+                if old is None:
+                    added.append(obj)
+                elif old.metadata.get("resourceVersion") != obj.metadata.get(
+                    "resourceVersion"
+                ):
+                    updated.append((old, obj))
+            for key, obj in previous.items():
+                self._update_indices(key, obj, None)
+            deleted = list(previous.values())
+        return added, updated, deleted
+
+
+class Informer:
+    """
+    Lists a resource once, then watches it from the list's resourceVersion and
+    keeps the local store up to date on a background thread.
+
+    Event handlers are called on the informer thread.
+    """
+
+    def __init__(
+        self,
+        query: Query,
+        store: Optional[Store] = None,
+        watch_timeout: int = WATCH_TIMEOUT_SECONDS,
+        indexers: Optional[Dict[str, Callable]] = None,
+    ):
+        self.query = query
+        self.store = store if store is not None else Store()
+        for name, func in (indexers or {}).items():
+            self.store.add_indexer(name, func)
+        self.watch_timeout = watch_timeout
+        self.resource_version = None
+        self._handlers: list = []
+        self._handlers_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._synced = threading.Event()
+        # the current watch, closed by stop()
+        self._watch_query: Optional[WatchQuery] = None
+
+    def __repr__(self) -> str:
+        return "<Informer of {kind} at {address}>".format(
+            kind=self.query.api_obj_class.kind, address=hex(id(self))
+        )
+
+    def add_event_handler(
+        self,
+        on_add: Optional[Callable] = None,
+        on_update: Optional[Callable] = None,
+        on_delete: Optional[Callable] = None,
+    ):
+        """
+        Register handlers for added (obj), updated (old, new) and deleted (obj)
+        objects. If the informer has already synced, on_add is called for all
+        objects in the store before returning.
+        """
+        with self._handlers_lock:
+            self._handlers.append((on_add, on_update, on_delete))
+        if on_add and self.has_synced:
+            for obj in self.store.list():
+                self._call(on_add, obj)
+
+    def start(self):
+        """
+        Start the background list/watch thread (no-op if already running).
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=repr(self), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread, closing the current watch request.
+        """
+        self._stopped.set()
+        watch = self._watch_query
+        if watch is not None and watch.response is not None:
+            watch.response.close()
+
+    @property
+    def has_synced(self) -> bool:
+        return self._synced.is_set()
+
+    def wait_for_sync(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the initial listing was stored, return False on timeout.
+        """
+        return self._synced.wait(timeout)
+
+    def _call(self, handler, *args):
+        try:
+            handler(*args)
+        except Exception:
+            LOG.exception("Informer event handler %r failed", handler)
+
+    def _dispatch(self, index: int, *args):
+        with self._handlers_lock:
+            handlers = [h[index] for h in self._handlers if h[index]]
+        for handler in handlers:
+            self._call(handler, *args)
+
+    def _run(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self._list()
+                self._watch()
+                backoff = 1
+            except HTTPError as e:
+                if e.code == 410:
+                    LOG.debug("%r: resource version expired, relisting", self)
+                    self.resource_version = None
+                    continue
+                LOG.warning("%r: watch failed: %s", self, e)
+            except requests.exceptions.RequestException as e:
+                LOG.warning("%r: request failed: %s", self, e)
+            except Exception:
+                # e.g. a malformed event: the store may have missed changes,
+                # so list again instead of letting the thread die
+                LOG.exception("%r: unexpected error, relisting", self)
+                self.resource_version = None
+            else:
+                continue
+            self._stopped.wait(backoff * random.uniform(0.5, 1.0))  # nosec
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    def _list(self):
+        objects = []
+        resource_version = None
+        for page in self.query.pages(DEFAULT_CHUNK_SIZE):
+            if resource_version is None:
+                resource_version = page["metadata"].get("resourceVersion")
+            for obj in page.get("items") or []:
+                objects.append(
+                    self.query.api_obj_class._from_response(self.query.api, obj)
+                )
+        added, updated, deleted = self.store.replace(objects)
+        self.resource_version = resource_version
+        self._synced.set()
+        for obj in added:
+            self._dispatch(0, obj)
+        for old, obj in updated:
+            self._dispatch(1, old, obj)
+        for obj in deleted:
+            self._dispatch(2, obj)
+
+    def _watch(self):
+        timeout_seconds = watch_timeout_seconds(self.watch_timeout)
+        watch = self._watch_query = self.query.watch(
+            since=self.resource_version,
+            params={"timeoutSeconds": timeout_seconds, "allowWatchBookmarks": "true"},
+            timeout=(self.query.api.timeout, timeout_seconds + 30),
+        )
+        try:
+            self._handle_events(watch)
+        except Exception:
+            if self._stopped.is_set():
+                # stop() closed the response
+                return
+            raise
+        finally:
+            self._watch_query = None
+
+    def _handle_events(self, watch: WatchQuery):
+        for event in watch:
+            obj = event.object
+            if event.type == "ERROR":
+                raise HTTPError(obj.obj.get("code"), obj.obj.get("message"))
+            if event.type in ("ADDED", "MODIFIED"):
+                old = self.store.add(obj)
+                if old is None:
+                    self._dispatch(0, obj)
+                else:
+                    self._dispatch(1, old, obj)
+            elif event.type == "DELETED":
+                self.store.delete(obj)
+                self._dispatch(2, obj)
+            self.resource_version = obj.metadata.get("resourceVersion")
+            if self._stopped.is_set():
+                break
+
+
+# API client -> key of the query -> informer
+_shared_informers: Dict[object, Dict[tuple, Informer]] = {}
+_shared_informers_lock = threading.Lock()
+
+
+def _selector_key(selector) -> Optional[str]:
+    return None if selector is everything else as_selector(selector)
+
+
+def shared_informer(
+    query: Query, indexers: Optional[Dict[str, Callable]] = None
+) -> Informer:
+    """
+    Return a started informer for the query.
+
+    Queries for the same API client, kind, namespace and selectors share one
+    informer (and therefore one watch and one store). The given indexers are
+    added to the shared store.
+
+    Shared informers run until stop_shared_informers() is called for the API
+    client, which they (and the objects in their stores) keep alive until then.
+
+    For example:
+
+        informer = pykube.informer.shared_informer(pykube.Pod.objects(api))
+        informer.add_event_handler(on_add=print)
+        informer.wait_for_sync()
+        pods = informer.store.list()
+    """
+    key = (
+        query.api_obj_class.version,
+        query.api_obj_class.endpoint,
+        query.namespace,
+        _selector_key(query.selector),
+        _selector_key(query.field_selector),
+    )
+    with _shared_informers_lock:
+        informers = _shared_informers.setdefault(query.api, {})
+        informer = informers.get(key)
+        if informer is None:
+            informer = informers[key] = Informer(query)
+        for name, func in (indexers or {}).items():
+            informer.store.add_indexer(name, func)
+        informer.start()
+    return informer
+
+
+def stop_shared_informers(api):
+    """
+    Stop the shared informers of the API client and forget them, so that the
+    client can be garbage collected.
+    """
+    with _shared_informers_lock:
+        informers = _shared_informers.pop(api, {})
+    for informer in informers.values():
+        informer.stop()
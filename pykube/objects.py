@@ -1,26 +1,33 @@
 import copy
-import json
+from concurrent.futures import ThreadPoolExecutor
 from inspect import getmro
 from typing import Any
+from typing import Iterable
+from typing import List
 from typing import Optional
 from typing import Type
 from urllib.parse import urlencode
 
 from requests import Response
 
+from .aio import AsyncHTTPClient
+from .aio import AsyncQuery
 from .exceptions import ObjectDoesNotExist
 from .http import HTTPClient
 from .mixins import ReplicatedMixin
 from .mixins import ScalableMixin
 from .query import Query
+from .utils import CopyOnWriteDict
 from .utils import join_url_path
-from .utils import obj_merge
+from .utils import obj_diff
 
 
 class ObjectManager:
     def __call__(self, api: HTTPClient, namespace: Optional[str] = None):
         if namespace is None and NamespacedAPIObject in getmro(self.api_obj_class):
             namespace = api.config.namespace
+        if isinstance(api, AsyncHTTPClient):
+            return AsyncQuery(api, self.api_obj_class, namespace=namespace)
         return Query(api, self.api_obj_class, namespace=namespace)
 
     def __get__(self, obj, api_obj_class: Type):
@@ -36,14 +43,37 @@ class APIObject:
 
     objects = ObjectManager()
     base = None
+    # set by the subclasses
+    version: str
+    endpoint: str
+    kind: str
 
     def __init__(self, api: HTTPClient, obj: dict):
         self.api = api
-        self.set_obj(obj)
+        # the caller may keep using and modifying its dict
+        self.set_obj(copy.deepcopy(obj))
+
+    @classmethod
+    def _from_response(cls, api: HTTPClient, obj: dict):
+        """
+        Return a new object for a dict decoded from an API response, which
+        nobody else modifies, without the copy of the constructor.
+        """
+        api_obj = cls.__new__(cls)
+        api_obj.api = api
+        api_obj.set_obj(obj)
+        return api_obj
 
     def set_obj(self, obj: dict):
-        self.obj = obj
-        self._original_obj = copy.deepcopy(obj)
+        """
+        Set the object dict, e.g. from an API response.
+
+        The given dict is kept as the original state for update() and must not
+        be modified afterwards; self.obj is a copy-on-write copy of it, so only
+        the parts of the object which are accessed get copied.
+        """
+        self._original_obj = obj
+        self.obj = CopyOnWriteDict(obj)
 
     def __repr__(self):
         return f"<{self.kind} {self.name}>"
@@ -127,7 +157,9 @@ class APIObject:
         return True
 
     def create(self):
-        r = self.api.post(**self.api_kwargs(data=json.dumps(self.obj), obj_list=True))
+        r = self.api.post(
+            **self.api_kwargs(data=self.api.json_codec.encode(self.obj), obj_list=True)
+        )
         self.api.raise_for_status(r)
         self.set_obj(r.json())
 
@@ -151,18 +183,73 @@ class APIObject:
             **self.api_kwargs(
                 subresource=subresource,
                 headers={"Content-Type": "application/merge-patch+json"},
-                data=json.dumps(strategic_merge_patch),
+                data=self.api.json_codec.encode(strategic_merge_patch),
             )
         )
         self.api.raise_for_status(r)
         self.set_obj(r.json())
 
+    def apply_kwargs(self, field_manager: str, force: bool = False, **kwargs) -> dict:
+        """
+        Return the request kwargs to server-side apply self.obj.
+        """
+        obj = dict(self.obj)
+        # an apply request is rejected without apiVersion and kind
+        obj.setdefault("apiVersion", self.version)
+        obj.setdefault("kind", self.kind)
+        if "managedFields" in obj.get("metadata", {}):
+            # managedFields must not be set in an apply request
+            obj["metadata"] = dict(obj["metadata"])
+            del obj["metadata"]["managedFields"]
+        params = {"fieldManager": field_manager}
+        if force:
+            params["force"] = "true"
+        return self.api_kwargs(
+            params=params,
+            headers={"Content-Type": "application/apply-patch+yaml"},
+            data=self.api.json_codec.encode(obj),
+            **kwargs,
+        )
+
+    def apply(self, field_manager: str, force: bool = False, *, subresource=None):
+        """
+        Create or update the Kubernetes resource with a single server-side apply
+        request.
+
+        The fields set in self.obj become owned by field_manager, conflicts with
+        other field managers are overridden if force is set.
+        See https://kubernetes.io/docs/reference/using-api/server-side-apply/
+        """
+        r = self.api.patch(
+            **self.apply_kwargs(field_manager, force, subresource=subresource)
+        )
+        self.api.raise_for_status(r)
+        self.set_obj(r.json())
+
+    def update_patch(self, is_strategic=True) -> dict:
+        """
+        Return the merge patch with the changes made to self.obj, an empty dict if
+        nothing changed.
+
+        The patch includes metadata.resourceVersion, so that the update fails
+        with a conflict if the object was changed in the meantime.
+        """
+        patch = obj_diff(self.obj, self._original_obj, is_strategic)
+        resource_version = self._original_obj.get("metadata", {}).get("resourceVersion")
+        if patch and resource_version:
+            metadata = patch.setdefault("metadata", {})
+            metadata.setdefault("resourceVersion", resource_version)
+        return patch
+
     def update(self, is_strategic=True, *, subresource=None):
         """
         Update the Kubernetes resource by calling the API (patch)
+
+        Only the changes are sent, no request is made if nothing changed.
         """
-        self.obj = obj_merge(self.obj, self._original_obj, is_strategic)
-        self.patch(self.obj, subresource=subresource)
+        patch = self.update_patch(is_strategic)
+        if patch:
+            self.patch(patch, subresource=subresource)
 
     def delete(self, propagation_policy: Optional[str] = None):
         """
@@ -175,7 +262,7 @@ class APIObject:
             options = {"propagationPolicy": propagation_policy}
         else:
             options = {}
-        r = self.api.delete(**self.api_kwargs(data=json.dumps(options)))
+        r = self.api.delete(**self.api_kwargs(data=self.api.json_codec.encode(options)))
         if r.status_code != 404:
             self.api.raise_for_status(r)
 
@@ -195,6 +282,31 @@ class NamespacedAPIObject(APIObject):
             return self.api.config.namespace
 
 
+def apply_all(
+    objects: Iterable[APIObject],
+    field_manager: str,
+    force: bool = False,
+    max_workers: int = 10,
+) -> List[APIObject]:
+    """
+    Server-side apply many objects concurrently, one request per object.
+
+    For example:
+
+        objects = [pykube.Deployment(api, doc) for doc in yaml.safe_load_all(manifest)]
+        pykube.apply_all(objects, field_manager="my-deploy-tool")
+
+    The objects are updated in place and returned in the given order. If an
+    apply fails, the first error is raised after all requests have finished.
+    """
+    objects = list(objects)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(obj.apply, field_manager, force) for obj in objects]
+    for future in futures:
+        future.result()
+    return objects
+
+
 def object_factory(api, api_version, kind) -> Type[APIObject]:
     """
     Dynamically builds a Python class for the given Kubernetes object in an API.
@@ -279,7 +391,9 @@ class Deployment(NamespacedAPIObject, ReplicatedMixin, ScalableMixin):
             "namespace": self.namespace,
             "operation": "rollback",
         }
-        r = self.api.post(**self.api_kwargs(data=json.dumps(params), **kwargs))
+        r = self.api.post(
+            **self.api_kwargs(data=self.api.json_codec.encode(params), **kwargs)
+        )
         r.raise_for_status()
         return r.text
 
@@ -1,18 +1,33 @@
-import json
+import logging
+import random
+import time
 from collections import namedtuple
 from typing import Optional
 from typing import Union
 from urllib.parse import urlencode
 
+import requests
+
 from .exceptions import HTTPError
 from .exceptions import ObjectDoesNotExist
 from .http import HTTPClient
+from .utils import iter_json_items
+
 
+DEFAULT_CHUNK_SIZE = 500
+STREAM_READ_SIZE = 64 * 1024  # bytes
+WATCH_READ_SIZE = 16 * 1024  # bytes
+WATCH_TIMEOUT_SECONDS = 300
+MAX_WATCH_BACKOFF_SECONDS = 30
+LOG = logging.getLogger(__name__)
 
 all_ = object()
 everything = object()
 now = object()
 
+# module-level (namedtuples have empty __slots__), created once per watch event
+WatchEvent = namedtuple("WatchEvent", "type object")
+
 
 class Table:
     """
@@ -116,7 +131,7 @@ class Query(BaseQuery):
             if r.status_code == 404:
                 raise ObjectDoesNotExist(f"{name} does not exist.")
             self.api.raise_for_status(r)
-        return self.api_obj_class(self.api, r.json())
+        return self.api_obj_class._from_response(self.api, r.json())
 
     def get(self, *args, **kwargs):
         """
@@ -141,27 +156,87 @@ class Query(BaseQuery):
         except ObjectDoesNotExist:
             return None
 
-    def watch(self, since=None, *, params=None):
+    def watch(
+        self,
+        since=None,
+        *,
+        params=None,
+        timeout=None,
+        resume=False,
+        raw=False,
+        read_size=WATCH_READ_SIZE,
+    ):
+        """
+        Return a watch query, starting at `since` (a resourceVersion or now)
+
+        :param params: Additional query parameters for the watch request
+        :param timeout: Request timeout for the watch request
+        :param resume: Reconnect transparently when the watch ends, see
+            WatchQuery.resumable_object_stream
+        :param raw: Yield events with the object as plain dict instead of an
+            API object, which avoids the per-event object construction
+        :param read_size: Size of the socket reads (in bytes) of the event stream
+        """
         query = self._clone(WatchQuery)
         query.params = params
+        query.timeout = timeout
+        query.resume = resume
+        query.raw = raw
+        query.read_size = read_size
         if since is now:
             query.resource_version = self.response["metadata"]["resourceVersion"]
         elif since is not None:
             query.resource_version = since
         return query
 
-    def execute(self, **kwargs):
-        kwargs["url"] = self._build_api_url()
+    def _list_kwargs(self, url_params: Optional[dict] = None, **kwargs) -> dict:
+        kwargs["url"] = self._build_api_url(params=url_params)
         if self.api_obj_class.base:
             kwargs["base"] = self.api_obj_class.base
         if self.api_obj_class.version:
             kwargs["version"] = self.api_obj_class.version
         if self.namespace is not None and self.namespace is not all_:
             kwargs["namespace"] = self.namespace
-        r = self.api.get(**kwargs)
+        return kwargs
+
+    def execute(self, **kwargs):
+        r = self.api.get(**self._list_kwargs(**kwargs))
+        r.raise_for_status()
+        return r
+
+    def _execute_page(self, limit: int, continue_token: Optional[str] = None, **kwargs):
+        """
+        Request a single page of at most `limit` objects.
+
+        If the continue token has expired (410 Gone), the listing is resumed
+        with the inconsistent continue token the API server returns, if any.
+        """
+        params: dict = {"limit": limit}
+        if continue_token:
+            params["continue"] = continue_token
+        r = self.api.get(**self._list_kwargs(url_params=params, **kwargs))
+        if r.status_code == 410 and continue_token:
+            status = r.json()
+            inconsistent_token = (status.get("metadata") or {}).get("continue")
+            if not inconsistent_token:
+                raise HTTPError(410, status.get("message", "continue token expired"))
+            params["continue"] = inconsistent_token
+            r = self.api.get(**self._list_kwargs(url_params=params, **kwargs))
         r.raise_for_status()
         return r
 
+    def pages(self, chunk_size: int = DEFAULT_CHUNK_SIZE, *, continue_token=None):
+        """
+        Execute the API request in chunks of `chunk_size` objects and return an
+        iterator over the list responses, following metadata.continue.
+        """
+        while True:
+            page = self._execute_page(chunk_size, continue_token).json()
+            yield page
+            continue_token = (page.get("metadata") or {}).get("continue")
+            if not continue_token:
+                break
+
     def as_table(self) -> Table:
         """
         Execute query and return result as Table (similar to what kubectl does)
@@ -172,13 +247,69 @@ class Query(BaseQuery):
         )
         return Table(self.api_obj_class, response.json())
 
-    def iterator(self):
+    def _iter_items(self, response, stream: bool, fields: dict):
+        """
+        Yield the items of a list response, storing its other fields in `fields`.
+
+        With `stream`, items are decoded incrementally while the body is read.
+        """
+        if not stream:
+            fields.update(response.json())
+            yield from fields.pop("items", None) or []
+            return
+        try:
+            yield from iter_json_items(
+                response.iter_content(chunk_size=STREAM_READ_SIZE), fields=fields
+            )
+        finally:
+            response.close()
+
+    def iterator(self, chunk_size: Optional[int] = None, *, stream: bool = False):
         """
         Execute the API request and return an iterator over the objects. This
         method does not use the query cache.
+
+        :param chunk_size: List the objects in pages of this size (limit/continue),
+            so only one page is held in memory at a time
+        :param stream: Decode the list response incrementally and yield objects
+            while the response body is still being downloaded
         """
-        for obj in self.execute().json().get("items") or []:
-            yield self.api_obj_class(self.api, obj)
+        # not a long-lived stream: rate limit, retries and hedging apply
+        kwargs = {"stream": True, "watch_pool": False} if stream else {}
+        if chunk_size is None:
+            response = self.execute(**kwargs)
+            for obj in self._iter_items(response, stream, {}):
+                yield self.api_obj_class._from_response(self.api, obj)
+            return
+        continue_token = None
+        while True:
+            fields: dict = {}
+            response = self._execute_page(chunk_size, continue_token, **kwargs)
+            for obj in self._iter_items(response, stream, fields):
+                yield self.api_obj_class._from_response(self.api, obj)
+            continue_token = (fields.get("metadata") or {}).get("continue")
+            if not continue_token:
+                break
+
+    def count(self) -> int:
+        """
+        Return the number of matching objects.
+
+        Uses a single limit=1 request and metadata.remainingItemCount; if the
+        API server does not report the count (e.g. with field selectors), the
+        remaining objects are counted page by page.
+        """
+        if hasattr(self, "_query_cache"):
+            return len(self._query_cache["objects"])
+        page = self._execute_page(1).json()
+        metadata = page.get("metadata") or {}
+        num = len(page.get("items") or [])
+        if metadata.get("remainingItemCount") is not None:
+            return num + metadata["remainingItemCount"]
+        if metadata.get("continue"):
+            for page in self.pages(continue_token=metadata["continue"]):
+                num += len(page.get("items") or [])
+        return num
 
     @property
     def query_cache(self):
@@ -186,7 +317,9 @@ class Query(BaseQuery):
             cache = {"objects": []}
             cache["response"] = self.execute().json()
             for obj in cache["response"].get("items") or []:
-                cache["objects"].append(self.api_obj_class(self.api, obj))
+                cache["objects"].append(
+                    self.api_obj_class._from_response(self.api, obj)
+                )
             self._query_cache = cache
         return self._query_cache
 
@@ -205,32 +338,145 @@ class WatchQuery(BaseQuery):
     def __init__(self, *args, **kwargs):
         self.resource_version = kwargs.pop("resource_version", None)
         self.params = None
+        self.timeout = None
+        self.resume = False
+        self.raw = False
+        self.read_size = WATCH_READ_SIZE
         super(WatchQuery, self).__init__(*args, **kwargs)
         self._response = None
 
-    def object_stream(self):
-        params = dict(self.params or {})  # shallow clone for local use
-        params["watch"] = "true"
-        if self.resource_version is not None:
-            params["resourceVersion"] = self.resource_version
+    def _watch_events(self, params: dict, timeout=None):
+        """
+        Start a watch request and yield the decoded watch events.
+        """
         kwargs = {"url": self._build_api_url(params=params), "stream": True}
         if self.namespace is not all_:
             kwargs["namespace"] = self.namespace
         if self.api_obj_class.version:
             kwargs["version"] = self.api_obj_class.version
+        if timeout is not None:
+            kwargs["timeout"] = timeout
         r = self.api.get(**kwargs)
         self.api.raise_for_status(r)
         self._response = r
-        WatchEvent = namedtuple("WatchEvent", "type object")
-        for line in r.iter_lines():
-            we = json.loads(line.decode("utf-8"))
+        # decodes UTF-8 bytes directly, without an intermediate str
+        loads = self.api.json_codec.decode
+        for line in r.iter_lines(chunk_size=self.read_size):
+            if not line:
+                continue
+            we = loads(line)
             if we.get("kind") == "Status":
                 raise HTTPError(we["code"], we["message"])
-            yield WatchEvent(
-                type=we["type"], object=self.api_obj_class(self.api, we["object"])
-            )
+            yield we
+
+    def _wrap(self, obj: dict):
+        if self.raw:
+            return obj
+        return self.api_obj_class._from_response(self.api, obj)
+
+    def object_stream(self):
+        params = dict(self.params or {})  # shallow clone for local use
+        params["watch"] = "true"
+        if self.resource_version is not None:
+            params["resourceVersion"] = self.resource_version
+        wrap = self._wrap
+        for we in self._watch_events(params, self.timeout):
+            yield WatchEvent(we["type"], wrap(we["object"]))
+
+    def resumable_object_stream(self):
+        """
+        Watch until the caller stops iterating, reconnecting transparently.
+
+        The last seen resourceVersion (including bookmarks) is tracked and used
+        to resume the watch after the server closed the stream or the connection
+        broke. Only if the resourceVersion is too old (410 Gone) the objects are
+        listed again and the difference to the last seen state is emitted as
+        synthetic ADDED, MODIFIED and DELETED events. Server errors (5xx, 429)
+        and connection errors, while watching or relisting, are retried with
+        exponential backoff; other client errors are raised.
+        """
+        objects: dict = {}  # key => last seen object, needed to diff on relist
+        resource_version = self.resource_version
+        relist = False
+        backoff = 1
+        while True:
+            try:
+                if relist:
+                    # nothing is yielded before the whole list was read, so a
+                    # failed relist can simply be repeated
+                    resource_version = yield from self._relist(objects)
+                    relist = False
+                params = dict(self.params or {})
+                params["watch"] = "true"
+                params["allowWatchBookmarks"] = "true"
+                params["timeoutSeconds"] = watch_timeout_seconds(
+                    int(params.get("timeoutSeconds", WATCH_TIMEOUT_SECONDS))
+                )
+                if resource_version is not None:
+                    params["resourceVersion"] = resource_version
+                timeout = self.timeout
+                if timeout is None:
+                    timeout = (self.api.timeout, params["timeoutSeconds"] + 30)
+                for we in self._watch_events(params, timeout):
+                    obj = we["object"]
+                    if we["type"] == "ERROR":
+                        raise HTTPError(obj.get("code"), obj.get("message"))
+                    resource_version = obj["metadata"].get(
+                        "resourceVersion", resource_version
+                    )
+                    if we["type"] == "BOOKMARK":
+                        continue
+                    api_obj = self._wrap(obj)
+                    if we["type"] == "DELETED":
+                        objects.pop(object_key(obj), None)
+                    else:
+                        objects[object_key(obj)] = api_obj
+                    yield WatchEvent(we["type"], api_obj)
+                backoff = 1
+                continue
+            except (HTTPError, requests.exceptions.HTTPError) as e:
+                code = _status_code(e)
+                if code == 410:
+                    relist = True
+                    continue
+                if code is None or (code < 500 and code != 429):
+                    raise
+                LOG.debug("Watch of %s failed, reconnecting: %s", self, e)
+            except requests.exceptions.RequestException as e:
+                # connection errors, broken streams and timeouts
+                LOG.debug("Watch of %s interrupted, reconnecting: %s", self, e)
+            time.sleep(backoff * random.uniform(0.5, 1.0))  # nosec
+            backoff = min(backoff * 2, MAX_WATCH_BACKOFF_SECONDS)
+
+    def _relist(self, objects: dict):
+        """
+        List all objects, yield synthetic events for the difference to `objects`,
+        update `objects` and return the resourceVersion of the list.
+        """
+        listed = {}
+        resource_version = None
+        for page in self._clone(Query).pages(DEFAULT_CHUNK_SIZE):
+            if resource_version is None:
+                resource_version = page["metadata"].get("resourceVersion")
+            for obj in page.get("items") or []:
+                listed[object_key(obj)] = self._wrap(obj)
+        for key, api_obj in listed.items():
+            old = objects.get(key)
+            if old is None:
+                yield WatchEvent("ADDED", api_obj)
+            elif _metadata(old).get("resourceVersion") != _metadata(api_obj).get(
+                "resourceVersion"
+            ):
+                yield WatchEvent("MODIFIED", api_obj)
+        for key in objects.keys() - listed.keys():
+            yield WatchEvent("DELETED", objects[key])
+        objects.clear()
+        objects.update(listed)
+        return resource_version
 
     def __iter__(self):
+        if self.resume:
+            return iter(self.resumable_object_stream())
         return iter(self.object_stream())
 
     @property
@@ -238,6 +484,36 @@ class WatchQuery(BaseQuery):
         return self._response
 
 
+def _status_code(error: Exception) -> Optional[int]:
+    # HTTP status of a pykube or requests HTTPError
+    if isinstance(error, HTTPError):
+        return error.code
+    response = getattr(error, "response", None)
+    return None if response is None else response.status_code
+
+
+def _metadata(obj) -> dict:
+    return (obj if isinstance(obj, dict) else obj.obj)["metadata"]
+
+
+def object_key(obj) -> str:
+    """
+    Return the key of an API object or object dict ("namespace/name" or "name").
+    """
+    metadata = _metadata(obj)
+    if metadata.get("namespace"):
+        return "{}/{}".format(metadata["namespace"], metadata["name"])
+    return metadata["name"]
+
+
+def watch_timeout_seconds(base: int = WATCH_TIMEOUT_SECONDS) -> int:
+    """
+    Return a jittered watch timeout between `base` and twice `base` seconds,
+    so that watches of many clients do not all reconnect at the same time.
+    """
+    return int(base * random.uniform(1.0, 2.0))  # nosec
+
+
 def as_selector(value: Union[str, dict]) -> str:
     if isinstance(value, str):
         return value
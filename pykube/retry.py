@@ -0,0 +1,170 @@
+"""
+Retries of failed API requests with exponential backoff.
+"""
+
+import email.utils
+import random
+import threading
+import time
+from typing import Collection
+from typing import Optional
+
+import requests
+import urllib3
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (seconds or HTTP date), return seconds to wait
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def is_connect_error(error: Exception) -> bool:
+    """
+    Whether the request failed before it was sent, so it is safe to retry
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    # includes subclasses like NameResolutionError
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+class RetryBudget:
+    """
+    Thread-safe budget limiting retries to a fraction of all requests, plus a
+    minimum number of retries per second, so that retries cannot multiply the
+    load on an overloaded API server.
+    """
+
+    def __init__(
+        self,
+        ratio: float = 0.2,
+        min_retries_per_second: float = 1.0,
+        max_tokens: float = 10.0,
+    ):
+        self.ratio = ratio
+        self.min_retries_per_second = min_retries_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.exhausted = 0
+
+    def _refill(self, tokens: float):
+        now = time.monotonic()
+        tokens += (now - self._last) * self.min_retries_per_second
+        self._last = now
+        self._tokens = min(self.max_tokens, self._tokens + tokens)
+
+    def deposit(self):
+        """
+        Record a request, which adds ratio to the budget
+        """
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Take one retry from the budget, return False if the budget is exhausted
+        """
+        with self._lock:
+            self._refill(0)
+            if self._tokens < 1:
+                self.exhausted += 1
+                return False
+            self._tokens -= 1
+            self.retries += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"retries": self.retries, "exhausted": self.exhausted}
+
+
+# shared by all retry policies unless they are given their own budget
+default_budget = RetryBudget()
+
+
+class RetryPolicy:
+    """
+    Retry requests failing with 429/5xx status codes or connection errors,
+    waiting with jittered exponential backoff or as long as the API server asks
+    with Retry-After.
+
+    Idempotent methods are always retried. Other methods are only retried if the
+    request was not sent (connection failed) or the response has a Retry-After
+    header (e.g. 429 from API Priority and Fairness, which rejects requests
+    before processing them).
+
+        api = pykube.HTTPClient(config, retry_policy=RetryPolicy(max_retries=5))
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        status_codes: Collection[int] = RETRY_STATUS_CODES,
+        methods: Collection[str] = IDEMPOTENT_METHODS,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(methods)
+        self.budget = default_budget if budget is None else budget
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Return the delay before the given retry (0 for the first one), with "full
+        jitter" so that clients failing at the same time do not retry in sync.
+        """
+        return random.uniform(  # nosec
+            0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+
+    def retry_delay(
+        self,
+        method: str,
+        attempt: int,
+        response: Optional[requests.Response] = None,
+        error: Optional[Exception] = None,
+    ) -> Optional[float]:
+        """
+        Return how long to wait before retrying the request, or None to not retry.
+        """
+        if attempt >= self.max_retries:
+            return None
+        retry_after = None
+        if response is not None:
+            if response.status_code not in self.status_codes:
+                return None
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if method not in self.methods and retry_after is None:
+                return None
+        elif method not in self.methods and (
+            error is None or not is_connect_error(error)
+        ):
+            return None
+        if not self.budget.withdraw():
+            return None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return self.backoff(attempt)
@@ -0,0 +1,184 @@
+"""
+Codecs for the wire formats of API responses.
+"""
+
+import base64
+import json
+import os
+from typing import Any
+from typing import Callable
+from typing import Iterable
+from typing import Optional
+
+try:
+    import cbor2
+
+    cbor_installed = True
+except ImportError:
+    cbor_installed = False
+try:
+    import orjson
+
+    orjson_installed = True
+except ImportError:
+    orjson_installed = False
+try:
+    import msgspec
+
+    msgspec_installed = True
+except ImportError:
+    msgspec_installed = False
+
+JSON = "application/json"
+CBOR = "application/cbor"
+
+# prefix of CBOR data sent by the API server ("self-described CBOR" tag)
+CBOR_SELF_DESCRIBED = b"\xd9\xd9\xf7"
+
+
+def _default_json_library() -> str:
+    if orjson_installed:
+        return "orjson"
+    if msgspec_installed:
+        return "msgspec"
+    return "json"
+
+
+class JSONCodec:
+    """
+    Encode and decode JSON with the given library: "orjson", "msgspec" or
+    "json" (the standard library). By default, the fastest one installed.
+
+    Both orjson and msgspec decode straight from bytes and encode to bytes.
+    """
+
+    content_type = JSON
+
+    def __init__(self, library: Optional[str] = None):
+        self.library = library or _default_json_library()
+        self.encode: Callable[[Any], bytes]
+        self.decode: Callable[[Any], Any]
+        if self.library == "orjson":
+            if not orjson_installed:
+                raise ImportError("orjson is not installed (try pip install orjson)")
+            self.encode = orjson.dumps
+            self.decode = orjson.loads
+        elif self.library == "msgspec":
+            if not msgspec_installed:
+                raise ImportError("msgspec is not installed (try pip install msgspec)")
+            self.encode = msgspec.json.Encoder().encode
+            self.decode = msgspec.json.Decoder().decode
+        elif self.library == "json":
+            self.encode = self._encode_json
+            self.decode = json.loads
+        else:
+            raise ValueError(f"Unknown JSON library: {self.library}")
+
+    def __repr__(self):
+        return f"JSONCodec({self.library!r})"
+
+    @staticmethod
+    def _encode_json(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+
+# tag of byte strings to encode as base64 when converted to JSON ([]byte fields)
+CBOR_TAG_BASE64 = 22
+
+
+def _cbor_value(value):
+    # Go strings and field names are byte strings in the API server's encoding
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if type(value) is list:
+        return [_cbor_value(item) for item in value]
+    return value
+
+
+def _cbor_object_hook(*args) -> dict:
+    # cbor2 < 6 passes (decoder, dict), cbor2 6 passes (dict, immutable)
+    obj = args[1] if isinstance(args[1], dict) else args[0]
+    return {_cbor_value(key): _cbor_value(value) for key, value in obj.items()}
+
+
+def _cbor_tag_hook(*args):
+    tag = next(arg for arg in args if isinstance(arg, cbor2.CBORTag))
+    if tag.tag == CBOR_TAG_BASE64 and isinstance(tag.value, bytes):
+        # []byte fields (e.g. Secret data) are base64 strings in JSON
+        return base64.b64encode(tag.value).decode("ascii")
+    return tag
+
+
+class CBORCodec:
+    """
+    Decode CBOR responses (served by API servers with the CBOR serializer
+    enabled, Kubernetes 1.32+) into the same objects as JSON.
+
+    The API server encodes strings and field names as byte strings (decoded
+    as UTF-8) and []byte fields as byte strings tagged for base64 conversion.
+    """
+
+    content_type = CBOR
+
+    def __init__(self):
+        if not cbor_installed:
+            raise ImportError(
+                "missing dependencies for CBOR support (try pip install new-pykube[cbor]"
+            )
+
+    def decode(self, data: bytes):
+        if data.startswith(CBOR_SELF_DESCRIBED):
+            data = data[len(CBOR_SELF_DESCRIBED) :]
+        return _cbor_value(
+            cbor2.loads(data, object_hook=_cbor_object_hook, tag_hook=_cbor_tag_hook)
+        )
+
+
+# used by all clients unless they get their own json_codec,
+# PYKUBE_JSON_LIBRARY selects the library
+default_json_codec = JSONCodec(os.environ.get("PYKUBE_JSON_LIBRARY"))
+
+
+def json_dumps(obj) -> bytes:
+    """
+    Encode a request body with the default JSON codec
+    """
+    return default_json_codec.encode(obj)
+
+
+def json_loads(data):
+    """
+    Decode JSON (bytes or str) with the default JSON codec
+    """
+    return default_json_codec.decode(data)
+
+
+def set_json_library(library: Optional[str] = None):
+    """
+    Change the JSON library of the default codec (used by clients created
+    afterwards)
+    """
+    global default_json_codec
+    default_json_codec = JSONCodec(library)
+
+
+def accept_header(codecs: Iterable) -> str:
+    """
+    Return the Accept header preferring the codecs in order, falling back to
+    JSON for resources not supporting them (e.g. custom resources)
+    """
+    types = [codec.content_type for codec in codecs if codec.content_type != JSON]
+    return ", ".join(types + [f"{JSON};q=0.9"])
+
+
+def codec_for(content_type: Optional[str], codecs: Iterable):
+    """
+    Return the codec for the content type of a response, None if unknown
+    """
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    for codec in codecs:
+        if codec.content_type == media_type:
+            return codec
+    return None
@@ -0,0 +1,141 @@
+"""
+Coalescing of identical concurrent requests ("single flight").
+"""
+
+import copy
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+
+import requests
+
+
+class _Call:
+    def __init__(self, generation: int):
+        # RequestCoalescer._generation when the request was sent
+        self.generation = generation
+        self.done = threading.Event()
+        self.response: Optional[requests.Response] = None
+        self.error: Optional[BaseException] = None
+        self.expires = 0.0
+
+    def result(self) -> requests.Response:
+        """
+        Return a copy of the response, raise the error of the request instead
+        """
+        if self.error is not None:
+            raise self.error
+        assert self.response is not None
+        return copy.copy(self.response)
+
+
+class RequestCoalescer:
+    """
+    Share the response of a GET request between all threads requesting the
+    same URL (with the same headers) while it is in flight, and optionally for
+    ttl seconds afterwards:
+
+        api = pykube.HTTPClient(config, coalescer=RequestCoalescer(ttl=0.5))
+
+    Every caller gets its own copy of the response, with the body already read.
+    Watches (streaming requests) are never coalesced.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_entries: int = 1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        # incremented by invalidate()
+        self._generation = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def call(
+        self, key: Hashable, send: Callable[[], requests.Response]
+    ) -> requests.Response:
+        """
+        Return the response for the key, calling send() unless the same request
+        is in flight or cached.
+        """
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set():
+                if time.monotonic() < call.expires:
+                    self.cache_hits += 1
+                    return call.result()
+                call = None
+            if call is None:
+                leader = True
+                call = self._calls[key] = _Call(self._generation)
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if leader:
+            try:
+                response = send()
+                # read the body, so that it can be shared
+                _ = response.content
+                call.response = response
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                self._finish(key, call)
+            return response
+
+        call.done.wait()
+        return call.result()
+
+    def _finish(self, key: Hashable, call: _Call):
+        with self._lock:
+            current = self._calls.get(key) is call
+            if (
+                current
+                and self.ttl
+                and call.response is not None
+                and call.response.ok
+                # the response may be older than an invalidate() while in flight
+                and call.generation == self._generation
+            ):
+                call.expires = time.monotonic() + self.ttl
+                self._expire()
+            elif current:
+                del self._calls[key]
+            call.done.set()
+
+    def _expire(self):
+        if len(self._calls) <= self.max_entries:
+            return
+        now = time.monotonic()
+        for key, call in list(self._calls.items()):
+            if call.done.is_set() and now >= call.expires:
+                del self._calls[key]
+        # dicts are ordered: drop the oldest responses if still too many
+        for key in list(self._calls)[: len(self._calls) - self.max_entries]:
+            if self._calls[key].done.is_set():
+                del self._calls[key]
+
+    def invalidate(self):
+        """
+        Drop all cached responses, e.g. after changing objects. Requests in
+        flight are not shared with later callers and their responses are not
+        cached.
+        """
+        with self._lock:
+            self._generation += 1
+            self._calls.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "cache_hits": self.cache_hits,
+            }
@@ -0,0 +1,164 @@
+"""
+Transports sending the requests of HTTPClient.
+"""
+
+import datetime
+import os
+from typing import Dict
+from typing import Tuple
+from urllib.parse import urlparse
+
+import requests
+import requests.adapters
+from requests.structures import CaseInsensitiveDict
+from requests.utils import default_headers
+from requests.utils import get_environ_proxies
+
+# requests.Session implementation
+REQUESTS = "requests"
+# DirectSession
+DIRECT = "direct"
+# DirectSession with http2.HTTP2Adapter
+HTTP2 = "http2"
+
+
+class DirectSession:
+    """
+    Lightweight replacement for requests.Session: requests are prepared and
+    given to the transport adapter (e.g. KubernetesHTTPAdapter, which adds
+    authentication and client certificates) directly.
+
+    Compared to requests.Session, this skips cookies, authentication handlers,
+    hooks and redirects, which the Kubernetes API does not use; proxies from
+    the environment are looked up once per host. Responses are the same
+    requests.Response objects.
+    """
+
+    def __init__(self):
+        self.headers = default_headers()
+        self.verify = True
+        self.cert = None
+        self.proxies: dict = {}
+        # use proxies and CA bundles (REQUESTS_CA_BUNDLE) from the environment
+        self.trust_env = True
+        self.adapters: Dict[str, requests.adapters.BaseAdapter] = {}
+        self._proxies: Dict[Tuple[str, str], dict] = {}
+
+    def mount(self, prefix: str, adapter: requests.adapters.BaseAdapter):
+        self.adapters[prefix] = adapter
+
+    def get_adapter(self, url: str) -> requests.adapters.BaseAdapter:
+        for prefix, adapter in self.adapters.items():
+            if url.lower().startswith(prefix.lower()):
+                return adapter
+        raise requests.exceptions.InvalidSchema(f"No connection adapters for {url!r}")
+
+    def _proxies_for(self, url: str) -> dict:
+        parsed = urlparse(url)
+        key = (parsed.scheme, parsed.netloc)
+        proxies = self._proxies.get(key)
+        if proxies is None:
+            proxies = self._proxies[key] = get_environ_proxies(url)
+        return proxies
+
+    def merge_environment_settings(self, url: str, proxies, stream, verify, cert):
+        """
+        Return the settings of a request like requests.Session does
+        """
+        if self.trust_env:
+            env_proxies = self._proxies_for(url)
+            if verify is True or verify is None:
+                verify = (
+                    os.environ.get("REQUESTS_CA_BUNDLE")
+                    or os.environ.get("CURL_CA_BUNDLE")
+                    or verify
+                )
+        else:
+            env_proxies = {}
+        if self.proxies or proxies:
+            env_proxies = {**self.proxies, **env_proxies, **(proxies or {})}
+        return {
+            "proxies": env_proxies,
+            "stream": stream,
+            "verify": self.verify if verify is None else verify,
+            "cert": self.cert if cert is None else cert,
+        }
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        params=None,
+        data=None,
+        headers=None,
+        files=None,
+        json=None,
+        timeout=None,
+        allow_redirects: bool = True,
+        stream: bool = False,
+        verify=None,
+        cert=None,
+        proxies=None,
+        **kwargs,
+    ) -> requests.Response:
+        if kwargs:
+            raise NotImplementedError(
+                f"DirectSession does not support {', '.join(sorted(kwargs))} "
+                '(use transport="requests")'
+            )
+        request = requests.PreparedRequest()
+        request.prepare_method(method)
+        request.prepare_url(url, params)
+        request_headers = CaseInsensitiveDict(self.headers)
+        if headers:
+            for name, value in headers.items():
+                if value is None:
+                    request_headers.pop(name, None)
+                else:
+                    request_headers[name] = value
+        request.headers = request_headers
+        request.prepare_body(data, files, json)
+
+        settings = self.merge_environment_settings(url, proxies, stream, verify, cert)
+        start = datetime.datetime.now()
+        response = self.get_adapter(url).send(request, timeout=timeout, **settings)
+        response.elapsed = datetime.datetime.now() - start
+        if not stream:
+            _ = response.content
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def options(self, url: str, **kwargs) -> requests.Response:
+        return self.request("OPTIONS", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        for adapter in self.adapters.values():
+            adapter.close()
+
+
+def make_session(transport: str):
+    """
+    Return a new session for the transport
+    """
+    if transport == REQUESTS:
+        return requests.Session()
+    if transport in (DIRECT, HTTP2):
+        return DirectSession()
+    raise ValueError(f"Unknown transport: {transport}")
@@ -1,5 +1,11 @@
+import codecs
+import copy
+import json
 import re
+from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import Optional
 
 try:
     from jsonpath_ng import parse as jsonpath
@@ -10,6 +16,8 @@ except ImportError:
 
 from itertools import zip_longest
 
+import yaml
+
 
 empty = object()
 
@@ -55,6 +63,159 @@ def obj_check(obj_value, original_obj_value, is_strategic=True):
     return check_result
 
 
+def obj_diff(obj, original_obj, is_strategic=True) -> dict:
+    """
+    Return the JSON merge patch which turns original_obj into
+    obj_merge(obj, original_obj, is_strategic).
+
+    Like obj_merge, keys missing in obj are not removed. Lists are compared
+    as a whole. Subtrees of a CopyOnWriteDict which were never accessed are
+    still shared with original_obj and skipped without comparing them. An
+    empty dict equals a missing key (e.g. after reading APIObject.labels).
+    """
+    patch = {}
+    for key, value in dict.items(obj):
+        if key not in original_obj:
+            if not (isinstance(value, dict) and not value):
+                patch[key] = value
+            continue
+        original_value = original_obj[key]
+        if value is original_value:
+            continue
+        if isinstance(value, dict) and isinstance(original_value, dict):
+            value_patch = obj_diff(value, original_value, is_strategic)
+            if value_patch:
+                patch[key] = value_patch
+        else:
+            value = obj_check(value, original_value, is_strategic)
+            if value != original_value:
+                patch[key] = value
+    return patch
+
+
+class CopyOnWriteDict(dict):
+    """
+    Copy of a JSON-like dict which never modifies its source.
+
+    Only the top-level dict is copied upfront (shallow). Nested dicts and lists
+    which are still shared with the source are copied the same way when they are
+    first accessed, so read-only consumers pay for a shallow copy only and a
+    mutation copies just the path leading to it.
+
+    The source must not be modified afterwards.
+    """
+
+    __slots__ = ("_source",)
+
+    def __init__(self, source: dict):
+        super().__init__(source if type(source) is dict else dict.items(source))
+        self._source = source
+
+    def _child(self, key, value):
+        if isinstance(value, (dict, list)) and value is dict.get(self._source, key):
+            value = _copy_on_write(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _copy_all(self):
+        for key, value in dict.items(self):
+            self._child(key, value)
+
+    def __getitem__(self, key):
+        return self._child(key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # not inherited, so that dict(), {**d} and dict.update() go through
+        # keys() and __getitem__ instead of copying shared children
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._copy_all()
+        return dict.popitem(self)
+
+    def values(self):
+        self._copy_all()
+        return dict.values(self)
+
+    def items(self):
+        self._copy_all()
+        return dict.items(self)
+
+    def copy(self) -> dict:
+        self._copy_all()
+        return dict(dict.items(self))
+
+    __copy__ = copy
+
+    def __or__(self, other):
+        return self.copy() | other
+
+    def __deepcopy__(self, memo) -> dict:
+        return {key: copy.deepcopy(value, memo) for key, value in dict.items(self)}
+
+    def __reduce__(self):
+        return (dict, (self.copy(),))
+
+
+class CopyOnWriteList(list):
+    """
+    Copy of a JSON-like list which never modifies its source.
+
+    Nested dicts and lists are wrapped with CopyOnWriteDict/CopyOnWriteList.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, source: list):
+        super().__init__(_copy_on_write(value) for value in source)
+
+    def __deepcopy__(self, memo) -> list:
+        return [copy.deepcopy(value, memo) for value in self]
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+
+def _copy_on_write(value):
+    if isinstance(value, dict):
+        return CopyOnWriteDict(value)
+    if isinstance(value, list):
+        return CopyOnWriteList(value)
+    return value
+
+
+def _represent_copy_on_write_dict(dumper, data):
+    return dumper.represent_dict(dict(dict.items(data)))
+
+
+def _represent_copy_on_write_list(dumper, data):
+    return dumper.represent_list(list(data))
+
+
+# e.g. yaml.safe_dump(pod.obj)
+for _dumper in (yaml.SafeDumper, yaml.Dumper):
+    yaml.add_representer(CopyOnWriteDict, _represent_copy_on_write_dict, Dumper=_dumper)
+    yaml.add_representer(CopyOnWriteList, _represent_copy_on_write_list, Dumper=_dumper)
+
+
 def jsonpath_parse(template, obj):
     def repl(m):
         path = m.group(2)
@@ -87,3 +248,118 @@ def join_url_path(*components, join_empty: bool = False) -> str:
 
     path = "/".join(new_comps)
     return "/" + path
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+class _JSONChunkReader:
+    """
+    Text buffer over an iterable of byte chunks, used for incremental decoding.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> None:
+        """
+        Read at least as much data as is currently buffered (geometric growth keeps
+        retried decodes of large values linear), or until the input is exhausted.
+        """
+        if self.pos > 65536:
+            self.buf = self.buf[self.pos :]
+            self.pos = 0
+        wanted = max(len(self.buf) - self.pos, 1)
+        new = []
+        received = 0
+        while received < wanted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.eof = True
+                new.append(self._decoder.decode(b"", final=True))
+                break
+            text = self._decoder.decode(chunk)
+            new.append(text)
+            received += len(text)
+        self.buf += "".join(new)
+
+    def peek(self) -> str:
+        """
+        Skip whitespace and return the next character ("" at end of input).
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos : self.pos + 1]
+            self.fill()
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting {char!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """
+        Decode the next complete JSON value, reading more input as needed.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            if (
+                end == len(self.buf)
+                and not self.eof
+                and isinstance(value, (int, float))
+            ):
+                # a number at the end of the buffer might continue in the next chunk
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(
+    chunks: Iterable[bytes], key: str = "items", fields: Optional[dict] = None
+) -> Iterator:
+    """
+    Incrementally decode a JSON object from byte chunks and yield the elements
+    of its `key` array while the input is still being read.
+
+    Only one element is decoded at a time. All other top-level fields (e.g.
+    `metadata` of a list response) are stored in the optional `fields` dict.
+    """
+    if fields is None:
+        fields = {}
+    reader = _JSONChunkReader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() != "]":
+                while True:
+                    yield reader.value()
+                    if reader.peek() == "]":
+                        break
+                    reader.expect(",")
+            reader.expect("]")
+        else:
+            fields[name] = reader.value()
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import sys
+
+import pytest
+
+from pykube import KubeConfig
+from pykube import ObjectDoesNotExist
+from pykube import Pod
+from pykube.exceptions import HTTPError
+
+aiohttp = pytest.importorskip("aiohttp")
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+from pykube import aio  # noqa: E402
+
+
+POD = {
+    "apiVersion": "v1",
+    "kind": "Pod",
+    "metadata": {"name": "pod1", "namespace": "default", "labels": {"app": "a"}},
+}
+
+
+def run(app, test, user=None):
+    async def main():
+        async with TestServer(app) as server:
+            config = KubeConfig(
+                {
+                    "clusters": [
+                        {"name": "c", "cluster": {"server": str(server.make_url(""))}}
+                    ],
+                    "users": [{"name": "u", "user": user or {"token": "testtoken"}}],
+                    "contexts": [
+                        {"name": "c", "context": {"cluster": "c", "user": "u"}}
+                    ],
+                    "current-context": "c",
+                }
+            )
+            async with aio.AsyncHTTPClient(config) as api:
+                return await test(api)
+
+    return asyncio.run(main())
+
+
+def test_list_and_get_by_name():
+    seen = []
+
+    async def list_pods(request):
+        seen.append((request.path, request.query_string, request.headers))
+        return web.json_response({"kind": "PodList", "items": [POD]})
+
+    async def get_pod(request):
+        if request.match_info["name"] != "pod1":
+            return web.json_response(
+                {"kind": "Status", "message": "not found"}, status=404
+            )
+        return web.json_response(POD)
+
+    app = web.Application()
+    app.router.add_get("/api/v1/namespaces/default/pods", list_pods)
+    app.router.add_get("/api/v1/namespaces/default/pods/{name}", get_pod)
+
+    async def test(api):
+        query = Pod.objects(api)
+        assert isinstance(query, aio.AsyncQuery)
+        pods = [pod async for pod in query.filter(selector={"app": "a"})]
+        assert [pod.name for pod in pods] == ["pod1"]
+        assert (await query.get(name="pod1")).labels == {"app": "a"}
+        with pytest.raises(ObjectDoesNotExist):
+            await query.get_by_name("missing")
+
+    run(app, test)
+    path, query_string, headers = seen[0]
+    assert path == "/api/v1/namespaces/default/pods"
+    assert query_string == "labelSelector=app%3Da"
+    assert headers["Authorization"] == "Bearer testtoken"
+    assert headers["User-Agent"].startswith("new-pykube/")
+
+
+def test_watch():
+    async def watch_pods(request):
+        assert request.query["watch"] == "true"
+        assert request.query["resourceVersion"] == "42"
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for event_type in ("ADDED", "MODIFIED"):
+            line = json.dumps({"type": event_type, "object": POD}) + "\n"
+            await response.write(line.encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/api/v1/namespaces/default/pods", watch_pods)
+
+    async def test(api):
+        return [event async for event in Pod.objects(api).watch(since="42")]
+
+    events = run(app, test)
+    assert [event.type for event in events] == ["ADDED", "MODIFIED"]
+    assert events[0].object.name == "pod1"
+
+
+def test_create_patch_delete():
+    calls = []
+
+    async def handle(request):
+        body = await request.read()
+        calls.append((request.method, request.path, request.content_type, body))
+        if request.method == "DELETE":
+            return web.json_response({"kind": "Status", "status": "Success"})
+        obj = json.loads(json.dumps(POD))
+        obj["metadata"]["resourceVersion"] = str(len(calls))
+        return web.json_response(obj)
+
+    app = web.Application()
+    app.router.add_route("*", "/api/v1/namespaces/default/pods", handle)
+    app.router.add_route("*", "/api/v1/namespaces/default/pods/{name}", handle)
+
+    async def test(api):
+        pod = Pod(api, json.loads(json.dumps(POD)))
+        await aio.create(pod)
+        assert pod.metadata["resourceVersion"] == "1"
+        await aio.patch(pod, {"metadata": {"labels": {"app": "b"}}})
+        await aio.reload(pod)
+        assert pod.metadata["resourceVersion"] == "3"
+        await aio.delete(pod, propagation_policy="Foreground")
+
+    run(app, test)
+    assert [(method, path) for method, path, _, _ in calls] == [
+        ("POST", "/api/v1/namespaces/default/pods"),
+        ("PATCH", "/api/v1/namespaces/default/pods/pod1"),
+        ("GET", "/api/v1/namespaces/default/pods/pod1"),
+        ("DELETE", "/api/v1/namespaces/default/pods/pod1"),
+    ]
+    assert calls[1][2] == "application/merge-patch+json"
+    assert json.loads(calls[3][3]) == {"propagationPolicy": "Foreground"}
+
+
+def test_apply_all():
+    calls = []
+
+    async def handle(request):
+        calls.append((request.content_type, dict(request.query)))
+        obj = json.loads(await request.read())
+        obj["metadata"]["resourceVersion"] = "1"
+        return web.json_response(obj)
+
+    app = web.Application()
+    app.router.add_patch("/api/v1/namespaces/default/pods/{name}", handle)
+
+    async def test(api):
+        pods = [
+            Pod(api, {"metadata": {"name": name}, "spec": {}})
+            for name in ("pod1", "pod2")
+        ]
+        assert await aio.apply_all(pods, field_manager="test") == pods
+        return pods
+
+    pods = run(app, test)
+    assert [pod.metadata["resourceVersion"] for pod in pods] == ["1", "1"]
+    assert calls == [("application/apply-patch+yaml", {"fieldManager": "test"})] * 2
+
+
+def test_status_error_raises_http_error():
+    async def forbidden(request):
+        return web.json_response(
+            {"kind": "Status", "message": "pods is forbidden", "code": 403},
+            status=403,
+        )
+
+    app = web.Application()
+    app.router.add_get("/api/v1/namespaces/default/pods/{name}", forbidden)
+
+    async def test(api):
+        with pytest.raises(HTTPError) as exc_info:
+            await Pod.objects(api).get_by_name("pod1")
+        return exc_info.value
+
+    assert run(app, test).code == 403
+
+
+def test_list_error_raises_http_error():
+    async def unavailable(request):
+        return web.Response(text="upstream connect error", status=503)
+
+    app = web.Application()
+    app.router.add_get("/api/v1/namespaces/default/pods", unavailable)
+
+    async def test(api):
+        with pytest.raises(HTTPError) as exc_info:
+            await Pod.objects(api).execute()
+        return exc_info.value
+
+    assert run(app, test).code == 503
+
+
+def test_unauthorized_renews_exec_credential(tmp_path):
+    tokens = tmp_path / "tokens"
+    script = (
+        "import json, pathlib\n"
+        f"path = pathlib.Path({str(tokens)!r})\n"
+        "n = len(path.read_text()) if path.exists() else 0\n"
+        "path.write_text('x' * (n + 1))\n"
+        "print(json.dumps({'status': {'token': f'token-{n}'}}))\n"
+    )
+    user = {
+        "exec": {
+            "apiVersion": "client.authentication.k8s.io/v1beta1",
+            "command": sys.executable,
+            "args": ["-c", script],
+        }
+    }
+    seen = []
+
+    async def handle(request):
+        seen.append(request.headers["Authorization"])
+        if request.headers["Authorization"] != "Bearer token-1":
+            return web.json_response(
+                {"kind": "Status", "message": "Unauthorized", "code": 401},
+                status=401,
+            )
+        return web.json_response(POD)
+
+    app = web.Application()
+    app.router.add_get("/api/v1/namespaces/default/pods/{name}", handle)
+
+    async def test(api):
+        return await Pod.objects(api).get_by_name("pod1")
+
+    assert run(app, test, user).name == "pod1"
+    assert seen == ["Bearer token-0", "Bearer token-1"]
@@ -234,12 +234,14 @@ def test_list_and_update_deployments(api, requests_mock):
         deploy.update()
         assert len(rsps.calls) == 2
 
-        assert json.loads(rsps.calls[-1].request.body) == {
-            "metadata": {"name": "deploy-1"},
-            "spec": {"replicas": 2},
-        }
+        # only the change is sent
+        assert json.loads(rsps.calls[-1].request.body) == {"spec": {"replicas": 2}}
         assert deploy.replicas == 2
 
+        # no-op update does not make a request
+        deploy.update()
+        assert len(rsps.calls) == 2
+
 
 def test_list_and_patch_deployments(api, requests_mock):
     with requests_mock as rsps:
@@ -278,6 +280,46 @@ def test_list_and_patch_deployments(api, requests_mock):
         assert deploy.labels["a"] == "b"
 
 
+def test_apply_and_apply_all(api, requests_mock):
+    with requests_mock as rsps:
+        for name in ("deploy-1", "deploy-2"):
+            rsps.add(
+                responses.PATCH,
+                f"https://localhost:9443/apis/apps/v1/namespaces/default/deployments/{name}",
+                json={
+                    "metadata": {"name": name, "resourceVersion": "2"},
+                    "spec": {"replicas": 2},
+                },
+            )
+
+        deploy = Deployment(
+            api,
+            {
+                "metadata": {"name": "deploy-1", "managedFields": [{}]},
+                "spec": {"replicas": 2},
+            },
+        )
+        deploy.apply(field_manager="test", force=True)
+        request = rsps.calls[-1].request
+        assert request.headers["Content-Type"] == "application/apply-patch+yaml"
+        assert request.params == {"fieldManager": "test", "force": "true"}
+        assert json.loads(request.body) == {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "metadata": {"name": "deploy-1"},
+            "spec": {"replicas": 2},
+        }
+        assert deploy.metadata["resourceVersion"] == "2"
+
+        objects = [
+            Deployment(api, {"metadata": {"name": name}})
+            for name in ("deploy-1", "deploy-2")
+        ]
+        assert pykube.apply_all(objects, field_manager="test") == objects
+        assert len(rsps.calls) == 3
+        assert [obj.replicas for obj in objects] == [2, 2]
+
+
 def test_pod_exists(api, requests_mock):
     with requests_mock as rsps:
         obj = {
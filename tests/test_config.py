@@ -1,9 +1,11 @@
 # pykube.config unittests
 import os
+import time
 from pathlib import Path
 from unittest.mock import MagicMock
 
 import pytest
+import yaml
 
 from . import TestCase
 from pykube import config
@@ -231,3 +233,23 @@ class TestConfig(TestCase):
 
         self.assertEqual(CERT_DUMMY, data._bytes)
         self.assertEqual(CERT_DUMMY, key._bytes)
+
+
+def test_persist_doc(tmp_path):
+    path = tmp_path / "kubeconfig"
+    path.write_text(GOOD_CONFIG_FILE_PATH.read_text())
+    path.chmod(0o600)
+    cfg = config.KubeConfig.from_file(str(path))
+
+    cfg.doc["current-context"] = "second"
+    cfg.persist_doc(delay=0.1)
+    cfg.doc["preferences"] = {"colors": True}
+    cfg.persist_doc(delay=0.1)
+    assert yaml.safe_load(path.read_text()).get("current-context") != "second"
+    time.sleep(0.5)
+
+    doc = yaml.safe_load(path.read_text())
+    assert doc["current-context"] == "second"
+    assert doc["preferences"] == {"colors": True}
+    assert path.stat().st_mode & 0o777 == 0o600
+    assert [p.name for p in tmp_path.iterdir()] == ["kubeconfig"]
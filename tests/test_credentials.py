@@ -0,0 +1,93 @@
+import datetime
+import threading
+import time
+
+from pykube.credentials import cache_key
+from pykube.credentials import CredentialCache
+from pykube.credentials import parse_timestamp
+from pykube.credentials import UTC
+
+
+def expires_in(**kwargs):
+    return datetime.datetime.now(tz=UTC) + datetime.timedelta(**kwargs)
+
+
+def test_parse_timestamp():
+    expected = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+    assert parse_timestamp("2024-01-02T03:04:05Z") == expected
+    assert parse_timestamp("2024-01-02T03:04:05.123456789Z") == expected
+    assert parse_timestamp("2024-01-02T04:04:05+01:00") == expected
+
+
+def test_cache_key():
+    assert cache_key({"a": 1, "b": 2}) == cache_key({"b": 2, "a": 1})
+    assert cache_key({"a": 1}) != cache_key({"a": 2})
+
+
+def test_credential_cache_until_expiry():
+    cache = CredentialCache()
+    calls = []
+
+    def fetch(expiry):
+        def fetch():
+            calls.append(expiry)
+            return {"token": str(len(calls))}, expiry
+
+        return fetch
+
+    assert cache.get("a", fetch(expires_in(hours=1))) == {"token": "1"}
+    assert cache.get("a", fetch(expires_in(hours=1))) == {"token": "1"}
+    assert cache.get("b", fetch(None)) == {"token": "2"}
+    assert cache.get("b", fetch(None)) == {"token": "2"}
+    cache.invalidate("b")
+    assert cache.get("b", fetch(None)) == {"token": "3"}
+
+    # within the refresh window: refreshed ahead of expiry
+    cache.get("c", fetch(expires_in(seconds=30)))
+    assert cache.get("c", fetch(expires_in(hours=1))) == {"token": "5"}
+    assert len(calls) == 5
+
+
+def test_credential_cache_keeps_valid_credential_if_refresh_fails():
+    cache = CredentialCache()
+    cache.get("a", lambda: ({"token": "old"}, expires_in(seconds=30)))
+
+    def fail():
+        raise RuntimeError("command failed")
+
+    assert cache.get("a", fail) == {"token": "old"}
+
+
+def test_credential_cache_single_flight():
+    cache = CredentialCache()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"token": "t"}, expires_in(hours=1)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("a", fetch)))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [{"token": "t"}] * 10
+    assert len(calls) == 1
+
+
+def test_credential_cache_shared_on_disk(tmp_path):
+    expiry = expires_in(hours=1)
+    first = CredentialCache(cache_dir=tmp_path)
+    first.get("a", lambda: ({"token": "t"}, expiry))
+    assert [path.name for path in tmp_path.iterdir()] == ["a.json"]
+    assert tmp_path.joinpath("a.json").stat().st_mode & 0o077 == 0
+
+    second = CredentialCache(cache_dir=tmp_path)
+    assert second.get("a", lambda: ({"token": "other"}, expiry)) == {"token": "t"}
+    second.invalidate("a")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,169 @@
+import time
+from unittest import mock
+
+import pytest
+import requests
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.endpoints import EndpointPool
+from pykube.hedging import HedgePolicy
+from pykube.hedging import primary_aborted
+
+A = "https://10.0.0.1:6443"
+B = "https://10.0.0.2:6443"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("pykube.endpoints.time.monotonic", lambda: now[0])
+    return now
+
+
+def response(status_code=200):
+    return mock.MagicMock(status_code=status_code)
+
+
+def test_least_outstanding_requests():
+    pool = EndpointPool([A, B, "https://10.0.0.3:6443"])
+    first = pool.acquire()
+    second = pool.acquire()
+    third = pool.acquire()
+    assert len({first, second, third}) == 3
+    pool.release(second, failed=False)
+    assert pool.acquire() is second
+    with pytest.raises(ValueError):
+        EndpointPool([])
+
+
+def test_circuit_breaker(clock):
+    pool = EndpointPool([A, B], failure_threshold=2, open_seconds=10)
+    a, b = pool.endpoints
+    for _ in range(2):
+        pool.release(pool.acquire(exclude=[b]), failed=True)
+    assert pool.stats()[A]["state"] == "open"
+    assert {pool.acquire() for _ in range(3)} == {b}
+
+    # a single trial request once the circuit is half-open
+    clock[0] += 10
+    assert pool.stats()[A]["state"] == "half-open"
+    assert pool.acquire() is a
+    assert pool.acquire() is b
+    pool.release(a, failed=True)
+    assert pool.stats()[A]["state"] == "open"
+    assert pool.stats()[A]["opened"] == 2
+
+    clock[0] += 10
+    pool.release(pool.acquire(), failed=False)
+    assert pool.stats()[A]["state"] == "closed"
+
+
+def test_all_circuits_open(clock):
+    pool = EndpointPool([A, B], failure_threshold=1)
+    a, b = pool.endpoints
+    pool.release(pool.acquire(exclude=[b]), failed=True)
+    clock[0] += 1
+    pool.release(pool.acquire(exclude=[a]), failed=True)
+    assert pool.acquire() is a
+
+
+def test_failover():
+    pool = EndpointPool([A, B])
+    urls = []
+
+    def send(status_code):
+        def send(url):
+            urls.append(url)
+            if len(urls) == 1:
+                return response(status_code)
+            return response()
+
+        return send
+
+    assert pool.call("GET", send(503)).status_code == 200
+    assert len(set(urls)) == 2
+
+    # not idempotent: the request might have been processed
+    urls.clear()
+    assert pool.call("POST", send(503)).status_code == 503
+    assert len(urls) == 1
+
+    def fail(error):
+        def send(url):
+            urls.append(url)
+            if len(urls) == 1:
+                raise error
+            return response()
+
+        return send
+
+    urls.clear()
+    assert pool.call("POST", fail(requests.exceptions.ConnectTimeout())).ok
+    urls.clear()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        pool.call("POST", fail(requests.exceptions.ReadTimeout()))
+    assert sum(e["outstanding"] for e in pool.stats().values()) == 0
+
+
+def test_aborted_hedged_request_does_not_fail_over():
+    pool = EndpointPool([A, B], failure_threshold=1)
+    policy = HedgePolicy(delay=0.05, max_hedge_ratio=1)
+    urls = []
+
+    def send(url):
+        urls.append(url)
+        if len(urls) == 1:
+            # the primary request: its connection is shut down once the hedge won
+            deadline = time.monotonic() + 5
+            while not primary_aborted() and time.monotonic() < deadline:
+                time.sleep(0.01)
+            raise requests.exceptions.ConnectionError("connection shut down")
+        return response()
+
+    def primary():
+        return pool.call("GET", send)
+
+    assert policy.call(primary).status_code == 200
+    assert policy.stats()["hedge_wins"] == 1
+    # no failover request after the abort and no failure recorded
+    assert len(urls) == 2
+    stats = pool.stats()
+    assert sum(e["failures"] for e in stats.values()) == 0
+    assert sum(e["opened"] for e in stats.values()) == 0
+    assert sum(e["outstanding"] for e in stats.values()) == 0
+
+
+def test_http_client_endpoints_from_kubeconfig(monkeypatch):
+    monkeypatch.setattr("pykube.endpoints.random.choice", lambda seq: seq[0])
+    config = KubeConfig(
+        {
+            "clusters": [{"name": "c", "cluster": {"server": A, "servers": [A, B]}}],
+            "users": [{"name": "u", "user": {}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    api = HTTPClient(config)
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(
+            responses.GET,
+            f"{A}/api/v1/pods",
+            body=requests.exceptions.ConnectionError("refused"),
+        )
+        rsps.add(responses.GET, f"{B}/api/v1/pods", json={})
+        for _ in range(3):
+            assert api.get(url="pods").ok
+    stats = api.endpoints.stats()
+    assert stats[A]["state"] == "open"
+    assert stats[B]["requests"] == 3
+
+
+def test_http_client_without_endpoints():
+    api = HTTPClient(KubeConfig.from_url("http://localhost"))
+    assert api.endpoints is None
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), endpoints=[A, B])
+    assert [e.url for e in api.endpoints.endpoints] == [A, B]
@@ -0,0 +1,211 @@
+import threading
+from unittest import mock
+
+import pytest
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.retry import RetryBudget
+from pykube.retry import RetryPolicy
+from pykube.flowcontrol import AdaptiveConcurrencyLimiter
+from pykube.flowcontrol import RateLimiter
+from pykube.flowcontrol import request_class
+from pykube.flowcontrol import resource_from_url
+from pykube.flowcontrol import TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("pykube.flowcontrol.time.monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize(
+    "url,resource",
+    [
+        ("https://localhost/api/v1/pods", "pods"),
+        ("https://localhost/api/v1/namespaces/default/pods/my-pod", "pods"),
+        ("https://localhost/api/v1/namespaces/default", "namespaces"),
+        ("https://localhost/apis/apps/v1/namespaces/ns/deployments", "deployments"),
+        ("https://localhost/version/", None),
+    ],
+)
+def test_resource_from_url(url, resource):
+    assert resource_from_url(url) == resource
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(qps=2, burst=3)
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+    clock[0] += 1
+    # the two queued requests used up the refilled tokens
+    assert bucket.reserve() == 0.5
+    assert bucket.stats()["delayed"] == 3
+    assert bucket.stats()["wait_seconds_total"] == 2.0
+    assert bucket.stats()["wait_seconds_max"] == 1.0
+    with pytest.raises(ValueError):
+        TokenBucket(qps=0, burst=1)
+
+
+def test_rate_limiter_per_verb_and_resource(clock):
+    limiter = RateLimiter(qps=None, limits={"PATCH": (1, 1), ("GET", "pods"): (1, 2)})
+    url = "https://localhost/api/v1/namespaces/default/pods"
+    assert limiter.reserve("PATCH", url) == 0
+    assert limiter.reserve("PATCH", url) == 1
+    assert limiter.reserve("GET", "https://localhost/api/v1/nodes") == 0
+    assert [limiter.reserve("GET", url) for _ in range(3)] == [0, 0, 1]
+    assert set(limiter.stats()) == {"PATCH", "GET pods"}
+
+
+def test_http_client_rate_limits_all_but_watches(monkeypatch):
+    limiter = mock.MagicMock()
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), rate_limiter=limiter)
+    mock_send = mock.MagicMock()
+    mock_send.side_effect = Exception("MOCK HTTP")
+    monkeypatch.setattr("pykube.http.KubernetesHTTPAdapter._do_send", mock_send)
+
+    for kwargs in ({"url": "pods"}, {"url": "pods?watch=true", "stream": True}):
+        with pytest.raises(Exception):
+            api.get(**kwargs)
+    with pytest.raises(Exception):
+        api.request("DELETE", url="pods/x", namespace="default")
+
+    assert limiter.wait.call_args_list == [
+        mock.call("GET", "http://localhost/api/v1/pods"),
+        mock.call("DELETE", "http://localhost/api/v1/namespaces/default/pods/x"),
+    ]
+
+
+def response(status_code=200, **headers):
+    return mock.MagicMock(status_code=status_code, headers=headers)
+
+
+def test_adaptive_concurrency_limiter(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=5)
+    for _ in range(10):
+        limiter.release(limiter.acquire(), response())
+    assert 5 == limiter.limit
+
+    # requests in flight during the overload only decrease the limit once
+    starts = [limiter.acquire() for _ in range(3)]
+    clock[0] += 0.001
+    for start in starts:
+        limiter.release(
+            start, response(429, **{"X-Kubernetes-PF-PriorityLevel-UID": "uid"})
+        )
+    assert limiter.limit == 2.5
+    clock[0] += 0.001
+    start = limiter.acquire()
+    limiter.release(start, response(503))
+    assert limiter.limit == 1.25
+
+    # failed requests without response do not change the limit
+    limiter.release(limiter.acquire(), None)
+    stats = limiter.stats()
+    assert stats["limit"] == 1.25
+    assert stats["in_flight"] == 0
+    assert stats["overloaded"] == 4
+    assert stats["decreases"] == 2
+    assert stats["rejected_by_priority_level"] == {"uid": 3}
+
+
+def test_adaptive_concurrency_limiter_latency(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+    for latency in (0.1, 0.15, 0.5):
+        start = limiter.acquire()
+        clock[0] += latency
+        limiter.release(start, response())
+    assert limiter.stats()["decreases"] == 1
+    assert 5 < limiter.limit < 5.5
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(initial_limit=0)
+
+
+def test_adaptive_concurrency_limiter_latency_per_request_class(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+    get = request_class("GET", "https://localhost/api/v1/namespaces/a/pods/b")
+    list_ = request_class("GET", "https://localhost/api/v1/pods")
+    assert get == ("GET", "pods", False)
+    assert list_ == ("GET", "pods", True)
+    for kind, latency in ((get, 0.01), (list_, 1.0), (get, 0.02), (list_, 1.2)):
+        start = limiter.acquire()
+        clock[0] += latency
+        limiter.release(start, response(), kind)
+    # slow lists are no overload compared to fast gets
+    assert limiter.stats()["decreases"] == 0
+
+    start = limiter.acquire()
+    clock[0] += 3.0
+    limiter.release(start, response(), list_)
+    assert limiter.stats()["decreases"] == 1
+
+
+def test_adaptive_concurrency_limiter_blocks(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    start = limiter.acquire()
+    acquired = threading.Event()
+
+    def acquire():
+        limiter.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=acquire)
+    thread.start()
+    assert not acquired.wait(0.05)
+    limiter.release(start, response())
+    assert acquired.wait(1)
+    thread.join()
+
+
+def test_http_client_concurrency_limiter():
+    limiter = AdaptiveConcurrencyLimiter()
+    api = HTTPClient(
+        KubeConfig.from_url("http://localhost"), concurrency_limiter=limiter
+    )
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/pods", status=429)
+        api.get(url="pods")
+        api.get(url="pods", stream=True)
+        rsps.replace(
+            responses.GET, "http://localhost/api/v1/pods", body=Exception("MOCK")
+        )
+        with pytest.raises(Exception):
+            api.get(url="pods")
+
+    stats = limiter.stats()
+    assert stats["requests"] == 2
+    assert stats["in_flight"] == 0
+    assert stats["limit"] == 5
+
+
+def test_http_client_concurrency_limiter_per_attempt(clock, monkeypatch):
+    def sleep(seconds):
+        clock[0] += seconds
+
+    monkeypatch.setattr("pykube.http.time.sleep", sleep)
+    limiter = AdaptiveConcurrencyLimiter()
+    api = HTTPClient(
+        KubeConfig.from_url("http://localhost"),
+        concurrency_limiter=limiter,
+        retry_policy=RetryPolicy(budget=RetryBudget()),
+    )
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        url = "http://localhost/api/v1/pods"
+        rsps.add(responses.GET, url, status=429, headers={"Retry-After": "5"})
+        rsps.add(responses.GET, url, json={})
+        rsps.add(responses.GET, url, json={})
+        assert api.get(url="pods").ok
+        assert api.get(url="pods").ok
+
+    # the attempts are limited and measured on their own, the retry delay is
+    # no latency
+    stats = limiter.stats()
+    assert stats["requests"] == 3
+    assert stats["overloaded"] == 1
+    assert stats["in_flight"] == 0
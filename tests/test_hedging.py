@@ -0,0 +1,178 @@
+import http.server
+import threading
+import time
+from unittest import mock
+
+import pytest
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.hedging import HedgePolicy
+from pykube.hedging import LatencyTracker
+
+
+def slow_then_fast(*delays):
+    """
+    Return a send function whose n-th call sleeps delays[n]
+    """
+    calls = []
+    lock = threading.Lock()
+
+    def send():
+        with lock:
+            n = len(calls)
+            response = mock.MagicMock(name=f"response-{n}")
+            calls.append(response)
+        time.sleep(delays[n])
+        return response
+
+    return send, calls
+
+
+def test_latency_tracker():
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(0.95) is None
+    for i in range(200):
+        tracker.add(i / 100)
+    assert len(tracker) == 100
+    assert tracker.percentile(0.95) == 1.95
+    assert tracker.percentile(0.5) == 1.5
+
+
+def test_hedge_delay():
+    assert HedgePolicy(delay=0.2).hedge_delay() == 0.2
+    policy = HedgePolicy(min_samples=10, min_delay=0.01)
+    for _ in range(9):
+        policy.latencies.add(0.001)
+    assert policy.hedge_delay() is None
+    policy.latencies.add(0.001)
+    assert policy.hedge_delay() == 0.01
+
+
+def test_hedged_request_uses_first_response():
+    policy = HedgePolicy(delay=0.05, max_hedge_ratio=1)
+    send, calls = slow_then_fast(1, 0)
+    assert policy.call(send) is calls[1]
+    assert policy.stats()["hedged"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+    # the slow response is closed once it arrives
+    time.sleep(1.1)
+    calls[0].close.assert_called_once_with()
+    assert not calls[1].close.called
+
+
+def test_fast_request_is_not_hedged():
+    policy = HedgePolicy(delay=0.5, max_hedge_ratio=1)
+    send, calls = slow_then_fast(0)
+    assert policy.call(send) is calls[0]
+    assert len(calls) == 1
+    assert policy.stats()["hedged"] == 0
+
+
+def test_hedge_rate_is_capped():
+    policy = HedgePolicy(delay=0, max_hedge_ratio=0.5)
+    send, calls = slow_then_fast(*[0.01] * 10)
+    for _ in range(4):
+        policy.call(send)
+    assert policy.stats()["requests"] == 4
+    assert policy.stats()["hedged"] == 2
+
+
+def test_hedge_after_failed_request():
+    policy = HedgePolicy(delay=0.05, max_hedge_ratio=1)
+    started = threading.Event()
+
+    def send():
+        if not started.is_set():
+            started.set()
+            time.sleep(0.1)
+            raise ConnectionError("failed")
+        return "response"
+
+    assert policy.call(send) == "response"
+
+    def fail():
+        time.sleep(0.1)
+        raise ConnectionError("failed")
+
+    with pytest.raises(ConnectionError):
+        policy.call(fail)
+
+
+def test_http_client_hedges_gets_only():
+    policy = HedgePolicy(delay=0.05, max_hedge_ratio=1)
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), hedge_policy=policy)
+    calls = []
+
+    def callback(request):
+        calls.append(request)
+        if len(calls) == 1:
+            time.sleep(0.5)
+        return 200, {}, str(len(calls))
+
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add_callback(responses.GET, "http://localhost/api/v1/pods", callback)
+        rsps.add_callback(responses.POST, "http://localhost/api/v1/pods", callback)
+        assert api.get(url="pods").text == "2"
+        api.post(url="pods", json={})
+        time.sleep(0.5)
+    assert len(calls) == 3
+    assert policy.stats()["requests"] == 1
+
+
+def test_primary_runs_on_calling_thread():
+    policy = HedgePolicy(delay=0.05, max_hedge_ratio=1)
+    threads = []
+
+    def send():
+        threads.append(threading.current_thread())
+        time.sleep(0.2 if len(threads) == 1 else 0)
+        return mock.MagicMock()
+
+    policy.call(send)
+    assert threads[0] is threading.current_thread()
+    assert threads[1].name.startswith("pykube-hedge")
+
+
+def test_hedge_aborts_primary_connection():
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if len(requests_seen) == 1:
+                time.sleep(5)
+            body = str(len(requests_seen)).encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        rate_limiter = mock.MagicMock()
+        policy = HedgePolicy(delay=0.1, max_hedge_ratio=1)
+        api = HTTPClient(
+            KubeConfig.from_url(f"http://localhost:{server.server_port}"),
+            hedge_policy=policy,
+            rate_limiter=rate_limiter,
+        )
+        start = time.monotonic()
+        assert api.get(url="pods").text == "2"
+        # the first request was not waited for
+        assert time.monotonic() - start < 2
+        assert policy.stats()["hedge_wins"] == 1
+        # the hedge counts against the rate limit
+        assert rate_limiter.wait.call_count == 2
+        assert api.pool_stats()["default"]["in_use"] == 0
+    finally:
+        server.shutdown()
@@ -1,14 +1,29 @@
 # pykube.http unittests
+import base64
+import json
+import http.server
 import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import threading
+import time
 from pathlib import Path
 from unittest import mock
 
 import pytest
+import responses
 
 from pykube import __version__
 from pykube.config import KubeConfig
+from pykube.credentials import CredentialCache
+from pykube.flowcontrol import RateLimiter
 from pykube.http import DEFAULT_HTTP_TIMEOUT
 from pykube.http import HTTPClient
+from pykube.http import keepalive_socket_options
+from pykube.http import KubernetesHTTPAdapter
 
 
 BASEDIR = Path("tests")
@@ -59,6 +74,21 @@ def test_http_with_dry_run(monkeypatch):
     assert mock_send.call_args[0][0].url == "http://localhost/api/v1/test?dryRun=All"
 
 
+def test_http_request_with_method_keyword():
+    api = HTTPClient(
+        KubeConfig.from_url("http://localhost"), rate_limiter=RateLimiter()
+    )
+
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/pods", json={})
+        rsps.add(responses.DELETE, "http://localhost/api/v1/pods/a", json={})
+        assert api.request(method="GET", url="pods").ok
+        assert api.request("DELETE", url="pods/a").ok
+        assert [call.request.method for call in rsps.calls] == ["GET", "DELETE"]
+
+
 def test_http_insecure_skip_tls_verify(monkeypatch):
     cfg = KubeConfig.from_file(CONFIG_WITH_INSECURE_SKIP_TLS_VERIFY)
     api = HTTPClient(cfg)
@@ -130,6 +160,137 @@ def test_http_with_oidc_auth_no_refresh(monkeypatch):
     assert mock_send.call_args[0][0].headers["Authorization"] == "Bearer some-id-token"
 
 
+def make_jwt(**claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode("utf-8"))
+    return "header.{}.signature".format(payload.decode("ascii").rstrip("="))
+
+
+def test_is_valid_jwt():
+    adapter = KubernetesHTTPAdapter(KubeConfig.from_file(CONFIG_WITH_OIDC_AUTH))
+    assert adapter._is_valid_jwt(make_jwt(exp=time.time() + 3600))
+    assert adapter._is_valid_jwt(make_jwt(sub="no-exp"))
+    assert not adapter._is_valid_jwt(make_jwt(exp=time.time() + 60))
+    assert not adapter._is_valid_jwt("some-id-token")
+    assert not adapter._is_valid_jwt(None)
+
+    assert adapter._jwt_expires_soon(make_jwt(exp=time.time() + 400))
+    assert not adapter._jwt_expires_soon(make_jwt(exp=time.time() + 3600))
+
+
+def test_http_with_oidc_auth_background_refresh(monkeypatch):
+    cfg = KubeConfig.from_file(CONFIG_WITH_OIDC_AUTH)
+    token = make_jwt(exp=time.time() + 400)
+    cfg.doc["users"][0]["user"]["auth-provider"]["config"]["id-token"] = token
+    cfg.reload()
+    api = HTTPClient(cfg)
+
+    mock_send = mock.MagicMock()
+    mock_send.side_effect = Exception("MOCK HTTP")
+    monkeypatch.setattr("pykube.http.KubernetesHTTPAdapter._do_send", mock_send)
+
+    with mock.patch(
+        "pykube.http.KubernetesHTTPAdapter._refresh_oidc_token"
+    ) as mock_refresh:
+        with pytest.raises(Exception):
+            api.get(url="test")
+        # the valid token is used while the refresh runs in the background
+        assert mock_send.call_args[0][0].headers["Authorization"] == f"Bearer {token}"
+        for _ in range(50):
+            if mock_refresh.called:
+                break
+            time.sleep(0.01)
+        mock_refresh.assert_called_once_with(cfg)
+
+
+def test_http_exec_credential_is_cached(monkeypatch, tmp_path):
+    calls = tmp_path / "calls"
+    script = (
+        "import json, pathlib\n"
+        f"calls = pathlib.Path({str(calls)!r})\n"
+        "calls.write_text(calls.read_text() + 'x' if calls.exists() else 'x')\n"
+        "status = {'token': f'token-{len(calls.read_text())}'}\n"
+        "print(json.dumps({'status': status}))\n"
+    )
+    exec_conf = {
+        "apiVersion": "client.authentication.k8s.io/v1beta1",
+        "command": sys.executable,
+        "args": ["-c", script],
+    }
+    cfg = KubeConfig(
+        {
+            "clusters": [{"name": "c", "cluster": {"server": "http://localhost"}}],
+            "users": [{"name": "u", "user": {"exec": exec_conf}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    adapter = KubernetesHTTPAdapter(cfg, credential_cache=CredentialCache())
+    api = HTTPClient(cfg, http_adapter=adapter)
+
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/test", json={})
+        api.get(url="test")
+        api.get(url="test")
+        assert calls.read_text() == "x"
+        assert rsps.calls[-1].request.headers["Authorization"] == "Bearer token-1"
+
+        # a rejected credential is refreshed
+        rsps.replace(responses.GET, "http://localhost/api/v1/test", status=401)
+        rsps.add(responses.GET, "http://localhost/api/v1/test", json={})
+        assert api.get(url="test").ok
+        assert calls.read_text() == "xx"
+        assert rsps.calls[-1].request.headers["Authorization"] == "Bearer token-2"
+
+
+def test_http_gcp_cmd_credential_is_refreshed_on_unauthorized(monkeypatch):
+    tokens = []
+
+    def gcp_cmd_credential(self, auth_config):
+        tokens.append(f"token-{len(tokens) + 1}")
+        credential = {"token": tokens[-1], "expiry": "2099-01-01T00:00:00Z"}
+        return credential, None
+
+    credentials = mock.MagicMock(valid=True)
+
+    def before_request(request, method, url, headers):
+        headers["Authorization"] = f"Bearer {credentials.token}"
+
+    credentials.before_request.side_effect = before_request
+    google = mock.MagicMock()
+    google.auth.default.return_value = (credentials, "project")
+    monkeypatch.setattr("pykube.http.google", google, raising=False)
+    monkeypatch.setattr("pykube.http.GoogleAuthRequest", mock.MagicMock, raising=False)
+    monkeypatch.setattr("pykube.http.google_auth_installed", True)
+    monkeypatch.setattr("pykube.http.jsonpath_installed", True)
+    monkeypatch.setattr(
+        KubernetesHTTPAdapter, "_gcp_cmd_credential", gcp_cmd_credential
+    )
+    auth_provider = {"name": "gcp", "config": {"cmd-path": "gcloud"}}
+    cfg = KubeConfig(
+        {
+            "clusters": [{"name": "c", "cluster": {"server": "http://localhost"}}],
+            "users": [{"name": "u", "user": {"auth-provider": auth_provider}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    adapter = KubernetesHTTPAdapter(cfg, credential_cache=CredentialCache())
+    api = HTTPClient(cfg, http_adapter=adapter)
+
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/test", status=401)
+        rsps.add(responses.GET, "http://localhost/api/v1/test", json={})
+        assert api.get(url="test").ok
+        # the rejected token was dropped from the cache and fetched again
+        assert tokens == ["token-1", "token-2"]
+        assert rsps.calls[-1].request.headers["Authorization"] == "Bearer token-2"
+        credentials.refresh.assert_not_called()
+
+
 def test_get_kwargs():
     cfg = KubeConfig.from_file(GOOD_CONFIG_FILE_PATH)
     api = HTTPClient(cfg)
@@ -146,3 +307,299 @@ def test_get_kwargs():
         "timeout": 10,
         "url": "http://localhost/apis/storage.k8s.io/v1/",
     }
+
+
+def openssl(*args):
+    subprocess.run(["openssl", *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def tls_files(tmp_path):
+    if not shutil.which("openssl"):
+        pytest.skip("openssl not available")
+    for name, subject, extensions in (
+        ("ca", "/CN=test-ca", []),
+        ("server", "/CN=localhost", ["-addext", "subjectAltName=DNS:localhost"]),
+        ("client", "/CN=test-user", []),
+    ):
+        openssl(
+            "req",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-subj",
+            subject,
+            "-keyout",
+            str(tmp_path / f"{name}.key"),
+            "-out",
+            str(tmp_path / f"{name}.csr"),
+            *extensions,
+        )
+        sign = (
+            ["-signkey", str(tmp_path / "ca.key")]
+            if name == "ca"
+            else ["-CA", str(tmp_path / "ca.crt"), "-CAkey", str(tmp_path / "ca.key")]
+        )
+        openssl(
+            "x509",
+            "-req",
+            "-in",
+            str(tmp_path / f"{name}.csr"),
+            "-out",
+            str(tmp_path / f"{name}.crt"),
+            "-days",
+            "1",
+            "-copy_extensions",
+            "copy",
+            *sign,
+        )
+    return tmp_path
+
+
+@pytest.fixture
+def tls_server(tls_files):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            peer = self.connection.getpeercert()
+            body = json.dumps({"user": dict(peer["subject"][0])["commonName"]})
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(tls_files / "server.crt", tls_files / "server.key")
+    context.load_verify_locations(tls_files / "ca.crt")
+    context.verify_mode = ssl.CERT_REQUIRED
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+
+
+def test_http_client_certificate_from_memory(tls_files, tls_server):
+    def data(name):
+        return base64.b64encode((tls_files / name).read_bytes()).decode("ascii")
+
+    cfg = KubeConfig(
+        {
+            "clusters": [
+                {
+                    "name": "c",
+                    "cluster": {
+                        "server": f"https://localhost:{tls_server}",
+                        "certificate-authority-data": data("ca.crt"),
+                    },
+                }
+            ],
+            "users": [
+                {
+                    "name": "u",
+                    "user": {
+                        "client-certificate-data": data("client.crt"),
+                        "client-key-data": data("client.key"),
+                    },
+                }
+            ],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    api = HTTPClient(cfg)
+    adapter = api.session.get_adapter(api.url)
+    if not adapter.use_ssl_context:
+        pytest.skip("requires requests>=2.32.2")
+
+    with mock.patch("pykube.config.BytesOrFile.filename") as filename:
+        for _ in range(3):
+            response = api.get(url="test")
+            assert response.json() == {"user": "test-user"}
+        filename.assert_not_called()
+    assert len(adapter.credential_state.ssl_contexts) == 1
+    assert len(adapter.poolmanager.pools) == 1
+
+    # watches use their own pool, but the same credentials and SSL context
+    assert api.watch_http_adapter.credential_state is adapter.credential_state
+    response = api.get(url="test", stream=True)
+    assert response.json() == {"user": "test-user"}
+    response.close()
+    assert len(adapter.credential_state.ssl_contexts) == 1
+
+
+def test_http_client_watch_session_settings():
+    api = HTTPClient(KubeConfig.from_url("http://localhost"))
+    api.session.verify = "/path/to/ca.crt"
+    api.session.proxies = {"https": "http://proxy:3128"}
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/pods", body="")
+        api.get(url="pods", stream=True)
+    assert api.watch_session.verify == "/path/to/ca.crt"
+    assert api.watch_session.proxies == {"https": "http://proxy:3128"}
+
+
+@pytest.mark.filterwarnings("ignore::urllib3.exceptions.InsecureRequestWarning")
+def test_http_client_certificate_without_ca(monkeypatch, tls_files, tls_server):
+    def data(name):
+        return base64.b64encode((tls_files / name).read_bytes()).decode("ascii")
+
+    cfg = KubeConfig(
+        {
+            "clusters": [
+                {"name": "c", "cluster": {"server": f"https://localhost:{tls_server}"}}
+            ],
+            "users": [
+                {
+                    "name": "u",
+                    "user": {
+                        "client-certificate-data": data("client.crt"),
+                        "client-key-data": data("client.key"),
+                    },
+                }
+            ],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    # the session's verify setting applies if the kubeconfig has no CA
+    # (CA bundles from the environment take precedence in requests)
+    monkeypatch.delenv("REQUESTS_CA_BUNDLE", raising=False)
+    monkeypatch.delenv("CURL_CA_BUNDLE", raising=False)
+    api = HTTPClient(cfg, verify=False)
+    assert api.get(url="test").json() == {"user": "test-user"}
+
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", str(tls_files / "ca.crt"))
+    api = HTTPClient(cfg)
+    assert api.get(url="test").json() == {"user": "test-user"}
+
+
+def test_http_watch_pool_and_stats():
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        cfg = KubeConfig.from_url(f"http://localhost:{server.server_address[1]}")
+        api = HTTPClient(cfg, watch_pool_maxsize=2)
+
+        assert api.get(url="pods").ok
+        streams = [api.get(url="pods", stream=True) for _ in range(3)]
+        stats = api.pool_stats()
+        assert stats["default"] == {
+            "pools": 1,
+            "in_use": 0,
+            "idle": 1,
+            "created": 1,
+            "discarded": 0,
+        }
+        assert stats["watch"]["in_use"] == 3
+
+        for response in streams:
+            response.json()
+            response.close()
+        # the third connection does not fit into the pool
+        assert api.pool_stats()["watch"] == {
+            "pools": 1,
+            "in_use": 0,
+            "idle": 2,
+            "created": 3,
+            "discarded": 1,
+        }
+
+        # a stream ending soon (streamed list) is sent like a short request
+        api.rate_limiter = mock.MagicMock()
+        response = api.get(url="pods", stream=True, watch_pool=False)
+        assert response.json() == {}
+        api.rate_limiter.wait.assert_called_once()
+        assert api.pool_stats()["default"]["created"] == 1
+        assert api.pool_stats()["watch"]["in_use"] == 0
+    finally:
+        server.shutdown()
+
+
+def test_http_warmup(tmp_path):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    calls = tmp_path / "calls"
+    script = (
+        "import json, pathlib\n"
+        f"pathlib.Path({str(calls)!r}).touch()\n"
+        "print(json.dumps({'status': {'token': 'secret'}}))\n"
+    )
+    exec_conf = {
+        "apiVersion": "client.authentication.k8s.io/v1beta1",
+        "command": sys.executable,
+        "args": ["-c", script],
+    }
+    url = f"http://localhost:{server.server_address[1]}"
+    cfg = KubeConfig(
+        {
+            "clusters": [{"name": "c", "cluster": {"server": url}}],
+            "users": [{"name": "u", "user": {"exec": exec_conf}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+    try:
+        api = HTTPClient(cfg, socket_options=keepalive_socket_options(idle=30))
+        api.http_adapter.credential_cache = CredentialCache()
+        assert api.warmup(connections=3, watch_connections=1) == 4
+        assert calls.exists()
+        stats = api.pool_stats()
+        assert stats["default"]["idle"] == 3
+        assert stats["default"]["created"] == 3
+        assert stats["watch"]["idle"] == 1
+
+        pools = api.http_adapter.poolmanager.pools
+        pool = pools.get(next(iter(pools.keys())))
+        for conn in list(pool.pool.queue):
+            if conn is not None:
+                sock = conn.sock
+                assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+                if hasattr(socket, "TCP_KEEPIDLE"):
+                    assert (
+                        sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE) == 30
+                    )
+
+        # requests use the open connections, a second warmup opens none
+        calls.unlink()
+        for _ in range(5):
+            assert api.get(url="pods").ok
+        assert api.warmup(connections=3) == 0
+        assert not calls.exists()
+        assert api.pool_stats()["default"]["created"] == 3
+    finally:
+        server.shutdown()
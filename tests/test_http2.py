@@ -0,0 +1,198 @@
+import base64
+import json
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from .test_http import tls_files  # noqa: F401
+
+h2_connection = pytest.importorskip("h2.connection")
+h2_config = pytest.importorskip("h2.config")
+h2_events = pytest.importorskip("h2.events")
+h2_settings = pytest.importorskip("h2.settings")
+pytest.importorskip("httpx")
+
+
+def serve_connection(sock, connections, max_streams):
+    conn = h2_connection.H2Connection(
+        config=h2_config.H2Configuration(client_side=False)
+    )
+    conn.local_settings = h2_settings.Settings(
+        client=False,
+        initial_values={h2_settings.SettingCodes.MAX_CONCURRENT_STREAMS: max_streams},
+    )
+    conn.initiate_connection()
+    sock.sendall(conn.data_to_send())
+    requests = {}
+    while True:
+        data = sock.recv(65535)
+        if not data:
+            break
+        for event in conn.receive_data(data):
+            if isinstance(event, h2_events.RequestReceived):
+                requests[event.stream_id] = {
+                    k.decode(): v.decode() for k, v in event.headers
+                }
+            elif isinstance(event, h2_events.DataReceived):
+                conn.acknowledge_received_data(
+                    event.flow_controlled_length, event.stream_id
+                )
+            elif isinstance(event, h2_events.StreamEnded):
+                headers = requests.pop(event.stream_id)
+                if "watch=true" in headers[":path"]:
+                    conn.send_headers(event.stream_id, [(":status", "200")])
+                    # watches without timeout are kept open
+                    conn.send_data(
+                        event.stream_id,
+                        b'{"type": "ADDED"}\n{"type": "DELETED"}\n',
+                        end_stream="timeoutSeconds" in headers[":path"],
+                    )
+                    continue
+                else:
+                    body = json.dumps(
+                        {
+                            "path": headers[":path"],
+                            "authorization": headers.get("authorization"),
+                            "connection": len(connections),
+                        }
+                    ).encode()
+                conn.send_headers(
+                    event.stream_id,
+                    [(":status", "200"), ("content-type", "application/json")],
+                )
+                conn.send_data(event.stream_id, body, end_stream=True)
+        sock.sendall(conn.data_to_send())
+    sock.close()
+
+
+@pytest.fixture
+def h2_server(tls_files, request):  # noqa: F811
+    max_streams = getattr(request, "param", 100)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(tls_files / "server.crt", tls_files / "server.key")
+    context.set_alpn_protocols(["h2"])
+    listener = socket.create_server(("localhost", 0))
+    connections = []
+
+    def accept():
+        while True:
+            try:
+                sock, _ = listener.accept()
+                sock = context.wrap_socket(sock, server_side=True)
+            except OSError:
+                return
+            connections.append(sock)
+            threading.Thread(
+                target=serve_connection,
+                args=(sock, connections, max_streams),
+                daemon=True,
+            ).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield listener.getsockname()[1], connections
+    listener.close()
+
+
+def h2_config_for(tls_files, port: int) -> KubeConfig:  # noqa: F811
+    ca = base64.b64encode((tls_files / "ca.crt").read_bytes()).decode("ascii")
+    return KubeConfig(
+        {
+            "clusters": [
+                {
+                    "name": "c",
+                    "cluster": {
+                        "server": f"https://localhost:{port}",
+                        "certificate-authority-data": ca,
+                    },
+                }
+            ],
+            "users": [{"name": "u", "user": {"token": "secret"}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+
+
+def test_http2_transport_multiplexes_requests(tls_files, h2_server):  # noqa: F811
+    port, connections = h2_server
+    api = HTTPClient(h2_config_for(tls_files, port), transport="http2")
+    assert api.http_adapter is api.watch_http_adapter
+    # concurrent requests reuse the connection once it negotiated HTTP/2
+    assert api.warmup(connections=5) == 1
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(
+            executor.map(lambda i: api.get(url=f"pods/{i}").json(), range(30))
+        )
+    assert [r["path"] for r in results] == [f"/api/v1/pods/{i}" for i in range(30)]
+    assert {r["authorization"] for r in results} == {"Bearer secret"}
+
+    streams = [
+        api.get(url="pods", params={"watch": "true", "timeoutSeconds": 1}, stream=True)
+        for _ in range(3)
+    ]
+    for stream in streams:
+        lines = [json.loads(line) for line in stream.iter_lines() if line]
+        assert lines == [{"type": "ADDED"}, {"type": "DELETED"}]
+        stream.close()
+
+    assert len(connections) == 1
+    assert api.pool_stats()["default"] == {"connections": 1, "http2": 1, "streams": 0}
+
+
+@pytest.mark.parametrize("h2_server", [2], indirect=True)
+def test_http2_transport_stream_limit(tls_files, h2_server):  # noqa: F811
+    port, connections = h2_server
+    api = HTTPClient(h2_config_for(tls_files, port), transport="http2")
+    assert api.warmup() == 1
+
+    watches = [
+        api.get(url="pods", params={"watch": "true"}, stream=True) for _ in range(2)
+    ]
+    for watch in watches:
+        assert json.loads(next(watch.iter_lines())) == {"type": "ADDED"}
+    # both streams of the connection are taken, a new connection is opened
+    start = time.monotonic()
+    assert api.get(url="pods/y", timeout=2).json()["path"] == "/api/v1/pods/y"
+    assert time.monotonic() - start < 2
+    assert len(connections) == 2
+    assert api.pool_stats()["default"] == {"connections": 2, "http2": 2, "streams": 2}
+
+    for watch in watches:
+        watch.close()
+    assert api.pool_stats()["default"]["streams"] == 0
+    # free streams are used again
+    results = [api.get(url=f"pods/{i}").json() for i in range(5)]
+    assert {r["connection"] for r in results} <= {1, 2}
+    assert len(connections) == 2
+
+
+def test_http2_transport_without_httpcore_internals(
+    tls_files,
+    h2_server,
+    monkeypatch,  # noqa: F811
+):
+    port, connections = h2_server
+    monkeypatch.setattr("pykube.http2._httpcore_internals", lambda: False)
+    api = HTTPClient(h2_config_for(tls_files, port), transport="http2")
+    api.warmup()
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        results = list(
+            executor.map(
+                lambda i: api.get(url=f"pods/{i}", timeout=5).json(), range(20)
+            )
+        )
+    assert [r["path"] for r in results] == [f"/api/v1/pods/{i}" for i in range(20)]
+    watch = api.get(url="pods", params={"watch": "true"}, stream=True)
+    assert json.loads(next(watch.iter_lines())) == {"type": "ADDED"}
+    assert api.pool_stats()["default"]["streams"] == 1
+    watch.close()
+    assert api.pool_stats()["default"] == {"connections": 0, "http2": 0, "streams": 0}
+    assert len(connections) == 1
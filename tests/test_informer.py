@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from pykube import Pod
+from pykube.informer import index_by_labels
+from pykube.informer import index_by_namespace
+from pykube.informer import index_by_node_name
+from pykube.informer import index_by_owner_uid
+from pykube.informer import Informer
+from pykube.informer import shared_informer
+from pykube.informer import stop_shared_informers
+from pykube.informer import Store
+from pykube.query import Query
+from pykube.serialization import JSONCodec
+
+
+def pod(name, resource_version="1", namespace="default"):
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": namespace,
+            "resourceVersion": resource_version,
+        }
+    }
+
+
+def list_response(items, resource_version="10"):
+    response = MagicMock(status_code=200)
+    response.json.return_value = {
+        "metadata": {"resourceVersion": resource_version},
+        "items": items,
+    }
+    return response
+
+
+def watch_response(*events):
+    response = MagicMock(status_code=200)
+    response.iter_lines.return_value = [
+        json.dumps({"type": event_type, "object": obj}).encode("utf-8")
+        for event_type, obj in events
+    ]
+    return response
+
+
+@pytest.fixture
+def api():
+    return MagicMock(timeout=10, json_codec=JSONCodec())
+
+
+def test_store_replace():
+    store = Store()
+    store.add(Pod(None, pod("a")))
+    store.add(Pod(None, pod("b")))
+    added, updated, deleted = store.replace(
+        [Pod(None, pod("b", "2")), Pod(None, pod("c"))]
+    )
+    assert [obj.name for obj in added] == ["c"]
+    assert [(old.name, new.metadata["resourceVersion"]) for old, new in updated] == [
+        ("b", "2")
+    ]
+    assert [obj.name for obj in deleted] == ["a"]
+    assert sorted(store.keys()) == ["default/b", "default/c"]
+    assert store.get_by_name("c", namespace="default").name == "c"
+
+
+def test_store_indexes():
+    def scheduled(name, node, owner_uid, namespace="default", **labels):
+        obj = pod(name, namespace=namespace)
+        obj["metadata"]["labels"] = labels
+        obj["metadata"]["ownerReferences"] = [{"uid": owner_uid}]
+        obj["spec"] = {"nodeName": node}
+        return Pod(None, obj)
+
+    store = Store(
+        indexers={
+            "namespace": index_by_namespace,
+            "labels": index_by_labels,
+            "nodeName": index_by_node_name,
+        }
+    )
+    store.add(scheduled("a", "node-1", "rs-1", app="web"))
+    store.add(scheduled("b", "node-1", "rs-2", app="db"))
+    store.add(scheduled("c", "node-2", "rs-1", namespace="other", app="web"))
+    store.add_indexer("owner", index_by_owner_uid)
+
+    def names(objs):
+        return sorted(obj.name for obj in objs)
+
+    assert names(store.by_index("nodeName", "node-1")) == ["a", "b"]
+    assert names(store.by_index("labels", "app=web")) == ["a", "c"]
+    assert names(store.by_index("namespace", "other")) == ["c"]
+    assert names(store.by_index("owner", "rs-1")) == ["a", "c"]
+
+    # moving a pod to another node updates the index incrementally
+    store.add(scheduled("b", "node-2", "rs-2", app="db"))
+    assert names(store.by_index("nodeName", "node-1")) == ["a"]
+    assert names(store.by_index("nodeName", "node-2")) == ["b", "c"]
+
+    store.delete(scheduled("a", "node-1", "rs-1"))
+    assert store.by_index("nodeName", "node-1") == []
+    assert sorted(store.index_values("nodeName")) == ["node-2"]
+
+    store.replace([scheduled("d", "node-3", "rs-3", app="web")])
+    assert names(store.by_index("labels", "app=web")) == ["d"]
+    assert store.index_values("owner") == ["rs-3"]
+
+    store.add_indexer("owner", index_by_owner_uid)
+    with pytest.raises(ValueError):
+        store.add_indexer("owner", index_by_node_name)
+
+
+def test_informer_lists_then_watches(api):
+    done = threading.Event()
+    watch_calls = []
+
+    def get(**kwargs):
+        if "watch=true" not in kwargs["url"]:
+            return list_response([pod("a"), pod("b")])
+        watch_calls.append(kwargs)
+        if len(watch_calls) == 1:
+            return watch_response(
+                ("ADDED", pod("c", "11")),
+                ("MODIFIED", pod("a", "12")),
+                ("DELETED", pod("b", "13")),
+            )
+        done.set()
+        informer.stop()
+        return watch_response()
+
+    api.get.side_effect = get
+    events = []
+    informer = Informer(Query(api, Pod, namespace="default"))
+    informer.add_event_handler(
+        on_add=lambda obj: events.append(("add", obj.name)),
+        on_update=lambda old, new: events.append(("update", new.name)),
+        on_delete=lambda obj: events.append(("delete", obj.name)),
+    )
+    informer.start()
+    assert informer.wait_for_sync(5)
+    assert done.wait(5)
+
+    assert events == [
+        ("add", "a"),
+        ("add", "b"),
+        ("add", "c"),
+        ("update", "a"),
+        ("delete", "b"),
+    ]
+    assert sorted(informer.store.keys()) == ["default/a", "default/c"]
+    assert "resourceVersion=10" in watch_calls[0]["url"]
+    assert "resourceVersion=13" in watch_calls[1]["url"]
+    assert "timeoutSeconds=" in watch_calls[0]["url"]
+
+
+def test_informer_relists_on_gone(api):
+    lists = []
+    done = threading.Event()
+
+    def get(**kwargs):
+        if "watch=true" not in kwargs["url"]:
+            lists.append(kwargs)
+            if len(lists) == 1:
+                return list_response([pod("a"), pod("b")])
+            return list_response([pod("a"), pod("c")], resource_version="20")
+        if len(lists) == 1:
+            return watch_response(("ERROR", {"kind": "Status", "code": 410}))
+        done.set()
+        informer.stop()
+        return watch_response()
+
+    api.get.side_effect = get
+    events = []
+    informer = Informer(Query(api, Pod, namespace="default"))
+    informer.add_event_handler(
+        on_add=lambda obj: events.append(("add", obj.name)),
+        on_delete=lambda obj: events.append(("delete", obj.name)),
+    )
+    informer.start()
+    assert done.wait(5)
+    assert events == [("add", "a"), ("add", "b"), ("add", "c"), ("delete", "b")]
+    assert informer.resource_version == "20"
+
+
+def test_informer_survives_unexpected_errors(api, monkeypatch):
+    monkeypatch.setattr("pykube.informer.random.uniform", lambda a, b: 0.01)
+    lists = []
+    done = threading.Event()
+
+    def get(**kwargs):
+        if "watch=true" not in kwargs["url"]:
+            lists.append(kwargs)
+            return list_response([pod("a")], resource_version=str(10 * len(lists)))
+        if len(lists) == 1:
+            broken = MagicMock(status_code=200)
+            broken.iter_lines.return_value = [b"{not json"]
+            return broken
+        done.set()
+        informer.stop()
+        return watch_response()
+
+    api.get.side_effect = get
+    informer = Informer(Query(api, Pod, namespace="default"))
+    informer.start()
+    assert done.wait(5)
+    # the thread kept running and listed again after the error
+    assert len(lists) == 2
+    assert informer.resource_version == "20"
+
+
+def test_shared_informer_is_shared(api):
+    api.get.return_value = list_response([])
+    first = shared_informer(Query(api, Pod).filter(namespace="ns", selector="a=b"))
+    second = shared_informer(Query(api, Pod).filter(namespace="ns", selector="a=b"))
+    other = shared_informer(Query(api, Pod).filter(namespace="other"))
+    for informer in (first, other):
+        informer.stop()
+    assert first is second
+    assert first is not other
+
+
+def test_stop_closes_the_watch(api):
+    closed = threading.Event()
+
+    def lines(**kwargs):
+        closed.wait(10)
+        raise AttributeError("'NoneType' object has no attribute 'read'")
+
+    watch = MagicMock(status_code=200)
+    watch.iter_lines.side_effect = lines
+    watch.close.side_effect = closed.set
+    api.get.side_effect = [list_response([]), watch]
+    informer = Informer(Query(api, Pod))
+    informer.start()
+    assert informer.wait_for_sync(1)
+    while not watch.iter_lines.called:
+        time.sleep(0.01)
+    informer.stop()
+    informer._thread.join(1)
+    assert not informer._thread.is_alive()
+    assert closed.is_set()
+
+
+def test_stop_shared_informers(api):
+    api.get.return_value = list_response([])
+    informer = shared_informer(Query(api, Pod))
+    stop_shared_informers(api)
+    assert informer._stopped.is_set()
+    assert shared_informer(Query(api, Pod)) is not informer
+    stop_shared_informers(api)
@@ -4,6 +4,7 @@ from typing import Optional
 from unittest.mock import MagicMock
 
 import pytest
+import yaml
 from pytest_mock import MockFixture
 
 import pykube
@@ -73,6 +74,61 @@ def test_update():
     assert pod.annotations == {}
 
 
+def test_set_obj_keeps_original():
+    obj = {"metadata": {"name": "john", "labels": {"a": "1"}}, "spec": {}}
+    pod = Pod(None, obj)
+    pod.labels["b"] = "2"
+    pod.obj["spec"]["nodeName"] = "node-1"
+    assert pod._original_obj == {
+        "metadata": {"name": "john", "labels": {"a": "1"}},
+        "spec": {},
+    }
+    assert pod.obj["metadata"]["labels"] == {"a": "1", "b": "2"}
+    assert pod.obj["spec"] == {"nodeName": "node-1"}
+
+
+def test_constructor_snapshots_obj():
+    obj = {"metadata": {"name": "john", "resourceVersion": "1"}}
+    pod = Pod(None, obj)
+    obj["metadata"]["resourceVersion"] = "2"
+    obj["metadata"] = {"name": "other"}
+    obj["spec"] = {}
+    assert pod.name == "john"
+    assert pod._original_obj == {"metadata": {"name": "john", "resourceVersion": "1"}}
+    assert "spec" not in pod.obj
+
+
+def test_update_sends_minimal_patch():
+    pod = Pod(
+        None,
+        {
+            "metadata": {"name": "john", "resourceVersion": "42", "labels": {}},
+            "spec": {"containers": [{"name": "main", "image": "nginx"}]},
+        },
+    )
+    pod.api = MagicMock()
+    pod.update()
+    pod.api.patch.assert_not_called()
+
+    pod.labels["foo"] = "bar"
+    assert pod.update_patch() == {
+        "metadata": {"labels": {"foo": "bar"}, "resourceVersion": "42"}
+    }
+    pod.obj["spec"]["containers"][0]["image"] = "nginx:2"
+    assert pod.update_patch()["spec"] == {
+        "containers": [{"name": "main", "image": "nginx:2"}]
+    }
+
+
+def test_update_after_reading_labels_sends_nothing():
+    pod = Pod(None, {"metadata": {"name": "john", "resourceVersion": "42"}})
+    pod.api = MagicMock()
+    assert pod.labels == {}
+    assert pod.annotations == {}
+    pod.update()
+    pod.api.patch.assert_not_called()
+
+
 @pytest.mark.parametrize(
     "port,expected_request_kwargs",
     [
@@ -119,3 +175,11 @@ def test_service_proxy_http_request(
     assert request.called
     assert request.call_args_list[0][0] == ("GET",)
     assert request.call_args_list[0][1] == expected_request_kwargs
+
+
+def test_obj_yaml_dump():
+    pod = Pod(None, {"metadata": {"name": "john", "labels": {"a": "1"}}})
+    pod.labels["b"] = "2"
+    expected = {"metadata": {"name": "john", "labels": {"a": "1", "b": "2"}}}
+    assert yaml.safe_load(yaml.safe_dump(pod.obj)) == expected
+    assert yaml.safe_load(yaml.dump(pod.obj)) == expected
@@ -4,6 +4,7 @@ import pytest
 
 from pykube import ObjectDoesNotExist
 from pykube import Pod
+from pykube.exceptions import HTTPError
 from pykube.query import Query
 
 
@@ -102,3 +103,89 @@ def test_as_table(api):
         version="v1",
         headers={"Accept": "application/json;as=Table;v=v1beta1;g=meta.k8s.io"},
     )
+
+
+def page_response(names, continue_token=None, remaining=None, status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    metadata = {}
+    if continue_token:
+        metadata["continue"] = continue_token
+    if remaining is not None:
+        metadata["remainingItemCount"] = remaining
+    response.json.return_value = {
+        "metadata": metadata,
+        "items": [{"metadata": {"name": name}} for name in names],
+    }
+    return response
+
+
+def test_iterator_chunk_size_follows_continue(api):
+    api.get.side_effect = [
+        page_response(["pod1", "pod2"], continue_token="token1"),
+        page_response(["pod3"]),
+    ]
+    pods = list(Query(api, Pod).filter(namespace="myns").iterator(chunk_size=2))
+    assert [pod.name for pod in pods] == ["pod1", "pod2", "pod3"]
+    assert api.get.call_args_list[0][1]["url"] == "pods?limit=2"
+    assert api.get.call_args_list[1][1]["url"] == "pods?limit=2&continue=token1"
+
+
+def test_iterator_chunk_size_resumes_expired_continue(api):
+    expired = MagicMock(status_code=410)
+    expired.json.return_value = {
+        "kind": "Status",
+        "code": 410,
+        "metadata": {"continue": "inconsistent"},
+    }
+    api.get.side_effect = [
+        page_response(["pod1"], continue_token="token1"),
+        expired,
+        page_response(["pod2"]),
+    ]
+    pods = list(Query(api, Pod).iterator(chunk_size=1))
+    assert [pod.name for pod in pods] == ["pod1", "pod2"]
+    assert api.get.call_args_list[2][1]["url"] == "pods?limit=1&continue=inconsistent"
+
+
+def test_iterator_chunk_size_expired_continue_without_token(api):
+    expired = MagicMock(status_code=410)
+    expired.json.return_value = {"kind": "Status", "code": 410, "message": "Expired"}
+    api.get.side_effect = [page_response(["pod1"], continue_token="token1"), expired]
+    with pytest.raises(HTTPError):
+        list(Query(api, Pod).iterator(chunk_size=1))
+
+
+def test_count_uses_remaining_item_count(api):
+    api.get.return_value = page_response(["pod1"], continue_token="t", remaining=41)
+    assert Query(api, Pod).count() == 42
+    api.get.assert_called_once_with(url="pods?limit=1", version="v1")
+
+
+def test_count_without_remaining_item_count(api):
+    api.get.side_effect = [
+        page_response(["pod1"], continue_token="token1"),
+        page_response(["pod2", "pod3"]),
+    ]
+    assert Query(api, Pod).count() == 3
+    assert api.get.call_args_list[1][1]["url"] == "pods?limit=500&continue=token1"
+
+
+def test_iterator_stream(api):
+    response = MagicMock(status_code=200)
+    response.iter_content.return_value = [
+        b'{"kind": "PodList", "metadata": {"continue": "token1"}, "items": [',
+        b'{"metadata": {"name": "pod1"}}, {"metadata": {"name": "po',
+        b'd2"}}]}',
+    ]
+    last_page = MagicMock(status_code=200)
+    last_page.iter_content.return_value = [
+        b'{"items": [{"metadata": {"name": "pod3"}}]}'
+    ]
+    api.get.side_effect = [response, last_page]
+    pods = list(Query(api, Pod).iterator(chunk_size=2, stream=True))
+    assert [pod.name for pod in pods] == ["pod1", "pod2", "pod3"]
+    assert api.get.call_args_list[0][1]["stream"] is True
+    assert api.get.call_args_list[0][1]["watch_pool"] is False
+    assert api.get.call_args_list[1][1]["url"] == "pods?limit=2&continue=token1"
+    response.close.assert_called_once()
@@ -0,0 +1,138 @@
+import email.utils
+import time
+from unittest import mock
+
+import pytest
+import requests
+import responses
+import urllib3
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.retry import is_connect_error
+from pykube.retry import parse_retry_after
+from pykube.retry import RetryBudget
+from pykube.retry import RetryPolicy
+
+URL = "http://localhost/api/v1/pods"
+
+
+@pytest.fixture
+def sleep(monkeypatch):
+    sleep = mock.MagicMock()
+    monkeypatch.setattr("pykube.http.time.sleep", sleep)
+    return sleep
+
+
+@pytest.fixture
+def rsps():
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        yield rsps
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("2") == 2
+    assert parse_retry_after("-1") == 0
+    assert parse_retry_after("soon") is None
+    date = email.utils.formatdate(time.time() + 60, usegmt=True)
+    assert 55 < parse_retry_after(date) <= 60
+
+
+def test_retry_budget():
+    budget = RetryBudget(ratio=0.5, min_retries_per_second=0, max_tokens=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.stats() == {"retries": 3, "exhausted": 2}
+
+
+def test_retry_policy_backoff():
+    policy = RetryPolicy(backoff_base=1, backoff_max=5)
+    for attempt in range(10):
+        assert 0 <= policy.backoff(attempt) <= min(5, 2**attempt)
+
+
+def test_retry_on_status_honours_retry_after(rsps, sleep):
+    policy = RetryPolicy(budget=RetryBudget())
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), retry_policy=policy)
+    rsps.add(responses.GET, URL, status=429, headers={"Retry-After": "2"})
+    rsps.add(responses.GET, URL, status=503)
+    rsps.add(responses.GET, URL, json={})
+
+    assert api.get(url="pods").ok
+    assert len(rsps.calls) == 3
+    assert sleep.call_args_list[0] == mock.call(2.0)
+    assert policy.budget.stats()["retries"] == 2
+
+
+def test_retry_gives_up_after_max_retries(rsps, sleep):
+    policy = RetryPolicy(max_retries=2, budget=RetryBudget())
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), retry_policy=policy)
+    rsps.add(responses.GET, URL, status=500)
+
+    assert api.get(url="pods").status_code == 500
+    assert len(rsps.calls) == 3
+
+
+def test_retry_non_idempotent_only_when_safe(rsps, sleep):
+    policy = RetryPolicy(budget=RetryBudget())
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), retry_policy=policy)
+    rsps.add(responses.POST, URL, status=503)
+    assert api.post(url="pods", json={}).status_code == 503
+    assert len(rsps.calls) == 1
+
+    rsps.replace(responses.POST, URL, status=429, headers={"Retry-After": "1"})
+    rsps.add(responses.POST, URL, status=201, json={})
+    assert api.post(url="pods", json={}).status_code == 201
+    assert len(rsps.calls) == 3
+
+    rsps.replace(responses.POST, URL, body=requests.exceptions.ConnectTimeout())
+    rsps.add(responses.POST, URL, status=201, json={})
+    assert api.post(url="pods", json={}).status_code == 201
+
+    rsps.replace(responses.POST, URL, body=requests.exceptions.ReadTimeout())
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        api.post(url="pods", json={})
+
+
+def test_no_retries_by_default(rsps, sleep):
+    api = HTTPClient(KubeConfig.from_url("http://localhost"))
+    rsps.add(responses.GET, URL, status=503)
+    assert api.get(url="pods").status_code == 503
+    assert len(rsps.calls) == 1
+    assert not sleep.called
+
+
+def test_retry_idempotent_on_read_timeout(rsps, sleep):
+    policy = RetryPolicy(budget=RetryBudget())
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), retry_policy=policy)
+    rsps.add(responses.GET, URL, body=requests.exceptions.ReadTimeout())
+    rsps.add(responses.GET, URL, json={})
+    assert api.get(url="pods").ok
+
+
+def test_is_connect_error():
+    def connection_error(reason):
+        return requests.exceptions.ConnectionError(
+            urllib3.exceptions.MaxRetryError(None, "http://localhost", reason)
+        )
+
+    conn = mock.MagicMock()
+    assert is_connect_error(
+        connection_error(urllib3.exceptions.NewConnectionError(conn, "refused"))
+    )
+    assert is_connect_error(
+        connection_error(urllib3.exceptions.NameResolutionError("host", conn, "nx"))
+    )
+    assert is_connect_error(requests.exceptions.ConnectTimeout())
+    assert not is_connect_error(
+        connection_error(urllib3.exceptions.ProtocolError("connection reset"))
+    )
+    assert not is_connect_error(requests.exceptions.ConnectionError())
@@ -0,0 +1,169 @@
+import json
+from pathlib import Path
+
+import pytest
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube import Pod
+from pykube import serialization
+from pykube.serialization import accept_header
+from pykube.serialization import CBOR
+from pykube.serialization import CBORCodec
+from pykube.serialization import cbor_installed
+from pykube.serialization import codec_for
+from pykube.serialization import json_dumps
+from pykube.serialization import JSONCodec
+from pykube.serialization import msgspec_installed
+from pykube.serialization import orjson_installed
+from pykube.utils import CopyOnWriteDict
+
+FIXTURES = Path(__file__).parent
+
+requires_cbor = pytest.mark.skipif(not cbor_installed, reason="cbor2 is not installed")
+JSON_LIBRARIES = [
+    pytest.param(
+        library,
+        marks=pytest.mark.skipif(not installed, reason=f"{library} is not installed"),
+    )
+    for library, installed in (
+        ("json", True),
+        ("orjson", orjson_installed),
+        ("msgspec", msgspec_installed),
+    )
+]
+
+
+def fixture(name: str) -> bytes:
+    return (FIXTURES / f"test_serialization_{name}").read_bytes()
+
+
+@requires_cbor
+@pytest.mark.parametrize("name", ["pods", "secret"])
+def test_cbor_decodes_like_json(name):
+    expected = json.loads(fixture(f"{name}.json"))
+    assert CBORCodec().decode(fixture(f"{name}.cbor")) == expected
+    assert JSONCodec().decode(fixture(f"{name}.json")) == expected
+
+
+@requires_cbor
+def test_cbor_byte_strings():
+    import cbor2
+
+    data = cbor2.dumps(
+        {
+            b"items": [cbor2.CBORTag(22, b"\x00\xff"), b"a", [b"b"]],
+            b"nested": {b"name": "text"},
+        }
+    )
+    assert CBORCodec().decode(data) == {
+        "items": ["AP8=", "a", ["b"]],
+        "nested": {"name": "text"},
+    }
+
+
+@requires_cbor
+def test_accept_header_and_codec_for():
+    codecs = [CBORCodec(), JSONCodec()]
+    assert accept_header(codecs) == "application/cbor, application/json;q=0.9"
+    assert codec_for("application/cbor", codecs) is codecs[0]
+    assert codec_for("application/json; charset=utf-8", codecs) is codecs[1]
+    assert codec_for("text/plain", codecs) is None
+    assert codec_for(None, codecs) is None
+
+
+@requires_cbor
+def test_http_client_negotiates_cbor():
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), codecs=[CBORCodec()])
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(
+            responses.GET,
+            "http://localhost/api/v1/namespaces/default/pods",
+            body=fixture("pods.cbor"),
+            content_type=CBOR,
+        )
+        # e.g. a custom resource: the API server falls back to JSON
+        rsps.add(
+            responses.GET,
+            "http://localhost/apis/example.org/v1/things",
+            json={"items": []},
+        )
+        pods = list(Pod.objects(api, namespace="default"))
+        assert [pod.name for pod in pods] == ["pod-0", "pod-1", "pod-2"]
+        assert api.get(version="example.org/v1", url="things").json() == {"items": []}
+        for call in rsps.calls:
+            assert call.request.headers["Accept"] == accept_header([CBORCodec()])
+
+        # explicit Accept headers (e.g. tables) are kept
+        rsps.add(responses.GET, "http://localhost/api/v1/pods", json={})
+        api.get(url="pods", headers={"accept": "application/json;as=Table"})
+        assert rsps.calls[-1].request.headers["Accept"] == "application/json;as=Table"
+
+
+@pytest.mark.parametrize("library", JSON_LIBRARIES)
+def test_json_codec(library):
+    codec = JSONCodec(library)
+    obj = CopyOnWriteDict(json.loads(fixture("pods.json")))
+    obj["items"][0]["metadata"]["labels"]["app"] = "changed"
+    encoded = codec.encode(obj)
+    assert isinstance(encoded, bytes)
+    assert json.loads(encoded) == obj
+    assert codec.decode(encoded) == obj
+    assert codec.decode('{"a": "\u00e4"}') == {"a": "\u00e4"}
+    with pytest.raises(ValueError):
+        codec.decode(b"{")
+
+
+def test_json_codec_unknown_library():
+    with pytest.raises(ValueError):
+        JSONCodec("simplejson")
+
+
+def test_set_json_library(monkeypatch):
+    monkeypatch.setattr(serialization, "default_json_codec", JSONCodec("json"))
+    serialization.set_json_library("json")
+    assert json_dumps({"a": 1}) == b'{"a": 1}'
+    assert serialization.default_json_codec.library == "json"
+
+
+def test_http_client_decodes_with_json_codec():
+    codec = JSONCodec("json")
+    codec.decode = lambda data: {"decoded": json.loads(data)}
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), json_codec=codec)
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.GET, "http://localhost/api/v1/pods", json={"items": []})
+        rsps.add(responses.GET, "http://localhost/api/v1/pods/log", body="text")
+        assert api.get(url="pods").json() == {"decoded": {"items": []}}
+        assert api.get(url="pods/log").text == "text"
+
+
+def test_http_client_encodes_and_watches_with_json_codec():
+    codec = JSONCodec("json")
+    codec.encode = lambda obj: json.dumps({"encoded": obj}).encode()
+    codec.decode = lambda data: {"type": "ADDED", "object": json.loads(data)}
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), json_codec=codec)
+    pod = Pod(api, {"metadata": {"name": "a", "namespace": "default"}})
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(
+            responses.PATCH,
+            "http://localhost/api/v1/namespaces/default/pods/a",
+            json={},
+        )
+        pod.patch({"metadata": {"labels": {"app": "a"}}})
+        assert json.loads(rsps.calls[0].request.body) == {
+            "encoded": {"metadata": {"labels": {"app": "a"}}}
+        }
+        rsps.add(
+            responses.GET,
+            "http://localhost/api/v1/namespaces/default/pods?watch=true",
+            body='{"metadata": {"name": "b"}}\n',
+        )
+        event = next(iter(Pod.objects(api, namespace="default").watch()))
+        assert event.object.name == "b"
@@ -0,0 +1,165 @@
+import re
+import threading
+import time
+
+import pytest
+import requests
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.singleflight import RequestCoalescer
+
+URL = "http://localhost/api/v1/pods"
+
+
+def make_response(body=b"{}", status_code=200):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    return response
+
+
+def test_coalesce_concurrent_calls():
+    coalescer = RequestCoalescer()
+    calls = []
+    started = threading.Event()
+
+    def send():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return make_response(b'{"items": []}')
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(coalescer.call("k", send)))
+        for _ in range(10)
+    ]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert [r.json() for r in results] == [{"items": []}] * 10
+    # every caller has its own response object
+    assert len({id(r) for r in results}) == 10
+    assert coalescer.stats() == {"requests": 10, "coalesced": 9, "cache_hits": 0}
+
+    # not cached without TTL
+    coalescer.call("k", send)
+    assert len(calls) == 2
+
+
+def test_coalesce_errors_are_shared():
+    coalescer = RequestCoalescer()
+    started = threading.Event()
+
+    def send():
+        started.set()
+        time.sleep(0.1)
+        raise requests.exceptions.ConnectionError("refused")
+
+    errors = []
+
+    def call():
+        try:
+            coalescer.call("k", send)
+        except requests.exceptions.ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+
+
+def test_ttl_cache(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("pykube.singleflight.time.monotonic", lambda: now[0])
+    coalescer = RequestCoalescer(ttl=1, max_entries=2)
+    calls = []
+
+    def send(status_code=200):
+        def send():
+            calls.append(1)
+            return make_response(str(len(calls)).encode(), status_code)
+
+        return send
+
+    assert coalescer.call("a", send()).text == "1"
+    assert coalescer.call("a", send()).text == "1"
+    now[0] += 1
+    assert coalescer.call("a", send()).text == "2"
+    # errors are not cached
+    assert coalescer.call("b", send(500)).status_code == 500
+    assert coalescer.call("b", send()).text == "4"
+    assert coalescer.stats()["cache_hits"] == 1
+
+    coalescer.call("c", send())
+    coalescer.call("d", send())
+    assert len(coalescer._calls) == 2
+    coalescer.invalidate()
+    assert coalescer.call("d", send()).text == "7"
+
+
+def test_invalidate_while_in_flight():
+    coalescer = RequestCoalescer(ttl=10)
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def slow_send():
+        started.set()
+        release.wait(5)
+        return make_response(b"before write")
+
+    thread = threading.Thread(
+        target=lambda: results.append(coalescer.call("a", slow_send).text)
+    )
+    thread.start()
+    assert started.wait(5)
+    # e.g. a write request finished while the GET was in flight
+    coalescer.invalidate()
+    release.set()
+    thread.join(5)
+    assert results == ["before write"]
+    # the response from before the write was not cached
+    assert coalescer.call("a", lambda: make_response(b"after write")).text == (
+        "after write"
+    )
+    assert coalescer.stats()["cache_hits"] == 0
+
+
+@pytest.fixture
+def rsps():
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        yield rsps
+
+
+def test_http_client_coalesces_identical_gets(rsps):
+    coalescer = RequestCoalescer(ttl=10)
+    api = HTTPClient(KubeConfig.from_url("http://localhost"), coalescer=coalescer)
+    rsps.add(responses.GET, re.compile(f"{URL}.*"), json={"items": []})
+
+    for _ in range(2):
+        assert api.get(url="pods").json() == {"items": []}
+        api.get(url="pods", params={"labelSelector": "app"})
+    api.get(url="pods", headers={"Accept": "application/yaml"})
+    api.get(url="pods", stream=True)
+    assert len(rsps.calls) == 4
+    assert coalescer.stats()["cache_hits"] == 2
+
+    # changes invalidate cached responses
+    rsps.add(responses.DELETE, f"{URL}/a", json={})
+    api.delete(url="pods/a")
+    api.get(url="pods")
+    assert len(rsps.calls) == 6
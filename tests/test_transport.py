@@ -0,0 +1,122 @@
+import http.server
+import json
+import threading
+
+import pytest
+import requests
+import responses
+
+from pykube import HTTPClient
+from pykube import KubeConfig
+from pykube.transport import DirectSession
+
+
+def token_config(server: str) -> KubeConfig:
+    return KubeConfig(
+        {
+            "clusters": [{"name": "c", "cluster": {"server": server}}],
+            "users": [{"name": "u", "user": {"token": "secret"}}],
+            "contexts": [{"name": "c", "context": {"cluster": "c", "user": "u"}}],
+            "current-context": "c",
+        }
+    )
+
+
+def test_direct_transport_sends_like_requests():
+    api = HTTPClient(token_config("http://localhost"), transport="direct")
+    assert isinstance(api.session, DirectSession)
+    assert api.watch_session.headers is api.session.headers
+
+    with responses.RequestsMock(
+        target="pykube.http.KubernetesHTTPAdapter._do_send"
+    ) as rsps:
+        rsps.add(responses.PATCH, "http://localhost/api/v1/pods/a", json={"ok": 1})
+        response = api.patch(
+            url="pods/a",
+            params={"fieldManager": "me"},
+            headers={"Content-Type": "application/merge-patch+json"},
+            data=json.dumps({"metadata": {}}),
+        )
+        assert response.json() == {"ok": 1}
+        request = rsps.calls[0].request
+        assert request.url == "http://localhost/api/v1/pods/a?fieldManager=me"
+        assert request.headers["Authorization"] == "Bearer secret"
+        assert request.headers["Content-Type"] == "application/merge-patch+json"
+        assert request.headers["User-Agent"].startswith("new-pykube/")
+        assert json.loads(request.body) == {"metadata": {}}
+
+
+def test_direct_transport_with_server():
+    requests_seen = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers["Authorization"]))
+            body = b'{"kind": "PodList", "items": []}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://localhost:{server.server_address[1]}"
+        api = HTTPClient(token_config(url), transport="direct")
+        for _ in range(3):
+            assert api.get(url="pods").json()["kind"] == "PodList"
+        stream = api.get(url="pods", params={"watch": "true"}, stream=True)
+        assert stream.json()["items"] == []
+        stream.close()
+        assert requests_seen[-1] == ("/api/v1/pods?watch=true", "Bearer secret")
+        assert api.pool_stats()["default"]["created"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_unknown_transport():
+    with pytest.raises(ValueError):
+        HTTPClient(KubeConfig.from_url("http://localhost"), transport="carrier-pigeon")
+
+
+def test_direct_session_environment(monkeypatch):
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", "/etc/ca-bundle.crt")
+    monkeypatch.setenv("HTTPS_PROXY", "http://proxy:3128")
+    monkeypatch.delenv("NO_PROXY", raising=False)
+    monkeypatch.delenv("no_proxy", raising=False)
+    session = DirectSession()
+    expected = requests.Session().merge_environment_settings(
+        "https://localhost", {}, False, None, None
+    )
+    settings = session.merge_environment_settings(
+        "https://localhost", None, False, None, None
+    )
+    assert settings["verify"] == expected["verify"] == "/etc/ca-bundle.crt"
+    assert settings["proxies"]["https"] == expected["proxies"]["https"]
+    assert (
+        session.merge_environment_settings(
+            "https://localhost", {"https": "http://other:3128"}, False, "/ca.crt", None
+        )["proxies"]["https"]
+        == "http://other:3128"
+    )
+
+    session = DirectSession()
+    session.trust_env = False
+    settings = session.merge_environment_settings(
+        "https://localhost", None, False, None, None
+    )
+    assert settings["verify"] is True
+    assert settings["proxies"] == {}
+
+
+def test_direct_session_unsupported_arguments():
+    session = DirectSession()
+    with pytest.raises(NotImplementedError, match="auth, cookies"):
+        session.get("https://localhost", auth=("user", "password"), cookies={})
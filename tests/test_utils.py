@@ -1,3 +1,12 @@
+import copy
+import json
+
+import pytest
+import yaml
+
+from pykube.utils import CopyOnWriteDict
+from pykube.utils import iter_json_items
+from pykube.utils import obj_diff
 from pykube.utils import join_url_path
 from pykube.utils import obj_merge
 
@@ -31,6 +40,17 @@ def test_obj_merge():
     ) == {"a": {"b": [1, 2]}}
 
 
+def test_obj_diff():
+    original = {"a": {"b": 1, "c": [1, 2]}, "d": "x", "e": {"f": 1}}
+    obj = {"a": {"b": 2, "c": [1]}, "e": {"f": 1}, "g": None}
+    assert obj_diff(obj, original) == {"a": {"b": 2}, "g": None}
+    assert obj_diff(obj, original, is_strategic=False) == {
+        "a": {"b": 2, "c": [1]},
+        "g": None,
+    }
+    assert obj_diff(CopyOnWriteDict(original), original) == {}
+
+
 def test_join_url_path():
     assert join_url_path() == "/"
     assert join_url_path("") == "/"
@@ -42,3 +62,72 @@ def test_join_url_path():
     assert join_url_path("first", "second", "") == "/first/second"
     assert join_url_path("first", "/", "second", "", "") == "/first/second"
     assert join_url_path("/first", "second", "", join_empty=True) == "/first/second/"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 100000])
+def test_iter_json_items(chunk_size):
+    doc = {
+        "kind": "PodList",
+        "metadata": {"resourceVersion": "123", "continue": "abc"},
+        "items": [{"metadata": {"name": f"pod-\u00fc{i}"}, "n": i} for i in range(50)],
+        "count": 1234,
+    }
+    data = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+    fields: dict = {}
+    assert list(iter_json_items(chunks, fields=fields)) == doc["items"]
+    assert fields == {"kind": "PodList", "metadata": doc["metadata"], "count": 1234}
+
+
+def test_iter_json_items_is_incremental():
+    def chunks():
+        yield b'{"metadata": {}, "items": [{"a": 1}, '
+        raise AssertionError("first item should be yielded before reading on")
+
+    assert next(iter_json_items(chunks())) == {"a": 1}
+
+
+def test_iter_json_items_empty_and_invalid():
+    assert list(iter_json_items([b"{}"])) == []
+    assert list(iter_json_items([b'{"items": []}'])) == []
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_items([b'{"items": [{"a": 1}']))
+
+
+def test_copy_on_write_dict():
+    source = {"metadata": {"labels": {"a": "1"}}, "spec": {"containers": [{"x": 1}]}}
+    obj = CopyOnWriteDict(source)
+    obj["metadata"]["labels"]["b"] = "2"
+    obj["spec"]["containers"][0]["x"] = 2
+    obj["spec"]["containers"].append({"x": 3})
+    obj.setdefault("status", {})["phase"] = "Running"
+
+    assert source == {
+        "metadata": {"labels": {"a": "1"}},
+        "spec": {"containers": [{"x": 1}]},
+    }
+    expected = {
+        "metadata": {"labels": {"a": "1", "b": "2"}},
+        "spec": {"containers": [{"x": 2}, {"x": 3}]},
+        "status": {"phase": "Running"},
+    }
+    assert obj == expected
+    assert json.loads(json.dumps(obj)) == expected
+    assert yaml.safe_load(yaml.safe_dump(obj)) == expected
+    assert yaml.safe_load(yaml.dump(obj)) == expected
+    assert "!!python" not in yaml.dump(obj)
+    assert type(copy.deepcopy(obj)) is dict
+    assert copy.deepcopy(obj) == expected
+
+
+def test_copy_on_write_dict_copies_do_not_leak():
+    source = {"metadata": {"labels": {"a": "1"}}}
+    for shallow in (
+        dict(CopyOnWriteDict(source)),
+        {**CopyOnWriteDict(source)},
+        CopyOnWriteDict(source).copy(),
+        CopyOnWriteDict(CopyOnWriteDict(source)),
+    ):
+        shallow["metadata"]["labels"]["a"] = "2"
+    assert CopyOnWriteDict(source).pop("metadata") is not source["metadata"]
+    assert source == {"metadata": {"labels": {"a": "1"}}}
@@ -2,15 +2,18 @@ import json
 from unittest.mock import MagicMock
 
 import pytest
+import requests
 
 from pykube import Pod
 from pykube.exceptions import HTTPError
 from pykube.query import Query
+from pykube.query import WatchEvent
+from pykube.serialization import JSONCodec
 
 
 @pytest.fixture
 def api():
-    return MagicMock()
+    return MagicMock(json_codec=JSONCodec())
 
 
 def test_watch_response_exists(api):
@@ -81,3 +84,138 @@ def test_watch_params_are_passed_through(api):
     assert api.get.call_count == 1
     assert "timeoutSeconds=123" in api.get.call_args_list[0][1]["url"]
     assert "arbitraryParam=456" in api.get.call_args_list[0][1]["url"]
+
+
+def watch_response(*events):
+    response = MagicMock()
+    response.iter_lines.return_value = [
+        json.dumps(event).encode("utf-8") for event in events
+    ]
+    return response
+
+
+def pod(name, resource_version):
+    return {"metadata": {"name": name, "resourceVersion": resource_version}}
+
+
+def test_resumable_watch_reconnects_from_last_resource_version(api):
+    api.get.side_effect = [
+        watch_response(
+            {"type": "ADDED", "object": pod("pod1", "11")},
+            {"type": "BOOKMARK", "object": pod("", "15")},
+        ),
+        watch_response({"type": "MODIFIED", "object": pod("pod1", "16")}),
+    ]
+    stream = iter(Query(api, Pod).watch(since="10", resume=True))
+    events = [next(stream), next(stream)]
+
+    assert [(e.type, e.object.metadata["resourceVersion"]) for e in events] == [
+        ("ADDED", "11"),
+        ("MODIFIED", "16"),
+    ]
+    urls = [call[1]["url"] for call in api.get.call_args_list]
+    assert "resourceVersion=10" in urls[0]
+    assert "allowWatchBookmarks=true" in urls[0]
+    assert "timeoutSeconds=" in urls[0]
+    # resumed from the bookmark, without listing again
+    assert "resourceVersion=15" in urls[1]
+
+
+def test_resumable_watch_relists_on_gone(api):
+    gone = {"type": "ERROR", "object": {"kind": "Status", "code": 410}}
+    listing = MagicMock(status_code=200)
+    listing.json.return_value = {
+        "metadata": {"resourceVersion": "30"},
+        "items": [pod("pod1", "11"), pod("pod2", "25"), pod("pod4", "28")],
+    }
+    api.get.side_effect = [
+        watch_response(
+            {"type": "ADDED", "object": pod("pod1", "11")},
+            {"type": "ADDED", "object": pod("pod2", "12")},
+            {"type": "ADDED", "object": pod("pod3", "13")},
+            gone,
+        ),
+        listing,
+        watch_response({"type": "DELETED", "object": pod("pod4", "31")}),
+    ]
+    stream = iter(Query(api, Pod).watch(resume=True))
+    events = [(e.type, e.object.name) for e in (next(stream) for _ in range(7))]
+
+    assert events == [
+        ("ADDED", "pod1"),
+        ("ADDED", "pod2"),
+        ("ADDED", "pod3"),
+        # synthetic events for the difference after relisting
+        ("MODIFIED", "pod2"),
+        ("ADDED", "pod4"),
+        ("DELETED", "pod3"),
+        ("DELETED", "pod4"),
+    ]
+    assert api.get.call_args_list[1][1]["url"] == "pods?limit=500"
+    assert "resourceVersion=30" in api.get.call_args_list[2][1]["url"]
+
+
+def test_resumable_watch_retries_failed_relist(api, monkeypatch):
+    sleep = MagicMock()
+    monkeypatch.setattr("pykube.query.time.sleep", sleep)
+    gone = {"type": "ERROR", "object": {"kind": "Status", "code": 410}}
+    failing = MagicMock(status_code=503)
+    failing.raise_for_status.side_effect = requests.HTTPError(response=failing)
+    listing = MagicMock(status_code=200)
+    listing.json.return_value = {
+        "metadata": {"resourceVersion": "30"},
+        "items": [pod("pod1", "11"), pod("pod2", "25")],
+    }
+    api.get.side_effect = [
+        watch_response({"type": "ADDED", "object": pod("pod1", "11")}, gone),
+        failing,
+        requests.exceptions.ConnectionError("connection refused"),
+        listing,
+        watch_response({"type": "DELETED", "object": pod("pod2", "31")}),
+    ]
+    stream = iter(Query(api, Pod).watch(resume=True))
+    events = [(e.type, e.object.name) for e in (next(stream) for _ in range(3))]
+
+    assert events == [("ADDED", "pod1"), ("ADDED", "pod2"), ("DELETED", "pod2")]
+    urls = [call[1]["url"] for call in api.get.call_args_list]
+    assert urls[1:4] == ["pods?limit=500"] * 3
+    assert "resourceVersion=30" in urls[4]
+    assert sleep.call_count == 2
+
+
+def test_resumable_watch_retries_server_errors_without_status(api, monkeypatch):
+    monkeypatch.setattr("pykube.query.time.sleep", MagicMock())
+    failing = MagicMock(status_code=502)
+    api.raise_for_status.side_effect = [
+        requests.HTTPError(response=failing),
+        None,
+    ]
+    api.get.side_effect = [
+        failing,
+        watch_response({"type": "ADDED", "object": pod("pod1", "11")}),
+    ]
+    event = next(iter(Query(api, Pod).watch(resume=True)))
+
+    assert (event.type, event.object.name) == ("ADDED", "pod1")
+    assert api.get.call_count == 2
+
+
+def test_resumable_watch_raises_client_errors(api):
+    api.get.return_value = watch_response(
+        {"type": "ERROR", "object": {"kind": "Status", "code": 403, "message": "no"}}
+    )
+    with pytest.raises(HTTPError):
+        next(iter(Query(api, Pod).watch(resume=True)))
+
+
+def test_watch_raw_events(api):
+    response = watch_response({"type": "ADDED", "object": pod("pod1", "1")})
+    response.iter_lines.return_value.insert(0, b"")  # keep-alive newline
+    api.get.return_value = response
+
+    event = next(iter(Query(api, Pod).watch(raw=True, read_size=1024)))
+
+    assert isinstance(event, WatchEvent)
+    assert event.type == "ADDED"
+    assert event.object == pod("pod1", "1")
+    response.iter_lines.assert_called_once_with(chunk_size=1024)